@@ -8,11 +8,37 @@
 import qrcode
 from io import BytesIO
 import base64
-from PIL import Imagefrom flask import Flask, render_template, jsonify, request, flash, redirect, url_for
-from mikrotik_manager import MikroTikManager
+from PIL import Image
+from flask import Flask, Response, render_template, jsonify, request, flash, redirect, url_for
+from mikrotik_manager import (
+    MikroTikManager, bulk_usernames, format_system_resources, build_rate_limit, build_data_limit_params
+)
+from connection_pool import MikroTikConnectionPool
+from bulk_writer import AdaptiveBulkWriter, BATCH_ACTIONS, USER_PATHS
+from bulk_jobs import BulkJobManager
+from resumable_jobs import CheckpointedBulkJob, resume_jobs
+from circuit_breaker import breaker_for
+from metadata_cache import cache_for
+from user_mirror import start_mirror, stop_mirror, mirror_for
+from name_index import index_for
+from single_flight import flight_for
+from snapshot_refresher import SnapshotRefresher
+from session_feed import ActiveSessionFeed
+from user_sync import UserSync
+from user_import import UserImporter, IMPORT_FORMATS, iter_rows
+from credentials import DEFAULT_ALPHABET, resolve_alphabet
 import os
+import json
+import threading
+import hashlib
+import math
+import csv
+import io
+import itertools
+import zlib
 from dotenv import load_dotenv
 import logging
+from typing import Dict, Any, Optional
 
 # تحميل متغيرات البيئة
 load_dotenv()
@@ -33,8 +59,136 @@ MIKROTIK_CONFIG = {
     'password': os.getenv('MIKROTIK_PASSWORD', 'khalid')
 }
 
+# مجمع جلسات API مشترك بين كل الطلبات
+connection_pool = MikroTikConnectionPool(
+    host=MIKROTIK_CONFIG['host'],
+    username=MIKROTIK_CONFIG['username'],
+    password=MIKROTIK_CONFIG['password'],
+    port=MIKROTIK_CONFIG['port'],
+    min_size=int(os.getenv('MIKROTIK_POOL_MIN', '1')),
+    max_size=int(os.getenv('MIKROTIK_POOL_MAX', '8')),
+    idle_timeout=float(os.getenv('MIKROTIK_POOL_IDLE_TIMEOUT', '300')),
+    keepalive_interval=float(os.getenv('MIKROTIK_KEEPALIVE', '60'))
+)
+
+# نسخة محلية من مستخدمي PPP و Hotspot تُحدث بأمر listen (تُعطل بـ MIKROTIK_MIRROR=0)
+MIRROR_ENABLED = os.getenv('MIKROTIK_MIRROR', '1') == '1'
+
+def start_user_mirror():
+    """تشغيل النسخة المحلية للجهاز المضبوط حالياً"""
+    if MIRROR_ENABLED:
+        start_mirror(
+            MIKROTIK_CONFIG['host'], MIKROTIK_CONFIG['username'], MIKROTIK_CONFIG['password'],
+            MIKROTIK_CONFIG['port'],
+            max_staleness=float(os.getenv('MIKROTIK_MIRROR_MAX_STALENESS', '5'))
+        )
+
+# قاطع الدائرة: رفض فوري أثناء انقطاع الجهاز بدلاً من انتظار مهلة الاتصال في كل طلب
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('MIKROTIK_BREAKER_FAILURES', '3'))
+BREAKER_RESET_TIMEOUT = float(os.getenv('MIKROTIK_BREAKER_RESET', '30'))
+
+# رد جاهز يُرسل كما هو طوال فترة انقطاع الجهاز
+ROUTER_UNAVAILABLE_BODY = json.dumps({
+    'success': False,
+    'error': 'جهاز MikroTik غير متاح حالياً، يرجى المحاولة لاحقاً',
+    'router_unavailable': True
+}, ensure_ascii=False)
+
+# مسارات API لا ترسل أوامر إلى الجهاز فتبقى متاحة أثناء انقطاعه: تقدم المهام وإلغاؤها،
+# لقطات لوحة التحكم (بيانات قديمة مع عمرها)، وبث الجلسات (المتصفح يتوقف عن إعادة
+# الاتصال بعد 503)
+ROUTER_INDEPENDENT_ENDPOINTS = frozenset((
+    'api_pool_stats', 'api_system_info', 'api_system_resources', 'api_active_users_stream',
+    'api_bulk_jobs', 'api_bulk_job', 'api_bulk_job_stream', 'api_cancel_bulk_job',
+    'get_currencies', 'generate_qr', 'print_cards'
+))
+
+def router_breaker():
+    """قاطع الدائرة للجهاز المضبوط حالياً"""
+    breaker = breaker_for(MIKROTIK_CONFIG['host'], MIKROTIK_CONFIG['port'])
+    breaker.configure(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+    return breaker
+
+# العمليات بالجملة على عدة جلسات من المجمع مع توازٍ يتكيف مع حمل المعالج
+bulk_writer = AdaptiveBulkWriter(
+    connection_pool,
+    max_workers=int(os.getenv('MIKROTIK_BULK_WORKERS', '4')),
+    window=int(os.getenv('MIKROTIK_BULK_WINDOW', '32')),
+    high_load=int(os.getenv('MIKROTIK_BULK_HIGH_LOAD', '80')),
+    low_load=int(os.getenv('MIKROTIK_BULK_LOW_LOAD', '50'))
+)
+
+# لقطات لوحة التحكم تُقرأ في الخلفية بفاصل ثابت؛ الطلبات تقرأ آخر لقطة فقط
+dashboard_refresher = SnapshotRefresher(
+    connection_pool,
+    interval=float(os.getenv('MIKROTIK_REFRESH_INTERVAL', '2')),
+    idle_after=float(os.getenv('MIKROTIK_REFRESH_IDLE', '60'))
+)
+# قراءة واحدة لـ /system/resource تخدم system-info و system-resources
+dashboard_refresher.register(
+    'system-resource', lambda mt: (mt.execute_command('/system/resource/print') or [{}])[0]
+)
+
+# قارئ واحد للجلسات النشطة يبث الفروق لكل المشتركين (يعمل فقط عند وجود مشتركين)
+session_feed = ActiveSessionFeed(
+    connection_pool,
+    interval=float(os.getenv('MIKROTIK_SESSION_INTERVAL', '2'))
+)
+SSE_KEEPALIVE = 15
+
+# مهام الإنشاء بالجملة في الخلفية: عمال محدودون يتناوبون على دفعات كل المهام
+bulk_jobs = BulkJobManager(
+    bulk_writer,
+    max_workers=int(os.getenv('MIKROTIK_JOB_WORKERS', '2')),
+    chunk_size=int(os.getenv('MIKROTIK_JOB_CHUNK', '25'))
+)
+
+# مزامنة المستخدمين مع قائمة الحالة المطلوبة (تُنفذ على كاتب الدفعات)
+user_sync = UserSync(connection_pool, bulk_writer)
+
+# استيراد المستخدمين من الملفات بالتدفق على دفعات ثابتة الحجم
+user_importer = UserImporter(connection_pool, bulk_writer, chunk_size=int(os.getenv('MIKROTIK_IMPORT_CHUNK', '500')))
+
+# أقصى عدد من صفوف النتائج في كل رد تقدم أو حدث SSE
+JOB_RESULTS_PAGE = 1000
+
+# الإنشاء فوق حد المهام في الذاكرة يُحفظ على القرص على دفعات ويُستأنف بعد إعادة التشغيل
+BULK_MEMORY_LIMIT = 1000
+BULK_MAX_USERS = int(os.getenv('MIKROTIK_BULK_MAX', '50000'))
+JOB_DIR = os.getenv('MIKROTIK_JOB_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_data'))
+RESUMABLE_CHUNK = int(os.getenv('MIKROTIK_RESUMABLE_CHUNK', '200'))
+
+# أبجدية كلمات المرور الافتراضية (اسم من credentials.ALPHABETS أو chars:<الأحرف>)
+PASSWORD_ALPHABET = os.getenv('MIKROTIK_PASSWORD_ALPHABET', DEFAULT_ALPHABET)
+
+# المهام الخلفية لا تبدأ عند استيراد الوحدة: مع debug يستورد المُعيد (reloader) التطبيق
+# في عمليتين، والاختبارات تستورده دون جهاز
+_background_lock = threading.Lock()
+_background_started = False
+
+def start_background_tasks():
+    """تشغيل المهام الخلفية مرة واحدة في عملية الخادم (من run.py أو عند بدء عامل WSGI)"""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    start_user_mirror()
+    dashboard_refresher.start()
+    resume_jobs(bulk_jobs, JOB_DIR, connection_pool)
+
+@app.before_request
+def ensure_background_tasks():
+    """تشغيل المهام الخلفية مع أول طلب إذا لم يستدعها الخادم (مثل خادم WSGI دون خطاف بدء)"""
+    if not _background_started:
+        start_background_tasks()
+
 def get_mikrotik_connection():
-    """إنشاء اتصال MikroTik"""
+    """استعارة اتصال MikroTik من المجمع (للاستخدام مع with)"""
+    return connection_pool.connection()
+
+def create_mikrotik_connection():
+    """إنشاء اتصال MikroTik جديد خارج المجمع (لاختبار الإعدادات)"""
     return MikroTikManager(
         host=MIKROTIK_CONFIG['host'],
         username=MIKROTIK_CONFIG['username'],
@@ -42,21 +196,176 @@ def get_mikrotik_connection():
         port=MIKROTIK_CONFIG['port']
     )
 
+@app.before_request
+def reject_while_router_unavailable():
+    """رد فوري 503 على طلبات API التي تحتاج الجهاز أثناء انقطاعه (طلب اختبار واحد يمر بعد المهلة)"""
+    if not request.path.startswith('/api/') or request.endpoint in ROUTER_INDEPENDENT_ENDPOINTS:
+        return None
+    breaker = router_breaker()
+    if breaker.rejecting(count=True):
+        return Response(
+            ROUTER_UNAVAILABLE_BODY,
+            status=503,
+            mimetype='application/json',
+            headers={'Retry-After': str(math.ceil(breaker.retry_after()))}
+        )
+    return None
+
+def requested_fields():
+    """الحقول الإضافية المطلوبة في الاستعلام (?fields=comment,limit-uptime)"""
+    fields = request.args.get('fields', '')
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+def not_modified(etag: str):
+    """رد 304 إذا كانت نسخة العميل (If-None-Match) مطابقة، وإلا None"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+def with_etag(response: Response, etag: str) -> Response:
+    """إضافة ETag إلى الرد مع إلزام المتصفح بالتحقق منه في كل طلب"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def conditional_json(payload: Dict[str, Any]) -> Response:
+    """رد JSON مع ETag من تجزئة المحتوى؛ 304 دون إعادة إرسال الجسم إذا لم يتغير"""
+    body = app.json.dumps(payload)
+    etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+    return not_modified(etag) or with_etag(Response(body, mimetype='application/json'), etag)
+
+def mirror_etag(path: str) -> Optional[str]:
+    """
+    ETag لجدول من رقم إصدار النسخة المحلية (دون قراءة الصفوف أو سؤال الجهاز)
+
+    Returns:
+        None إذا لم تكن النسخة المحلية مشغلة وحديثة
+    """
+    mirror = mirror_for(MIKROTIK_CONFIG['host'], MIKROTIK_CONFIG['port'])
+    if mirror is None or not mirror.is_fresh(path):
+        return None
+    # الحقول المطلوبة تغير الجسم فهي جزء من الإصدار
+    fields = hashlib.sha1(','.join(requested_fields()).encode('utf-8')).hexdigest()[:8]
+    return f"{mirror.epoch}-{mirror.version(path)}-{fields}"
+
+def release_on_close(response: Response, mt, rows) -> Response:
+    """
+    إغلاق مولد الصفوف وإرجاع الجلسة إلى المجمع عند إغلاق الرد
+
+    الخادم يغلق الرد حتى لو لم يُقرأ جسمه (طلب HEAD أو قطع العميل قبل البث)،
+    بينما لا يصل مولد الجسم الذي لم يبدأ إلى finally أبداً
+    """
+    def close():
+        try:
+            rows.close()
+        finally:
+            connection_pool.release(mt)
+
+    response.call_on_close(close)
+    return response
+
+def stream_json_rows(fetch_rows, chunk_size: int = 200):
+    """
+    بث قائمة JSON كبيرة مباشرة من مولد الصفوف دون تجميعها في الذاكرة
+
+    Args:
+        fetch_rows: دالة تستقبل اتصال MikroTik وتعيد مولد صفوف
+        chunk_size: عدد الصفوف في كل دفعة مرسلة
+    """
+    mt = connection_pool.acquire()
+    try:
+        rows = fetch_rows(mt)
+        # قراءة أول صف قبل إرسال الترويسات حتى تظهر أخطاء الاتصال كـ 500
+        first = next(rows, None)
+    except Exception:
+        connection_pool.release(mt)
+        raise
+
+    def generate():
+        try:
+            yield '{"data": ['
+            if first is not None:
+                buffer = [app.json.dumps(first)]
+                for row in rows:
+                    buffer.append(',' + app.json.dumps(row))
+                    if len(buffer) >= chunk_size:
+                        yield ''.join(buffer)
+                        buffer = []
+                yield ''.join(buffer)
+            yield '], "success": true}'
+        except Exception as e:
+            logger.error(f"خطأ أثناء بث البيانات: {e}")
+            yield '], "success": false, "error": ' + app.json.dumps(str(e)) + '}'
+
+    return release_on_close(Response(generate(), mimetype='application/json'), mt, rows)
+
+# أعمدة ملف التصدير (مفاتيح format_user_details)
+EXPORT_COLUMNS = ('type', 'id', 'name', 'password', 'profile', 'comment', 'disabled', 'rate_limit', 'data_limit')
+
+def stream_export(rows, fmt: str, compress: bool, chunk_size: int = 500):
+    """
+    مولد ملف التصدير (CSV أو NDJSON) على دفعات، مضغوط بـ gzip عند الطلب
+
+    Args:
+        rows: مولد صفوف format_user_details
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31: ترويسة gzip
+    text = io.StringIO()
+    writer = csv.DictWriter(text, EXPORT_COLUMNS, extrasaction='ignore')
+
+    def emit(final: bool = False):
+        data = text.getvalue().encode('utf-8')
+        text.seek(0)
+        text.truncate()
+        if compressor is not None:
+            data = compressor.compress(data) + (compressor.flush() if final else b'')
+        return data
+
+    if fmt == 'csv':
+        # BOM حتى يفتح Excel الأسماء العربية بشكل صحيح
+        text.write('\ufeff')
+        writer.writeheader()
+    count = 0
+    for row in rows:
+        if fmt == 'csv':
+            writer.writerow({
+                key: ('true' if value else 'false') if isinstance(value, bool) else value
+                for key, value in row.items()
+            })
+        else:
+            text.write(app.json.dumps(row) + '\n')
+        count += 1
+        if count % chunk_size == 0:
+            data = emit()
+            if data:
+                yield data
+    yield emit(final=True)
+
 @app.route('/')
 def index():
     """الصفحة الرئيسية"""
     return render_template('index.html')
 
+def dashboard_snapshot(name: str, format_value=None):
+    """رد JSON بآخر لقطة للمورد وعمرها بالثواني (دون انتظار الجهاز)"""
+    value, age, error = dashboard_refresher.get(name)
+    if value is None:
+        raise ConnectionError(error or "لم تُقرأ البيانات من الجهاز بعد")
+    return jsonify({
+        'success': True,
+        'data': format_value(value) if format_value else value,
+        'age': round(age, 1),
+        'error': error
+    })
+
 @app.route('/api/system-info')
 def api_system_info():
     """API للحصول على معلومات النظام"""
     try:
-        with get_mikrotik_connection() as mt:
-            system_info = mt.get_system_info()
-            return jsonify({
-                'success': True,
-                'data': system_info
-            })
+        return dashboard_snapshot('system-resource')
     except Exception as e:
         logger.error(f"خطأ في الحصول على معلومات النظام: {e}")
         return jsonify({
@@ -64,13 +373,36 @@ def api_system_info():
             'error': str(e)
         }), 500
 
+@app.route('/api/dashboard')
+def api_dashboard():
+    """API لكل بيانات الصفحة الرئيسية في طلب واحد (جلسة واحدة ورحلة واحدة إلى الجهاز)"""
+    try:
+        # موارد النظام من لقطة الخلفية إن وجدت، والباقي دفعة موسومة واحدة
+        system_info, age, _ = dashboard_refresher.get('system-resource')
+        with get_mikrotik_connection() as mt:
+            dashboard = mt.get_dashboard(resources=system_info is None)
+        if system_info is not None:
+            dashboard['system_info'] = system_info
+            dashboard['system_resources'] = format_system_resources(system_info)
+        return jsonify({
+            'success': True,
+            'data': dashboard,
+            'age': None if age is None else round(age, 1)
+        })
+    except Exception as e:
+        logger.error(f"خطأ في الحصول على بيانات لوحة التحكم: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/active-users')
 def api_active_users():
     """API للحصول على المستخدمين المتصلين"""
     try:
         with get_mikrotik_connection() as mt:
             users = mt.get_active_users()
-            return jsonify({
+            return conditional_json({
                 'success': True,
                 'data': users,
                 'count': len(users)
@@ -82,13 +414,39 @@ def api_active_users():
             'error': str(e)
         }), 500
 
+@app.route('/api/active-users/stream')
+def api_active_users_stream():
+    """بث SSE للمستخدمين المتصلين: snapshot أولاً ثم join و leave و update"""
+    subscription = session_feed.subscribe()
+
+    def generate():
+        try:
+            # المتصفح يعيد الاتصال تلقائياً بعد 3 ثوانٍ إذا انقطع البث
+            yield 'retry: 3000\n\n'
+            while not subscription.closed:
+                event = subscription.next(timeout=SSE_KEEPALIVE)
+                if event is None:
+                    # تعليق يبقي الاتصال مفتوحاً عبر الوسطاء ويكشف إغلاق المتصفح
+                    yield ': keepalive\n\n'
+                    continue
+                sequence, kind, data = event
+                yield f'id: {sequence}\nevent: {kind}\ndata: {app.json.dumps(data)}\n\n'
+        finally:
+            session_feed.unsubscribe(subscription)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/interfaces')
 def api_interfaces():
     """API للحصول على الواجهات"""
     try:
         with get_mikrotik_connection() as mt:
-            interfaces = mt.get_interfaces()
-            return jsonify({
+            interfaces = mt.get_interfaces(requested_fields())
+            return conditional_json({
                 'success': True,
                 'data': interfaces
             })
@@ -104,8 +462,8 @@ def api_ip_addresses():
     """API للحصول على عناوين IP"""
     try:
         with get_mikrotik_connection() as mt:
-            addresses = mt.get_ip_addresses()
-            return jsonify({
+            addresses = mt.get_ip_addresses(requested_fields())
+            return conditional_json({
                 'success': True,
                 'data': addresses
             })
@@ -155,12 +513,15 @@ def api_disconnect_user():
 def api_ppp_secrets():
     """API للحصول على مستخدمي PPP"""
     try:
-        with get_mikrotik_connection() as mt:
-            secrets = mt.get_ppp_secrets()
-            return jsonify({
-                'success': True,
-                'data': secrets
-            })
+        # النسخة المحلية لم تتغير منذ آخر طلب: 304 دون قراءة الجدول
+        etag = mirror_etag('/ppp/secret')
+        if etag:
+            cached = not_modified(etag)
+            if cached:
+                return cached
+        extra_fields = requested_fields()
+        response = stream_json_rows(lambda mt: mt.iter_ppp_secrets(extra_fields))
+        return with_etag(response, etag) if etag else response
     except Exception as e:
         logger.error(f"خطأ في الحصول على مستخدمي PPP: {e}")
         return jsonify({
@@ -346,8 +707,8 @@ def api_ppp_profiles():
     """API للحصول على ملفات PPP الشخصية"""
     try:
         with get_mikrotik_connection() as mt:
-            profiles = mt.get_ppp_profiles()
-            return jsonify({
+            profiles = mt.get_ppp_profiles(requested_fields())
+            return conditional_json({
                 'success': True,
                 'data': profiles
             })
@@ -369,61 +730,528 @@ def api_create_bulk_users():
         profile = data.get('profile', 'default')
         user_type = data.get('user_type', 'ppp')  # 'ppp' أو 'hotspot'
         server = data.get('server', 'all')  # للـ Hotspot فقط
-        name_type = data.get('name_type', 'prefix')  # 'prefix', 'arabic', 'custom'
+        name_type = data.get('name_type', 'prefix')  # 'prefix', 'arabic', 'custom', 'random'
         custom_names = data.get('custom_names', [])  # للأسماء المخصصة
+        password_alphabet = data.get('password_alphabet') or PASSWORD_ALPHABET
+
+        try:
+            resolve_alphabet(password_alphabet)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
 
         # التحقق من الحد الأقصى
         if name_type == 'custom':
             count = len(custom_names)
 
-        if count > 1000:  # حد أقصى للأمان
+        # الأسماء المخصصة والعشوائية تُحدد كلها قبل الإرسال فلا تُستأنف على دفعات
+        listed_names = name_type in ('custom', 'random')
+        if count > BULK_MAX_USERS or (listed_names and count > BULK_MEMORY_LIMIT):
             return jsonify({
                 'success': False,
-                'error': 'العدد الأقصى المسموح هو 1000 مستخدم'
+                'error': f'العدد الأقصى المسموح هو {BULK_MAX_USERS} مستخدم '
+                         f'({BULK_MEMORY_LIMIT} للأسماء المخصصة أو العشوائية)'
+            }), 400
+
+        # الإنشاء مهمة في الخلفية؛ الرد فوري برقم المهمة إلا إذا طُلب الانتظار (wait)
+        kind = 'hotspot' if user_type == 'hotspot' else 'ppp'
+        resumable = count > BULK_MEMORY_LIMIT or (data.get('resumable') and not listed_names)
+        if resumable:
+            # الأسماء وكلمات المرور تُولد لكل دفعة وتُحفظ قبل إرسالها
+            job = bulk_jobs.submit_job(CheckpointedBulkJob(
+                bulk_jobs.new_id(), JOB_DIR, connection_pool, {
+                    'user_type': kind, 'prefix': prefix, 'count': count,
+                    'password_length': password_length, 'profile': profile, 'server': server,
+                    'password_alphabet': password_alphabet
+                }, RESUMABLE_CHUNK
+            ))
+            skipped = []
+        else:
+            # فحص التكرار محلياً قبل الإرسال: الأسماء المرقمة والعشوائية تتخطى الموجود، والمخصصة الموجودة تُستبعد
+            with get_mikrotik_connection() as mt:
+                taken = mt.user_names(USER_PATHS[kind])
+            usernames = bulk_usernames(prefix, count, name_type, custom_names, taken)
+            skipped = [username for username in usernames if username in taken]
+            if skipped:
+                usernames = [username for username in usernames if username not in taken]
+                count = len(usernames)
+            created_users, commands = bulk_writer.prepare_users(
+                kind, usernames, password_length, profile, server, password_alphabet
+            )
+            job = bulk_jobs.submit(
+                kind, created_users, commands, on_results=bulk_writer.apply_results,
+                meta={'profile': profile, 'name_type': name_type}
+            )
+
+        if resumable or not data.get('wait'):
+            return jsonify({
+                'success': True,
+                'message': f'بدأ إنشاء {count} مستخدم {user_type.upper()} في الخلفية',
+                'job_id': job.id,
+                'skipped': skipped,
+                'progress_url': url_for('api_bulk_job', job_id=job.id),
+                'stream_url': url_for('api_bulk_job_stream', job_id=job.id),
+                'cancel_url': url_for('api_cancel_bulk_job', job_id=job.id)
+            }), 202
+
+        job.wait(job.total, None)
+        success_count = len([u for u in created_users if u['status'] == 'تم الإنشاء'])
+
+        return jsonify({
+            'success': True,
+            'message': f'تم إنشاء {success_count} من أصل {count} مستخدم {user_type.upper()}',
+            'data': created_users,
+            'skipped': skipped,
+            'summary': {
+                'total': count,
+                'success': success_count,
+                'failed': count - success_count,
+                'skipped': len(skipped),
+                'type': user_type,
+                'name_type': name_type
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"خطأ في إنشاء المستخدمين بالجملة: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/bulk-jobs')
+def api_bulk_jobs():
+    """API لقائمة مهام الإنشاء بالجملة (دون نتائج المستخدمين)"""
+    jobs = []
+    for job in bulk_jobs.jobs():
+        progress = job.progress(job.total)
+        del progress['results']
+        jobs.append(progress)
+    return jsonify({
+        'success': True,
+        'data': jobs
+    })
+
+def find_bulk_job(job_id: str):
+    """المهمة برقمها أو رد 404"""
+    job = bulk_jobs.get(job_id)
+    if job is None:
+        return None, (jsonify({
+            'success': False,
+            'error': 'المهمة غير موجودة'
+        }), 404)
+    return job, None
+
+@app.route('/api/bulk-jobs/<job_id>')
+def api_bulk_job(job_id):
+    """API لتقدم مهمة ونتائج المستخدمين من الموضع since (?since=&limit=)"""
+    job, error = find_bulk_job(job_id)
+    if error:
+        return error
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', JOB_RESULTS_PAGE, type=int)
+    return jsonify({
+        'success': True,
+        'data': job.progress(max(0, since), max(1, min(limit, JOB_RESULTS_PAGE)))
+    })
+
+@app.route('/api/bulk-jobs/<job_id>/stream')
+def api_bulk_job_stream(job_id):
+    """بث SSE لتقدم المهمة: حدث progress مع كل دفعة جديدة ثم done"""
+    job, error = find_bulk_job(job_id)
+    if error:
+        return error
+    # عند إعادة الاتصال يكمل المتصفح من آخر موضع استلمه
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+
+    def generate():
+        position = since
+        yield 'retry: 3000\n\n'
+        while True:
+            if not job.wait(position, SSE_KEEPALIVE):
+                yield ': keepalive\n\n'
+                continue
+            progress = job.progress(position, JOB_RESULTS_PAGE)
+            position = progress['next']
+            finished = progress['status'] in ('completed', 'cancelled', 'failed')
+            kind = 'done' if finished and position >= progress['done'] else 'progress'
+            yield f'id: {position}\nevent: {kind}\ndata: {app.json.dumps(progress)}\n\n'
+            if kind == 'done':
+                return
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/bulk-jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_bulk_job(job_id):
+    """API لإلغاء مهمة (الدفعات الجارية تكتمل والباقي لا يُرسل)"""
+    job, error = find_bulk_job(job_id)
+    if error:
+        return error
+    if not job.cancel():
+        return jsonify({
+            'success': False,
+            'error': 'المهمة منتهية بالفعل'
+        }), 409
+    return jsonify({
+        'success': True,
+        'message': 'تم طلب إلغاء المهمة',
+        'data': job.progress(job.total)
+    })
+
+def parse_flag(value: Any, field: str) -> bool:
+    """
+    قيمة منطقية من الطلب: true/false في JSON أو النصوص true/false و 1/0 و yes/no
+
+    Raises:
+        ValueError: قيمة أخرى (bool("false") يساوي True فلا يُستخدم bool)
+    """
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('true', '1', 'yes'):
+        return True
+    if text in ('false', '0', 'no'):
+        return False
+    raise ValueError(f'{field} يجب أن يكون true أو false')
+
+def selector_from(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    محدد المستخدمين من الطلب (profile و comment و disabled) أو None إذا كان فارغاً
+
+    Raises:
+        ValueError: محدد غير صالح
+    """
+    selector = data.get('selector') or {}
+    if not isinstance(selector, dict):
+        raise ValueError('المحدد (selector) يجب أن يكون كائناً')
+    disabled = selector.get('disabled')
+    criteria = {
+        'profile': selector.get('profile') or None,
+        'comment': selector.get('comment') or None,
+        'disabled': None if disabled in (None, '') else parse_flag(disabled, 'selector.disabled')
+    }
+    if all(value is None for value in criteria.values()):
+        return None
+    return criteria
+
+@app.route('/api/bulk-user-action', methods=['POST'])
+def api_bulk_user_action():
+    """
+    API لتنفيذ إجراء على عدة مستخدمين في طلب واحد
+
+    {"action": "disable", "user_type": "hotspot", "usernames": [...]}
+    أو {"action": "disable", "user_type": "both", "selector": {"profile": ..., "comment": ..., "disabled": ...}}
+    الإجراءات: enable و disable و delete و renew و reset
+    """
+    try:
+        data = request.get_json() or {}
+        action = data.get('action')
+        user_type = data.get('user_type', 'ppp')
+        usernames = data.get('usernames') or []
+        try:
+            selector = selector_from(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        if action not in BATCH_ACTIONS:
+            return jsonify({
+                'success': False,
+                'error': f'الإجراء غير معروف، المتاح: {", ".join(BATCH_ACTIONS)}'
+            }), 400
+        if bool(usernames) == bool(selector):
+            return jsonify({
+                'success': False,
+                'error': 'يجب تحديد قائمة أسماء المستخدمين أو محدد (selector) واحد منهما فقط'
+            }), 400
+        if user_type not in ('ppp', 'hotspot') and not (selector and user_type == 'both'):
+            return jsonify({
+                'success': False,
+                'error': 'نوع المستخدم يجب أن يكون ppp أو hotspot (أو both مع المحدد)'
+            }), 400
+
+        # الاسم ← المعرف لكل نوع؛ المحدد يعطي المعرفات مباشرة
+        targets = {}
+        if selector:
+            with get_mikrotik_connection() as mt:
+                for user in mt.select_users(user_type, **selector):
+                    targets.setdefault(user['type'], {})[user['name']] = user['id']
+        else:
+            targets[user_type] = None
+
+        count = sum(len(usernames) if ids is None else len(ids) for ids in targets.values())
+        if count > BULK_MAX_USERS:
+            return jsonify({
+                'success': False,
+                'error': f'العدد الأقصى المسموح هو {BULK_MAX_USERS} مستخدم'
+            }), 400
+
+        results = []
+        for kind, ids in targets.items():
+            results.extend(bulk_writer.run_action(
+                kind, action, usernames if ids is None else list(ids),
+                int(data.get('password_length', 8)), known_ids=ids
+            ))
+
+        success_count = sum(1 for result in results if result['status'] == 'تم')
+        return jsonify({
+            'success': True,
+            'message': f'تم تنفيذ {action} على {success_count} من أصل {len(results)} مستخدم',
+            'data': results,
+            'summary': {
+                'total': len(results),
+                'success': success_count,
+                'failed': len(results) - success_count,
+                'action': action
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"خطأ في تنفيذ الإجراء على المستخدمين: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/bulk-user-policy', methods=['POST'])
+def api_bulk_user_policy():
+    """
+    API لتطبيق حد السرعة و/أو حد البيانات على كل المستخدمين المطابقين للمحدد
+
+    {"user_type": "hotspot", "selector": {"profile": "10M"}, "upload_speed": "2M",
+     "download_speed": "10M", "data_limit_gb": 50}
+    ذكر upload_speed أو download_speed (ولو فارغين) يغير rate-limit؛ data_limit_gb أكبر من صفر يغير حد البيانات
+    """
+    try:
+        data = request.get_json() or {}
+        user_type = data.get('user_type', 'both')
+        try:
+            selector = selector_from(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        set_speed = 'upload_speed' in data or 'download_speed' in data
+        data_limit_gb = float(data.get('data_limit_gb') or 0)
+
+        if user_type not in ('ppp', 'hotspot', 'both'):
+            return jsonify({
+                'success': False,
+                'error': 'نوع المستخدم يجب أن يكون ppp أو hotspot أو both'
+            }), 400
+        if selector is None and user_type == 'both':
+            # حماية من تطبيق السياسة على كل المستخدمين بالخطأ
+            return jsonify({
+                'success': False,
+                'error': 'يجب تحديد المحدد (selector) أو نوع المستخدم'
+            }), 400
+        if not set_speed and data_limit_gb <= 0:
+            return jsonify({
+                'success': False,
+                'error': 'يجب تحديد حد السرعة أو حد البيانات'
             }), 400
 
         with get_mikrotik_connection() as mt:
-            if user_type == 'hotspot':
-                created_users = mt.create_bulk_hotspot_users(
-                    prefix, count, password_length, profile, server, name_type, custom_names
-                )
-            else:  # PPP
-                created_users = mt.create_bulk_users(
-                    prefix, count, password_length, profile, name_type, custom_names
+            matches = mt.select_users(user_type, **(selector or {}))
+
+        if len(matches) > BULK_MAX_USERS:
+            return jsonify({
+                'success': False,
+                'error': f'العدد الأقصى المسموح هو {BULK_MAX_USERS} مستخدم'
+            }), 400
+
+        targets = {}
+        for user in matches:
+            targets.setdefault(user['type'], {})[user['name']] = user['id']
+
+        results = []
+        for kind, users in targets.items():
+            arguments = {}
+            if set_speed:
+                arguments['rate-limit'] = build_rate_limit(
+                    str(data.get('upload_speed', '')).strip(), str(data.get('download_speed', '')).strip()
                 )
+            if data_limit_gb > 0:
+                arguments.update(build_data_limit_params(kind, data_limit_gb))
+            results.extend(bulk_writer.apply_policy(kind, users, arguments))
+
+        success_count = sum(1 for result in results if result['status'] == 'تم')
+        return jsonify({
+            'success': True,
+            'message': f'تم تحديث {success_count} من أصل {len(results)} مستخدم',
+            'data': results,
+            'summary': {
+                'total': len(results),
+                'success': success_count,
+                'failed': len(results) - success_count
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"خطأ في تطبيق السياسة على المستخدمين: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-            success_count = len([u for u in created_users if u['status'] == 'تم الإنشاء'])
+@app.route('/api/sync-users', methods=['POST'])
+def api_sync_users():
+    """
+    API لمزامنة المستخدمين مع قائمة الحالة المطلوبة
+
+    {"users": [{"name", "type", "password", "profile", "disabled", "comment"}, ...],
+     "prune": false, "dry_run": true}
+    dry_run يعيد الخطة فقط؛ prune يحذف مستخدمي الأنواع المزامنة غير الموجودين في القائمة
+    """
+    try:
+        data = request.get_json() or {}
+        users = data.get('users')
 
+        if not isinstance(users, list):
+            return jsonify({
+                'success': False,
+                'error': 'قائمة المستخدمين (users) مطلوبة'
+            }), 400
+        if len(users) > BULK_MAX_USERS:
+            return jsonify({
+                'success': False,
+                'error': f'العدد الأقصى المسموح هو {BULK_MAX_USERS} مستخدم'
+            }), 400
+
+        plan = user_sync.plan(users, prune=bool(data.get('prune')), user_types=data.get('user_types'))
+        if data.get('dry_run'):
             return jsonify({
                 'success': True,
-                'message': f'تم إنشاء {success_count} من أصل {count} مستخدم {user_type.upper()}',
-                'data': created_users,
-                'summary': {
-                    'total': count,
-                    'success': success_count,
-                    'failed': count - success_count,
-                    'type': user_type,
-                    'name_type': name_type
-                }
+                'message': 'معاينة المزامنة دون تنفيذ',
+                'data': plan.report()
             })
 
+        report = user_sync.apply(plan)
+        return jsonify({
+            'success': report['failed_count'] == 0,
+            'message': f"تمت المزامنة: إضافة {report['applied']['add']}، تعديل {report['applied']['set']}، "
+                       f"حذف {report['applied']['remove']}، فشل {report['failed_count']}",
+            'data': report
+        })
+
     except Exception as e:
-        logger.error(f"خطأ في إنشاء المستخدمين بالجملة: {e}")
+        logger.error(f"خطأ في مزامنة المستخدمين: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/import-users', methods=['POST'])
+def api_import_users():
+    """
+    API لاستيراد مستخدمين من ملف CSV أو NDJSON (?user_type=hotspot&format=csv)
+
+    الملف كجسم الطلب مباشرة أو كحقل file في نموذج multipart؛ الأعمدة:
+    username و password و profile و server و comment و limit-uptime و limit-bytes-in/out/total
+    """
+    try:
+        user_type = request.args.get('user_type', 'ppp')
+        upload = request.files.get('file')
+        fmt = request.args.get('format')
+        if not fmt:
+            # من امتداد الملف أو نوع المحتوى
+            source = (upload.filename if upload else '') or request.mimetype or ''
+            fmt = 'ndjson' if 'json' in source.lower() else 'csv'
+
+        if user_type not in USER_PATHS:
+            return jsonify({
+                'success': False,
+                'error': 'نوع المستخدم يجب أن يكون ppp أو hotspot'
+            }), 400
+        if fmt not in IMPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f'الصيغة يجب أن تكون {" أو ".join(IMPORT_FORMATS)}'
+            }), 400
+
+        stream = upload.stream if upload else request.stream
+        report = user_importer.run(user_type, iter_rows(stream, fmt), max_rows=BULK_MAX_USERS)
+
+        message = f"تم إنشاء {report['created']} من أصل {report['total']} مستخدم {user_type.upper()}"
+        if report['truncated']:
+            message += f' (توقف الاستيراد عند الحد الأقصى {BULK_MAX_USERS})'
+        return jsonify({
+            'success': True,
+            'message': message,
+            'data': report
+        })
+
+    except Exception as e:
+        logger.error(f"خطأ في استيراد المستخدمين: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/export-users')
+def api_export_users():
+    """
+    API لتصدير مستخدمي PPP و Hotspot كملف CSV أو NDJSON يُبث مباشرة من رد الجهاز
+
+    ?format=csv|ndjson&user_type=both&profile=...&comment=...&gzip=1
+    """
+    fmt = request.args.get('format', 'csv')
+    user_type = request.args.get('user_type', 'both')
+    profile = request.args.get('profile') or None
+    comment = request.args.get('comment') or None
+    compress = request.args.get('gzip') in ('1', 'true', 'yes')
+
+    if fmt not in IMPORT_FORMATS or user_type not in ('ppp', 'hotspot', 'both'):
+        return jsonify({
+            'success': False,
+            'error': 'الصيغة يجب أن تكون csv أو ndjson والنوع ppp أو hotspot أو both'
+        }), 400
+
+    mt = connection_pool.acquire()
+    try:
+        rows = mt.iter_users(user_type, profile, comment, detailed=True)
+        # قراءة أول صف قبل إرسال الترويسات حتى تظهر أخطاء الاتصال كـ 500
+        first = next(rows, None)
+    except Exception as e:
+        connection_pool.release(mt, discard=not mt.is_connected())
+        logger.error(f"خطأ في تصدير المستخدمين: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+    def generate():
+        try:
+            yield from stream_export(
+                itertools.chain([first] if first is not None else [], rows), fmt, compress
+            )
+        except Exception as e:
+            # الترويسات أُرسلت: يُقطع الملف ويُسجل الخطأ
+            logger.error(f"خطأ أثناء بث ملف التصدير: {e}")
+
+    filename = f"users-{user_type}.{fmt}" + ('.gz' if compress else '')
+    mimetype = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    # قراءة iter_command الجارية تحجز قفل الجلسة حتى يُغلق الرد
+    return release_on_close(Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    }), mt, rows)
+
 @app.route('/api/system-resources')
 def api_system_resources():
     """API للحصول على موارد النظام المفصلة"""
     try:
-        with get_mikrotik_connection() as mt:
-            resources = mt.get_system_resources()
-            return jsonify({
-                'success': True,
-                'data': resources
-            })
+        return dashboard_snapshot('system-resource', format_system_resources)
     except Exception as e:
         logger.error(f"خطأ في الحصول على موارد النظام: {e}")
         return jsonify({
@@ -431,18 +1259,39 @@ def api_system_resources():
             'error': str(e)
         }), 500
 
+@app.route('/api/pool-stats')
+def api_pool_stats():
+    """API لإحصائيات مجمع الاتصالات"""
+    mirror = mirror_for(MIKROTIK_CONFIG['host'], MIKROTIK_CONFIG['port'])
+    return jsonify({
+        'success': True,
+        'data': connection_pool.stats(),
+        'bulk_writer': bulk_writer.stats(),
+        'bulk_jobs': bulk_jobs.stats(),
+        'circuit': router_breaker().stats(),
+        'cache': cache_for(MIKROTIK_CONFIG['host'], MIKROTIK_CONFIG['port']).stats(),
+        'index': index_for(MIKROTIK_CONFIG['host'], MIKROTIK_CONFIG['port']).stats(),
+        'coalescing': flight_for(MIKROTIK_CONFIG['host'], MIKROTIK_CONFIG['port']).stats(),
+        'refresher': dashboard_refresher.stats(),
+        'session_feed': session_feed.stats(),
+        'mirror': mirror.stats() if mirror else None
+    })
+
 # ==================== APIs لـ Hotspot ====================
 
 @app.route('/api/hotspot-users')
 def api_hotspot_users():
     """API للحصول على مستخدمي Hotspot"""
     try:
-        with get_mikrotik_connection() as mt:
-            users = mt.get_hotspot_users()
-            return jsonify({
-                'success': True,
-                'data': users
-            })
+        # النسخة المحلية لم تتغير منذ آخر طلب: 304 دون قراءة الجدول
+        etag = mirror_etag('/ip/hotspot/user')
+        if etag:
+            cached = not_modified(etag)
+            if cached:
+                return cached
+        extra_fields = requested_fields()
+        response = stream_json_rows(lambda mt: mt.iter_hotspot_users(extra_fields))
+        return with_etag(response, etag) if etag else response
     except Exception as e:
         logger.error(f"خطأ في الحصول على مستخدمي Hotspot: {e}")
         return jsonify({
@@ -615,8 +1464,8 @@ def api_hotspot_profiles():
     """API للحصول على ملفات Hotspot الشخصية"""
     try:
         with get_mikrotik_connection() as mt:
-            profiles = mt.get_hotspot_profiles()
-            return jsonify({
+            profiles = mt.get_hotspot_profiles(requested_fields())
+            return conditional_json({
                 'success': True,
                 'data': profiles
             })
@@ -632,8 +1481,8 @@ def api_hotspot_servers():
     """API للحصول على خوادم Hotspot"""
     try:
         with get_mikrotik_connection() as mt:
-            servers = mt.get_hotspot_servers()
-            return jsonify({
+            servers = mt.get_hotspot_servers(requested_fields())
+            return conditional_json({
                 'success': True,
                 'data': servers
             })
@@ -827,7 +1676,7 @@ def settings_page():
 def test_connection():
     """اختبار الاتصال"""
     try:
-        mt = get_mikrotik_connection()
+        mt = create_mikrotik_connection()
         if mt.connect():
             mt.disconnect()
             flash('تم الاتصال بنجاح! ✅', 'success')
@@ -866,10 +1715,16 @@ def update_settings():
             return redirect(url_for('settings_page'))
 
         # تحديث الإعدادات في الذاكرة
+        stop_mirror(MIKROTIK_CONFIG['host'], MIKROTIK_CONFIG['port'])
         MIKROTIK_CONFIG['host'] = new_host
         MIKROTIK_CONFIG['port'] = int(new_port)
         MIKROTIK_CONFIG['username'] = new_username
         MIKROTIK_CONFIG['password'] = new_password
+        connection_pool.reconfigure(new_host, new_username, new_password, int(new_port))
+        dashboard_refresher.clear()
+        session_feed.clear()
+        if _background_started:
+            start_user_mirror()
 
         # كتابة الإعدادات الجديدة في ملف .env
         env_content = f"""# إعدادات الاتصال بـ MikroTik
@@ -890,7 +1745,7 @@ SECRET_KEY=your-secret-key-here-change-this"""
 
         # اختبار الاتصال بالإعدادات الجديدة
         try:
-            mt = get_mikrotik_connection()
+            mt = create_mikrotik_connection()
             if mt.connect():
                 mt.disconnect()
                 flash('تم اختبار الاتصال بنجاح! 🎉', 'success')
@@ -929,6 +1784,9 @@ if __name__ == '__main__':
     print(f"🌐 الواجهة: http://localhost:{port}")
     print("=" * 50)
     
+    # مع debug يعمل الخادم في عملية فرعية من المُعيد (reloader)؛ المهام الخلفية تبدأ فيها وحدها
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
     app.run(debug=debug_mode, port=port, host='0.0.0.0')
 
 # وظائف QR Code والعملات المتنوعة
@@ -1087,8 +1945,8 @@ def delete_ppp_user():
         if not username:
             return jsonify({'success': False, 'message': 'اسم المستخدم مطلوب'})
         
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        result = mikrotik.delete_ppp_user(username)
+        with get_mikrotik_connection() as mikrotik:
+            result = mikrotik.delete_ppp_user_by_name(username)
         
         if result:
             return jsonify({'success': True, 'message': 'تم حذف المستخدم بنجاح'})
@@ -1108,8 +1966,8 @@ def delete_hotspot_user():
         if not username:
             return jsonify({'success': False, 'message': 'اسم المستخدم مطلوب'})
         
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        result = mikrotik.delete_hotspot_user(username)
+        with get_mikrotik_connection() as mikrotik:
+            result = mikrotik.delete_hotspot_user_by_name(username)
         
         if result:
             return jsonify({'success': True, 'message': 'تم حذف المستخدم بنجاح'})
@@ -1130,8 +1988,8 @@ def toggle_ppp_user():
         if not username:
             return jsonify({'success': False, 'message': 'اسم المستخدم مطلوب'})
         
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        result = mikrotik.toggle_ppp_user(username, disabled)
+        with get_mikrotik_connection() as mikrotik:
+            result = mikrotik.toggle_ppp_user(username, disabled)
         
         if result:
             status = 'تعطيل' if disabled else 'تفعيل'
@@ -1153,8 +2011,8 @@ def toggle_hotspot_user():
         if not username:
             return jsonify({'success': False, 'message': 'اسم المستخدم مطلوب'})
         
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        result = mikrotik.toggle_hotspot_user(username, disabled)
+        with get_mikrotik_connection() as mikrotik:
+            result = mikrotik.toggle_hotspot_user(username, disabled)
         
         if result:
             status = 'تعطيل' if disabled else 'تفعيل'
@@ -1175,8 +2033,8 @@ def renew_ppp_user():
         if not username:
             return jsonify({'success': False, 'message': 'اسم المستخدم مطلوب'})
         
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        result = mikrotik.renew_ppp_user(username)
+        with get_mikrotik_connection() as mikrotik:
+            result = mikrotik.renew_ppp_user(username)
         
         if result:
             return jsonify({'success': True, 'message': 'تم تجديد المستخدم بنجاح'})
@@ -1196,8 +2054,8 @@ def renew_hotspot_user():
         if not username:
             return jsonify({'success': False, 'message': 'اسم المستخدم مطلوب'})
         
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        result = mikrotik.renew_hotspot_user(username)
+        with get_mikrotik_connection() as mikrotik:
+            result = mikrotik.renew_hotspot_user(username)
         
         if result:
             return jsonify({'success': True, 'message': 'تم تجديد المستخدم بنجاح'})
@@ -1217,8 +2075,8 @@ def reset_ppp_user():
         if not username:
             return jsonify({'success': False, 'message': 'اسم المستخدم مطلوب'})
         
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        result = mikrotik.reset_ppp_user(username)
+        with get_mikrotik_connection() as mikrotik:
+            result = mikrotik.reset_ppp_user(username)
         
         if result:
             return jsonify({'success': True, 'message': 'تم إعادة ضبط المستخدم بنجاح'})
@@ -1238,8 +2096,8 @@ def reset_hotspot_user():
         if not username:
             return jsonify({'success': False, 'message': 'اسم المستخدم مطلوب'})
         
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        result = mikrotik.reset_hotspot_user(username)
+        with get_mikrotik_connection() as mikrotik:
+            result = mikrotik.reset_hotspot_user(username)
         
         if result:
             return jsonify({'success': True, 'message': 'تم إعادة ضبط المستخدم بنجاح'})
@@ -1253,8 +2111,8 @@ def reset_hotspot_user():
 def get_hotspot_users():
     """الحصول على مستخدمي Hotspot"""
     try:
-        mikrotik = MikroTikManager(**MIKROTIK_CONFIG)
-        users = mikrotik.get_hotspot_users()
+        with get_mikrotik_connection() as mikrotik:
+            users = mikrotik.get_hotspot_users()
         
         return jsonify({
             'success': True,
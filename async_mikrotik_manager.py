@@ -0,0 +1,744 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+عميل RouterOS API غير متزامن (asyncio)
+نفس واجهة MikroTikManager لكن بدون حجز خيط أثناء انتظار الجهاز؛
+كل الأوامر موسومة بـ .tag فتشترك آلاف الأوامر المعلقة في مقبس واحد
+"""
+
+import asyncio
+import itertools
+from typing import Dict, List, Optional, Any, Sequence, Set, Tuple
+import logging
+
+from librouteros.exceptions import ConnectionClosed, FatalError, TrapError
+from librouteros.protocol import Encoder, Decoder
+
+from command_channel import CommandResult, Command, compose_words, parse_reply_word
+from metadata_cache import MetadataCache, cache_for, split_command
+from name_index import NameIndex, index_for
+from credentials import generator_for
+from mikrotik_manager import (
+    format_active_ppp_user, format_active_hotspot_user, format_interface,
+    format_ip_address, format_ppp_secret, format_user_traffic, format_ppp_profile,
+    format_system_resources, format_hotspot_user, format_hotspot_profile,
+    format_hotspot_server, format_user_details, format_user_summary,
+    build_ppp_user_params, build_hotspot_user_params, build_rate_limit, build_data_limit_params,
+    bulk_usernames, new_bulk_users,
+    projection, with_extra_fields, ACTIVE_PPP_FIELDS, ACTIVE_HOTSPOT_FIELDS, INTERFACE_FIELDS,
+    IP_ADDRESS_FIELDS, PPP_SECRET_FIELDS, USER_TRAFFIC_FIELDS, PPP_PROFILE_FIELDS,
+    HOTSPOT_USER_FIELDS, HOTSPOT_PROFILE_FIELDS, HOTSPOT_SERVER_FIELDS, USER_SUMMARY_FIELDS,
+    USER_DETAIL_FIELDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMikroTikManager:
+    """فئة غير متزامنة لإدارة أجهزة MikroTik RouterOS عبر API"""
+
+    def __init__(self, host: str, username: str, password: str, port: int = 2080,
+                 timeout: float = 10, max_in_flight: int = 1000, encoding: str = 'utf-8',
+                 cache: Optional[MetadataCache] = None, index: Optional[NameIndex] = None):
+        """
+        Args:
+            host: عنوان IP للجهاز
+            username: اسم المستخدم
+            password: كلمة المرور
+            port: منفذ API
+            timeout: مهلة الاتصال وانتظار رد كل أمر بالثواني
+            max_in_flight: أقصى عدد من الأوامر المعلقة على هذه الجلسة
+            encoding: ترميز الكلمات المرسلة والمستقبلة
+            cache: ذاكرة البيانات الثابتة (افتراضياً الذاكرة المشتركة لهذا الجهاز)
+            index: فهرس الاسم ← .id (افتراضياً الفهرس المشترك لهذا الجهاز)
+        """
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.encoding = encoding
+        self.cache = cache or cache_for(host, port)
+        self.index = index or index_for(host, port)
+        self.connected = False
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[str, Tuple[asyncio.Future, CommandResult]] = {}
+        self._tags = itertools.count(1)
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    # ==================== البروتوكول ====================
+
+    def _encode_sentence(self, *words: str) -> bytes:
+        """ترميز جملة API"""
+        encoded = bytearray()
+        for word in words:
+            raw = word.encode(self.encoding)
+            encoded += Encoder.encodeLength(len(raw)) + raw
+        encoded += b'\x00'
+        return bytes(encoded)
+
+    async def _write_sentence(self, *words: str):
+        """كتابة جملة على المقبس"""
+        async with self._write_lock:
+            self._writer.write(self._encode_sentence(*words))
+            await self._writer.drain()
+
+    async def _read_word(self) -> str:
+        """قراءة كلمة واحدة"""
+        first = await self._reader.readexactly(1)
+        if first == b'\x00':
+            return ''
+        extra = Decoder.determineLength(first)
+        if extra:
+            first += await self._reader.readexactly(extra)
+        length = Decoder.decodeLength(first)
+        word = await self._reader.readexactly(length)
+        return word.decode(self.encoding, errors='ignore')
+
+    async def _read_sentence(self) -> Tuple[str, Optional[str], Dict]:
+        """قراءة جملة رد: (كلمة الرد، الوسم، السمات)"""
+        words = []
+        while True:
+            word = await self._read_word()
+            if word == '':
+                break
+            words.append(word)
+
+        reply_word, tag, attributes = words[0], None, {}
+        for word in words[1:]:
+            if word.startswith('.tag='):
+                tag = word[5:]
+            elif word.startswith('='):
+                key, value = parse_reply_word(word)
+                attributes[key] = value
+        if reply_word == '!fatal':
+            raise FatalError(words[1] if len(words) > 1 else '')
+        return reply_word, tag, attributes
+
+    async def _login(self):
+        """تسجيل الدخول (طريقة RouterOS 6.43 وما بعدها)"""
+        await self._write_sentence('/login', f'=name={self.username}', f'=password={self.password}')
+        error = None
+        while True:
+            reply_word, _, attributes = await self._read_sentence()
+            if reply_word == '!trap':
+                error = TrapError(message=str(attributes.get('message', '')),
+                                  category=attributes.get('category'))
+            elif reply_word == '!done':
+                break
+        if error is not None:
+            raise error
+
+    async def _reader_loop(self):
+        """توزيع الردود على الأوامر المعلقة حسب الوسم"""
+        error: Exception = ConnectionClosed('Connection unexpectedly closed.')
+        try:
+            while True:
+                reply_word, tag, attributes = await self._read_sentence()
+                entry = self._pending.get(tag)
+                if entry is None:
+                    logger.debug(f"رد بوسم غير معروف {tag}: {reply_word}")
+                    continue
+
+                future, result = entry
+                if reply_word == '!re':
+                    result.rows.append(attributes)
+                elif reply_word == '!trap':
+                    if result.error is None:
+                        result.error = TrapError(message=str(attributes.get('message', '')),
+                                                 category=attributes.get('category'))
+                elif reply_word == '!done':
+                    if attributes:
+                        result.rows.append(attributes)
+                    del self._pending[tag]
+                    if not future.done():
+                        future.set_result(result)
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, FatalError) as e:
+            logger.error(f"انقطع الاتصال بـ {self.host}:{self.port}: {e}")
+            error = ConnectionClosed(str(e) or 'Connection unexpectedly closed.')
+        finally:
+            self._fail_pending(error)
+            self._close_transport()
+
+    def _fail_pending(self, error: Exception):
+        """إنهاء كل الأوامر المعلقة بخطأ"""
+        pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def _close_transport(self):
+        """إغلاق المقبس دون انتظار"""
+        self.connected = False
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    # ==================== الاتصال ====================
+
+    async def connect(self) -> bool:
+        """
+        الاتصال بجهاز MikroTik
+
+        Returns:
+            True إذا نجح الاتصال، False إذا فشل
+        """
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        async with self._connect_lock:
+            if self.is_connected():
+                return True
+            try:
+                logger.info(f"محاولة الاتصال بـ {self.host}:{self.port}")
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout
+                )
+                await asyncio.wait_for(self._login(), self.timeout)
+                self.connected = True
+                self._reader_task = asyncio.ensure_future(self._reader_loop())
+                logger.info("تم الاتصال بنجاح!")
+                return True
+
+            except asyncio.TimeoutError:
+                logger.error("انتهت مهلة الاتصال")
+            except OSError as e:
+                logger.error(f"خطأ في الشبكة: {e}")
+            except Exception as e:
+                logger.error(f"خطأ في تسجيل الدخول: {e}")
+
+            self._close_transport()
+            return False
+
+    async def disconnect(self):
+        """قطع الاتصال"""
+        task, self._reader_task = self._reader_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._writer is not None:
+            self._close_transport()
+            logger.info("تم قطع الاتصال")
+
+    def is_connected(self) -> bool:
+        """فحص حالة الاتصال"""
+        return self.connected and self._writer is not None
+
+    async def __aenter__(self):
+        """دعم استخدام async with"""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """إغلاق الاتصال عند الخروج من async with"""
+        await self.disconnect()
+
+    # ==================== تنفيذ الأوامر ====================
+
+    async def _submit(self, command: str, arguments: Dict[str, Any] = None) -> CommandResult:
+        """إرسال أمر موسوم وانتظار نتيجته (أخطاء !trap تُحفظ في النتيجة)"""
+        if not self.is_connected() and not await self.connect():
+            raise ConnectionError("فشل في الاتصال بالجهاز")
+
+        async with self._slots:
+            tag = str(next(self._tags))
+            future = asyncio.get_running_loop().create_future()
+            self._pending[tag] = (future, CommandResult(command, arguments))
+            try:
+                await self._write_sentence(command, *compose_words(arguments), f'.tag={tag}')
+                return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"انتهت مهلة انتظار الأمر {command}")
+                raise
+            finally:
+                self._pending.pop(tag, None)
+                self.cache.invalidate(command)
+
+    async def execute_command(self, command: str, arguments: Dict[str, Any] = None) -> List[Dict]:
+        """
+        تنفيذ أمر RouterOS
+
+        Args:
+            command: الأمر المراد تنفيذه
+            arguments: معاملات الأمر
+
+        Returns:
+            قائمة بالنتائج
+        """
+        words = compose_words(arguments)
+        cacheable = self.cache.is_cacheable(command)
+        if cacheable:
+            cached = self.cache.lookup(command, words)
+            if cached is not None:
+                return cached
+            version = self.cache.version(split_command(command)[0])
+
+        try:
+            result = await self._submit(command, arguments)
+            rows = result.raise_for_error()
+            if cacheable:
+                self.cache.store(command, words, rows, version)
+            return rows
+        except Exception as e:
+            logger.error(f"خطأ في تنفيذ الأمر {command}: {e}")
+            raise
+
+    async def execute_batch(self, commands: Sequence[Command]) -> List[CommandResult]:
+        """تنفيذ عدة أوامر بالتوازي على نفس الجلسة وإرجاع النتائج بنفس الترتيب"""
+        return list(await asyncio.gather(
+            *(self._submit(command, arguments) for command, arguments in commands)
+        ))
+
+    # ==================== القراءة ====================
+
+    async def get_system_info(self) -> Dict:
+        """الحصول على معلومات النظام"""
+        try:
+            result = await self.execute_command('/system/resource/print')
+            if result:
+                return result[0]
+            return {}
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على معلومات النظام: {e}")
+            return {}
+
+    async def get_active_users(self) -> List[Dict]:
+        """الحصول على قائمة المستخدمين المتصلين"""
+        try:
+            ppp_result, hotspot_result = await self.execute_batch([
+                ('/ppp/active/print', projection(ACTIVE_PPP_FIELDS)),
+                ('/ip/hotspot/active/print', projection(ACTIVE_HOTSPOT_FIELDS))
+            ])
+            ppp_users = ppp_result.raise_for_error()
+
+            # قد لا يكون Hotspot مفعل
+            hotspot_users = hotspot_result.rows if hotspot_result.ok else []
+
+            all_users = [format_active_ppp_user(user) for user in ppp_users]
+            all_users.extend(format_active_hotspot_user(user) for user in hotspot_users)
+            return all_users
+
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على المستخدمين: {e}")
+            return []
+
+    async def get_interfaces(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة الواجهات (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
+        try:
+            interfaces = await self.execute_command('/interface/print', projection(INTERFACE_FIELDS, extra_fields))
+            return [with_extra_fields(format_interface(iface), iface, extra_fields) for iface in interfaces]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على الواجهات: {e}")
+            return []
+
+    async def get_ip_addresses(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على عناوين IP (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
+        try:
+            addresses = await self.execute_command('/ip/address/print', projection(IP_ADDRESS_FIELDS, extra_fields))
+            return [with_extra_fields(format_ip_address(addr), addr, extra_fields) for addr in addresses]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على عناوين IP: {e}")
+            return []
+
+    async def get_system_resources(self) -> Dict:
+        """الحصول على موارد النظام المفصلة"""
+        try:
+            result = await self.execute_command('/system/resource/print')
+            if result:
+                return format_system_resources(result[0])
+            return {}
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على موارد النظام: {e}")
+            return {}
+
+    async def get_ppp_secrets(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة مستخدمي PPP (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
+        try:
+            secrets = await self.execute_command('/ppp/secret/print', projection(PPP_SECRET_FIELDS, extra_fields))
+            return [with_extra_fields(format_ppp_secret(secret), secret, extra_fields) for secret in secrets]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على مستخدمي PPP: {e}")
+            return []
+
+    async def get_ppp_profiles(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة ملفات PPP الشخصية (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
+        try:
+            profiles = await self.execute_command('/ppp/profile/print', projection(PPP_PROFILE_FIELDS, extra_fields))
+            return [with_extra_fields(format_ppp_profile(profile), profile, extra_fields) for profile in profiles]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على ملفات PPP: {e}")
+            return []
+
+    async def get_user_traffic(self, username: str) -> Dict:
+        """الحصول على إحصائيات حركة البيانات للمستخدم"""
+        try:
+            ppp_active = await self.execute_command(
+                '/ppp/active/print', projection(USER_TRAFFIC_FIELDS, arguments={'?name': username})
+            )
+            if ppp_active:
+                return format_user_traffic(ppp_active[0])
+            return {}
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على إحصائيات المستخدم {username}: {e}")
+            return {}
+
+    async def get_hotspot_users(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة مستخدمي Hotspot (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
+        try:
+            users = await self.execute_command('/ip/hotspot/user/print', projection(HOTSPOT_USER_FIELDS, extra_fields))
+            return [with_extra_fields(format_hotspot_user(user), user, extra_fields) for user in users]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على مستخدمي Hotspot: {e}")
+            return []
+
+    async def get_hotspot_profiles(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة ملفات Hotspot الشخصية (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
+        try:
+            profiles = await self.execute_command('/ip/hotspot/user/profile/print', projection(HOTSPOT_PROFILE_FIELDS, extra_fields))
+            return [with_extra_fields(format_hotspot_profile(profile), profile, extra_fields) for profile in profiles]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على ملفات Hotspot: {e}")
+            return []
+
+    async def get_hotspot_servers(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة خوادم Hotspot (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
+        try:
+            servers = await self.execute_command('/ip/hotspot/print', projection(HOTSPOT_SERVER_FIELDS, extra_fields))
+            return [with_extra_fields(format_hotspot_server(server), server, extra_fields) for server in servers]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على خوادم Hotspot: {e}")
+            return []
+
+    async def get_user_detailed_info(self, user_id: str, user_type: str) -> Dict:
+        """الحصول على معلومات مفصلة للمستخدم"""
+        try:
+            path = '/ip/hotspot/user' if user_type == 'hotspot' else '/ppp/secret'
+            users = await self.execute_command(
+                f'{path}/print', projection(USER_DETAIL_FIELDS, arguments={'?.id': user_id})
+            )
+            if users:
+                return format_user_details(users[0], user_type)
+            return {}
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على معلومات المستخدم {user_id}: {e}")
+            return {}
+
+    async def get_users_by_profile(self, profile_name: str, user_type: str = 'both') -> List[Dict]:
+        """الحصول على المستخدمين حسب الملف الشخصي"""
+        try:
+            queries = []
+            if user_type in ['ppp', 'both']:
+                queries.append(('ppp', '/ppp/secret/print'))
+            if user_type in ['hotspot', 'both']:
+                queries.append(('hotspot', '/ip/hotspot/user/print'))
+
+            results = await asyncio.gather(*(
+                self.execute_command(command, projection(USER_SUMMARY_FIELDS, arguments={'?profile': profile_name}))
+                for _, command in queries
+            ))
+            users = []
+            for (kind, _), rows in zip(queries, results):
+                users.extend(format_user_summary(user, kind) for user in rows)
+            return users
+
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على المستخدمين حسب الملف {profile_name}: {e}")
+            return []
+
+    async def get_users_by_comment(self, comment_text: str, user_type: str = 'both') -> List[Dict]:
+        """الحصول على المستخدمين حسب التعليق"""
+        try:
+            queries = []
+            if user_type in ['ppp', 'both']:
+                queries.append(('ppp', '/ppp/secret/print'))
+            if user_type in ['hotspot', 'both']:
+                queries.append(('hotspot', '/ip/hotspot/user/print'))
+
+            results = await asyncio.gather(*(
+                self.execute_command(command, projection(USER_SUMMARY_FIELDS)) for _, command in queries
+            ))
+            needle = comment_text.lower()
+            users = []
+            for (kind, _), rows in zip(queries, results):
+                users.extend(format_user_summary(user, kind) for user in rows
+                             if needle in str(user.get('comment', '')).lower())
+            return users
+
+        except Exception as e:
+            logger.error(f"خطأ في البحث بالتعليق {comment_text}: {e}")
+            return []
+
+    # ==================== الكتابة ====================
+
+    async def _run(self, command: str, arguments: Dict[str, Any], success_message: str,
+                   error_message: str) -> bool:
+        """تنفيذ أمر كتابة وإرجاع True/False مع تسجيل النتيجة"""
+        try:
+            await self.execute_command(command, arguments)
+            logger.info(success_message)
+            return True
+        except Exception as e:
+            logger.error(f"{error_message}: {e}")
+            return False
+
+    async def disconnect_user(self, user_id: str, user_type: str = 'ppp') -> bool:
+        """قطع اتصال مستخدم"""
+        if user_type.lower() == 'ppp':
+            command = '/ppp/active/remove'
+        elif user_type.lower() == 'hotspot':
+            command = '/ip/hotspot/active/remove'
+        else:
+            logger.error(f"نوع مستخدم غير مدعوم: {user_type}")
+            return False
+        return await self._run(command, {'.id': user_id},
+                               f"تم قطع اتصال المستخدم {user_id}",
+                               f"خطأ في قطع اتصال المستخدم {user_id}")
+
+    async def disable_user(self, user_id: str) -> bool:
+        """تعطيل مستخدم PPP"""
+        return await self._run('/ppp/secret/disable', {'.id': user_id},
+                               f"تم تعطيل المستخدم {user_id}",
+                               f"خطأ في تعطيل المستخدم {user_id}")
+
+    async def enable_user(self, user_id: str) -> bool:
+        """تفعيل مستخدم PPP"""
+        return await self._run('/ppp/secret/enable', {'.id': user_id},
+                               f"تم تفعيل المستخدم {user_id}",
+                               f"خطأ في تفعيل المستخدم {user_id}")
+
+    async def create_ppp_user(self, username: str, password: str, profile: str = 'default',
+                              local_address: str = '', remote_address: str = '',
+                              service: str = 'any') -> bool:
+        """إنشاء مستخدم PPP جديد"""
+        params = build_ppp_user_params(
+            username, password, profile, local_address, remote_address, service
+        )
+        return await self._run('/ppp/secret/add', params,
+                               f"تم إنشاء المستخدم {username} بنجاح",
+                               f"خطأ في إنشاء المستخدم {username}")
+
+    async def delete_ppp_user(self, user_id: str) -> bool:
+        """حذف مستخدم PPP"""
+        return await self._run('/ppp/secret/remove', {'.id': user_id},
+                               f"تم حذف المستخدم {user_id} بنجاح",
+                               f"خطأ في حذف المستخدم {user_id}")
+
+    async def update_user_password(self, user_id: str, new_password: str) -> bool:
+        """تحديث كلمة مرور المستخدم"""
+        return await self._run('/ppp/secret/set', {'.id': user_id, 'password': new_password},
+                               f"تم تحديث كلمة مرور المستخدم {user_id}",
+                               f"خطأ في تحديث كلمة مرور المستخدم {user_id}")
+
+    async def create_hotspot_user(self, username: str, password: str, profile: str = 'default',
+                                  server: str = 'all', address: str = '', mac_address: str = '',
+                                  comment: str = '', limit_uptime: str = '',
+                                  limit_bytes_in: str = '', limit_bytes_out: str = '') -> bool:
+        """إنشاء مستخدم Hotspot جديد"""
+        params = build_hotspot_user_params(
+            username, password, profile, server, address, mac_address,
+            comment, limit_uptime, limit_bytes_in, limit_bytes_out
+        )
+        return await self._run('/ip/hotspot/user/add', params,
+                               f"تم إنشاء مستخدم Hotspot {username} بنجاح",
+                               f"خطأ في إنشاء مستخدم Hotspot {username}")
+
+    async def delete_hotspot_user(self, user_id: str) -> bool:
+        """حذف مستخدم Hotspot"""
+        return await self._run('/ip/hotspot/user/remove', {'.id': user_id},
+                               f"تم حذف مستخدم Hotspot {user_id} بنجاح",
+                               f"خطأ في حذف مستخدم Hotspot {user_id}")
+
+    async def update_hotspot_user_password(self, user_id: str, new_password: str) -> bool:
+        """تحديث كلمة مرور مستخدم Hotspot"""
+        return await self._run('/ip/hotspot/user/set', {'.id': user_id, 'password': new_password},
+                               f"تم تحديث كلمة مرور مستخدم Hotspot {user_id}",
+                               f"خطأ في تحديث كلمة مرور مستخدم Hotspot {user_id}")
+
+    async def enable_hotspot_user(self, user_id: str) -> bool:
+        """تفعيل مستخدم Hotspot"""
+        return await self._run('/ip/hotspot/user/enable', {'.id': user_id},
+                               f"تم تفعيل مستخدم Hotspot {user_id}",
+                               f"خطأ في تفعيل مستخدم Hotspot {user_id}")
+
+    async def disable_hotspot_user(self, user_id: str) -> bool:
+        """تعطيل مستخدم Hotspot"""
+        return await self._run('/ip/hotspot/user/disable', {'.id': user_id},
+                               f"تم تعطيل مستخدم Hotspot {user_id}",
+                               f"خطأ في تعطيل مستخدم Hotspot {user_id}")
+
+    async def set_user_speed_limit(self, user_id: str, user_type: str, upload_speed: str = '',
+                                   download_speed: str = '') -> bool:
+        """تحديد حد السرعة للمستخدم"""
+        rate_limit = build_rate_limit(upload_speed, download_speed)
+        path = '/ip/hotspot/user' if user_type == 'hotspot' else '/ppp/secret'
+        return await self._run(f'{path}/set', {'.id': user_id, 'rate-limit': rate_limit},
+                               f"تم تحديث حد السرعة للمستخدم {user_id}: {rate_limit}",
+                               f"خطأ في تحديد حد السرعة للمستخدم {user_id}")
+
+    async def set_user_data_limit(self, user_id: str, user_type: str, data_limit_gb: float = 0) -> bool:
+        """تحديد حد البيانات للمستخدم بالجيجابايت"""
+        if data_limit_gb <= 0:
+            return True  # لا حد للبيانات
+
+        # للـ Hotspot حد البايتات، وللـ PPP تعليق
+        path = '/ip/hotspot/user' if user_type == 'hotspot' else '/ppp/secret'
+        params = dict(build_data_limit_params(user_type, data_limit_gb), **{'.id': user_id})
+        return await self._run(f'{path}/set', params,
+                               f"تم تحديد حد البيانات للمستخدم {user_id}: {data_limit_gb}GB",
+                               f"خطأ في تحديد حد البيانات للمستخدم {user_id}")
+
+    async def user_names(self, path: str) -> Set[str]:
+        """أسماء كل العناصر في جدول المستخدمين كمجموعة (لفحص التكرار قبل الإرسال)"""
+        rows = await self.execute_command(f'{path}/print', {'.proplist': 'name'})
+        return {str(row.get('name', '')) for row in rows}
+
+    async def _taken_names(self, path: str) -> Set[str]:
+        """user_names أو مجموعة فارغة عند تعذر القراءة (يرفض الجهاز الأسماء المكررة عندها)"""
+        try:
+            return await self.user_names(path)
+        except Exception as e:
+            logger.warning(f"تعذر قراءة أسماء {path} للتحقق من التكرار: {e}")
+            return set()
+
+    async def _create_bulk(self, command: str, usernames: List[str], password_length: int,
+                           build_params, extra: Dict, taken: Set[str] = frozenset()) -> List[Dict]:
+        """إنشاء مستخدمين بأوامر add موسومة متزامنة وإرجاع حالة كل مستخدم وسبب فشله"""
+        created_users = new_bulk_users(usernames, password_length, extra)
+        # الأسماء الموجودة تُرفض محلياً دون رحلة إلى الجهاز
+        to_send = []
+        for user in created_users:
+            if user['username'] in taken:
+                user['error'] = 'اسم المستخدم موجود مسبقاً'
+            else:
+                to_send.append(user)
+        # أخطاء الاتصال تُسجل لكل مستخدم بدلاً من إسقاط الدفعة كاملة
+        results = await asyncio.gather(*(
+            self._submit(command, build_params(user['username'], user['password']))
+            for user in to_send
+        ), return_exceptions=True)
+        for user, result in zip(to_send, results):
+            if isinstance(result, BaseException):
+                user['error'] = str(result)
+            elif result.ok:
+                user['status'] = 'تم الإنشاء'
+            else:
+                user['error'] = str(result.error)
+        return created_users
+
+    async def create_bulk_users(self, prefix: str = '', count: int = 10, password_length: int = 8,
+                                profile: str = 'default', name_type: str = 'prefix',
+                                custom_names: List[str] = None) -> List[Dict]:
+        """إنشاء عدد كبير من مستخدمي PPP بالتوازي"""
+        taken = await self._taken_names('/ppp/secret')
+        return await self._create_bulk(
+            '/ppp/secret/add', bulk_usernames(prefix, count, name_type, custom_names, taken), password_length,
+            lambda username, password: build_ppp_user_params(username, password, profile),
+            {'profile': profile, 'type': 'ppp'}, taken
+        )
+
+    async def create_bulk_hotspot_users(self, prefix: str = '', count: int = 10, password_length: int = 8,
+                                        profile: str = 'default', server: str = 'all',
+                                        name_type: str = 'prefix', custom_names: List[str] = None) -> List[Dict]:
+        """إنشاء عدد كبير من مستخدمي Hotspot بالتوازي"""
+        taken = await self._taken_names('/ip/hotspot/user')
+        return await self._create_bulk(
+            '/ip/hotspot/user/add', bulk_usernames(prefix, count, name_type, custom_names, taken), password_length,
+            lambda username, password: build_hotspot_user_params(username, password, profile, server),
+            {'profile': profile, 'server': server, 'type': 'hotspot'}, taken
+        )
+
+    # ==================== وظائف الإدارة باسم المستخدم ====================
+
+    async def _find_ids(self, path: str, username: str, key: str = 'name') -> List[str]:
+        """
+        معرفات العناصر التي تطابق اسم المستخدم كما هي في الجهاز الآن
+
+        لا يُعتمد على معرف من الفهرس قبل أمر يغير الجهاز (قد يكون الاسم نُقل إلى مستخدم آخر)؛
+        النتيجة تحدث الفهرس المشترك للعمليات بالجملة
+        """
+        rows = await self.execute_command(f'{path}/print', {'.proplist': '.id', f'?{key}': username})
+        ids = [row['.id'] for row in rows if '.id' in row]
+        if ids:
+            self.index.put(path, username, ids)
+        else:
+            self.index.forget(path, username)
+        return ids
+
+    async def _by_name(self, path: str, username: str, verb: str, arguments: Dict[str, Any] = None,
+                       key: str = 'name', missing_ok: bool = False) -> bool:
+        """تنفيذ أمر على عنصر يُحدد باسم المستخدم بعد تأكيد معرفه من الجهاز"""
+        try:
+            ids = await self._find_ids(path, username, key)
+            if not ids:
+                if not missing_ok:
+                    logger.warning(f"المستخدم {username} غير موجود")
+                return missing_ok
+            params = {'.id': ','.join(ids) if missing_ok else ids[0]}
+            params.update(arguments or {})
+            try:
+                await self.execute_command(f'{path}/{verb}', params)
+            except TrapError as e:
+                # حُذف العنصر بين الاستعلام والأمر
+                if 'no such item' not in str(e):
+                    raise
+                self.index.forget(path, username, stale=True)
+                if not missing_ok:
+                    logger.warning(f"المستخدم {username} غير موجود")
+                return missing_ok
+            if verb == 'remove':
+                self.index.forget(path, username)
+            logger.info(f"تم تنفيذ {verb} على {path} للمستخدم {username}")
+            return True
+        except Exception as e:
+            logger.error(f"خطأ في تنفيذ {verb} على {path} للمستخدم {username}: {e}")
+            return False
+
+    async def delete_ppp_user_by_name(self, username: str) -> bool:
+        """حذف مستخدم PPP باسم المستخدم"""
+        return await self._by_name('/ppp/secret', username, 'remove')
+
+    async def delete_hotspot_user_by_name(self, username: str) -> bool:
+        """حذف مستخدم Hotspot باسم المستخدم"""
+        return await self._by_name('/ip/hotspot/user', username, 'remove')
+
+    async def toggle_ppp_user(self, username: str, disabled: bool) -> bool:
+        """تفعيل/تعطيل مستخدم PPP"""
+        return await self._by_name('/ppp/secret', username, 'set',
+                                   {'disabled': 'yes' if disabled else 'no'})
+
+    async def toggle_hotspot_user(self, username: str, disabled: bool) -> bool:
+        """تفعيل/تعطيل مستخدم Hotspot"""
+        return await self._by_name('/ip/hotspot/user', username, 'set',
+                                   {'disabled': 'yes' if disabled else 'no'})
+
+    async def renew_ppp_user(self, username: str) -> bool:
+        """تجديد مستخدم PPP (قطع الجلسة لإعادة تعيين الإحصائيات)"""
+        return await self._by_name('/ppp/active', username, 'remove', missing_ok=True)
+
+    async def renew_hotspot_user(self, username: str) -> bool:
+        """تجديد مستخدم Hotspot (قطع الجلسات لإعادة تعيين الإحصائيات)"""
+        return await self._by_name('/ip/hotspot/active', username, 'remove', key='user', missing_ok=True)
+
+    async def reset_ppp_user(self, username: str) -> bool:
+        """إعادة ضبط مستخدم PPP (إعادة تعيين كلمة المرور)"""
+        new_password = generator_for().password(8)
+        return await self._by_name('/ppp/secret', username, 'set', {'password': new_password})
+
+    async def reset_hotspot_user(self, username: str) -> bool:
+        """إعادة ضبط مستخدم Hotspot (إعادة تعيين كلمة المرور)"""
+        new_password = generator_for().password(8)
+        return await self._by_name('/ip/hotspot/user', username, 'set', {'password': new_password})
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مهام العمليات بالجملة في الخلفية
+الطلب يعيد رقم المهمة فوراً، والنتائج تُتابع بطلبات التقدم أو بث SSE، مع إمكانية الإلغاء.
+عدد محدود من العمال يأخذ دفعات صغيرة من المهام النشطة بالتناوب حتى لا تحجب مهمة كبيرة غيرها
+"""
+
+import heapq
+import itertools
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Any, Callable, Sequence, Tuple
+import logging
+
+from command_channel import CommandResult, Command
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+# حالة المستخدمين الذين لم تُرسل أوامرهم بسبب الإلغاء أو فشل المهمة
+CANCELLED_STATUS = 'ملغى'
+FAILED_STATUS = 'فشل'
+
+# محاولات الدفعة التي ترفع خطأ غير متوقع قبل إنهاء المهمة بالفشل، والتأخير قبل
+# أول إعادة (يتضاعف مع كل محاولة)
+CHUNK_MAX_ATTEMPTS = 3
+CHUNK_RETRY_DELAY = 2.0
+
+
+def failed_results(commands: Sequence[Command], error: Exception) -> List[CommandResult]:
+    """نتيجة فاشلة بنفس الخطأ لكل أمر (عند فشل تنفيذ الدفعة كاملة)"""
+    results = []
+    for command, arguments in commands:
+        result = CommandResult(command, arguments)
+        result.error = error
+        results.append(result)
+    return results
+
+
+class BulkJob:
+    """مهمة واحدة: قائمة مستخدمين وأوامرهم ونتائجهم بترتيب وصولها"""
+
+    def __init__(self, job_id: str, user_type: str, users: List[Dict], commands: List[Command],
+                 chunk_size: int, on_results: Optional[Callable] = None, meta: Optional[Dict] = None,
+                 total: Optional[int] = None):
+        """
+        Args:
+            users: صفوف المستخدمين (تُحدث حالتها من نتائج الأوامر)
+            commands: أمر لكل مستخدم بنفس الترتيب
+            chunk_size: عدد الأوامر في كل دفعة يأخذها العامل
+            on_results: دالة (users, results) تُحدث صفوف الدفعة من نتائج أوامرها
+            meta: معلومات إضافية تُعاد مع حالة المهمة
+            total: عدد المستخدمين إذا كانت الصفوف تُولد لكل دفعة (افتراضياً طول users)
+        """
+        self.id = job_id
+        self.user_type = user_type
+        self.users = users
+        self.commands = commands
+        self.chunk_size = chunk_size
+        self.on_results = on_results
+        self.meta = dict(meta or {})
+        self.total = len(users) if total is None else total
+
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self._condition = threading.Condition()
+        self._results: List[Dict] = []
+        self._next = 0
+        self._in_flight = 0
+        self._done = 0
+        self._succeeded = 0
+        self._cancel = False
+        # خطأ إنهاء المهمة بالفشل، ومحاولات كل دفعة فاشلة، وموعد أول دفعة بعد فشل
+        self.error: Optional[str] = None
+        self._attempts: Dict[int, int] = {}
+        self._not_before = 0.0
+        if not self.total:
+            self.status = COMPLETED
+            self.finished_at = self.created_at
+
+    # ==================== التنفيذ (للمدير) ====================
+
+    # دفعة واحدة في كل مرة لهذه المهمة (المهام التي تحفظ تقدمها بالترتيب)
+    sequential = False
+
+    def take_chunk(self) -> Optional[Tuple[int, int]]:
+        """حجز الدفعة التالية أو None إذا انتهت الدفعات أو أُلغيت المهمة"""
+        with self._condition:
+            if self._cancel or self._next >= self.total or (self.sequential and self._in_flight):
+                return None
+            if time.monotonic() < self._not_before:
+                return None
+            start, end = self._next, min(self._next + self.chunk_size, self.total)
+            self._next = end
+            self._in_flight += 1
+            if self.status == QUEUED:
+                self.status = RUNNING
+                self.started_at = time.time()
+            return start, end
+
+    def has_chunks(self) -> bool:
+        """هل بقيت دفعات لم تُحجز"""
+        with self._condition:
+            return not self._cancel and self._next < self.total
+
+    def run_chunk(self, writer, start: int, end: int):
+        """تنفيذ دفعة محجوزة على الكاتب وتسجيل نتائجها"""
+        commands = self.commands[start:end]
+        try:
+            results = writer.execute(commands)
+        except Exception as e:
+            logger.error(f"خطأ في تنفيذ دفعة المهمة {self.id}: {e}")
+            results = failed_results(commands, e)
+        users = self.users[start:end]
+        if self.on_results:
+            self.on_results(users, results)
+        self.record(users, sum(1 for result in results if result.ok))
+
+    def record(self, users: List[Dict], succeeded: int):
+        """تسجيل صفوف دفعة مكتملة وإنهاء المهمة إذا كانت آخر دفعة"""
+        with self._condition:
+            self._store_results(users)
+            self._done += len(users)
+            self._succeeded += succeeded
+            self._in_flight -= 1
+            self._finish_if_done()
+            self._condition.notify_all()
+
+    def release_chunk(self, start: int):
+        """إرجاع دفعة محجوزة دون نتيجة لإعادة تنفيذها لاحقاً"""
+        with self._condition:
+            self._next = min(self._next, start)
+            self._in_flight -= 1
+            self._finish_if_done()
+            self._condition.notify_all()
+
+    def chunk_error(self, start: int, error: Exception, max_attempts: int = CHUNK_MAX_ATTEMPTS,
+                    retry_delay: float = CHUNK_RETRY_DELAY) -> Optional[float]:
+        """
+        إرجاع دفعة رفعت خطأ غير متوقع: تُعاد بعد تأخير يتضاعف مع كل محاولة، وبعد
+        max_attempts محاولات تنتهي المهمة بالفشل (الدفعات الجارية تكتمل أولاً)
+
+        Returns:
+            التأخير قبل إعادة الدفعة، أو None إذا انتهت المهمة بالفشل
+        """
+        with self._condition:
+            attempts = self._attempts[start] = self._attempts.get(start, 0) + 1
+            self._next = min(self._next, start)
+            self._in_flight -= 1
+            if attempts >= max_attempts:
+                self.error = str(error)
+                self._cancel = True
+                delay = None
+            else:
+                delay = retry_delay * 2 ** (attempts - 1)
+                self._not_before = time.monotonic() + delay
+            self._finish_if_done()
+            self._condition.notify_all()
+            return delay
+
+    def _store_results(self, users: List[Dict]):
+        """حفظ صفوف النتائج (يُستدعى مع القفل)"""
+        self._results.extend(users)
+
+    def results_since(self, since: int, limit: Optional[int] = None) -> List[Dict]:
+        """صفوف النتائج من الموضع since بترتيب وصولها (يُستدعى مع القفل)"""
+        end = None if limit is None else since + limit
+        return [dict(user) for user in self._results[since:end]]
+
+    def cancel(self) -> bool:
+        """
+        إلغاء المهمة: الدفعات الجارية تكتمل والباقي لا يُرسل
+
+        Returns:
+            False إذا كانت المهمة منتهية أصلاً
+        """
+        with self._condition:
+            if self.finished:
+                return False
+            self._cancel = True
+            self._finish_if_done()
+            self._condition.notify_all()
+            return True
+
+    def _finish_if_done(self):
+        """إنهاء المهمة عند اكتمال كل الدفعات المحجوزة (يُستدعى مع القفل)"""
+        if self.finished or self._in_flight or (self._next < self.total and not self._cancel):
+            return
+        if self._cancel:
+            self._cancel_remaining()
+            self.status = FAILED if self.error else CANCELLED
+        else:
+            self.status = COMPLETED
+        self.finished_at = time.time()
+        self._finished()
+        logger.info(f"انتهت مهمة {self.id}: {self._succeeded} من {self.total} ({self.status})")
+
+    def _cancel_remaining(self):
+        """
+        إضافة المستخدمين الذين لم تُرسل أوامرهم إلى النتائج بحالة ملغى، أو فشل مع الخطأ
+        إذا انتهت المهمة بالفشل (يُستدعى مع القفل)
+        """
+        remaining = self.users[self._next:]
+        for user in remaining:
+            if self.error:
+                user['status'] = FAILED_STATUS
+                user['error'] = self.error
+            else:
+                user['status'] = CANCELLED_STATUS
+        self._results.extend(remaining)
+        self._done += len(remaining)
+        self._next = self.total
+
+    def _finished(self):
+        """يُستدعى مع القفل عند انتهاء المهمة"""
+
+    def discard(self):
+        """يُستدعى عند حذف المهمة المنتهية من المدير (لتحرير ما تحفظه خارج الذاكرة)"""
+
+    # ==================== المتابعة ====================
+
+    @property
+    def finished(self) -> bool:
+        """هل انتهت المهمة (اكتملت أو أُلغيت أو فشلت)"""
+        return self.status in (COMPLETED, CANCELLED, FAILED)
+
+    def wait(self, since: int, timeout: float) -> bool:
+        """انتظار نتائج بعد الموضع since أو انتهاء المهمة؛ False عند انتهاء المهلة"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._done > since or self.finished, timeout
+            )
+
+    def progress(self, since: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        حالة المهمة ونتائج المستخدمين من الموضع since
+
+        Args:
+            limit: أقصى عدد من صفوف النتائج في الرد؛ next هو موضع الطلب التالي
+        """
+        with self._condition:
+            done = self._done
+            results = self.results_since(since, limit) if since < done else []
+            return {
+                'id': self.id,
+                'type': self.user_type,
+                'status': self.status,
+                'error': self.error,
+                'total': self.total,
+                'done': done,
+                'success': self._succeeded,
+                'failed': done - self._succeeded,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'meta': self.meta,
+                'next': min(done, since + len(results)) if since < done else done,
+                'results': results
+            }
+
+
+class BulkJobManager:
+    """تشغيل المهام على عدد محدود من العمال مع تناوب عادل بين المهام"""
+
+    def __init__(self, writer, max_workers: int = 2, chunk_size: int = 25, max_finished: int = 50,
+                 max_attempts: int = CHUNK_MAX_ATTEMPTS, retry_delay: float = CHUNK_RETRY_DELAY):
+        """
+        Args:
+            writer: AdaptiveBulkWriter ينفذ كل دفعة على جلسات المجمع
+            max_workers: أقصى عدد من الدفعات المنفذة في نفس الوقت لكل المهام
+            chunk_size: عدد المستخدمين في كل دفعة (وحدة التقدم والتناوب)
+            max_finished: عدد المهام المنتهية المحفوظة للمتابعة (الأقدم يُحذف)
+            max_attempts: محاولات الدفعة التي ترفع خطأ غير متوقع قبل إنهاء مهمتها بالفشل
+            retry_delay: التأخير (بالثواني) قبل أول إعادة للدفعة، ويتضاعف مع كل محاولة
+        """
+        self.writer = writer
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_finished = max_finished
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._lock = threading.Condition()
+        self._jobs: 'OrderedDict[str, BulkJob]' = OrderedDict()
+        self._ready: deque = deque()
+        # (موعد العودة، تسلسل، المهمة) للمهام المؤجلة بعد دفعة فاشلة
+        self._delayed: List[Tuple[float, int, BulkJob]] = []
+        self._sequence = itertools.count()
+        self._workers: List[threading.Thread] = []
+        self._stats = {
+            'submitted': 0,
+            'chunks': 0,
+            'retries': 0,
+            'failed_jobs': 0
+        }
+
+    @staticmethod
+    def new_id() -> str:
+        """رقم مهمة جديد"""
+        return secrets.token_hex(8)
+
+    def submit(self, user_type: str, users: List[Dict], commands: List[Command],
+               on_results: Optional[Callable] = None, meta: Optional[Dict] = None) -> BulkJob:
+        """إضافة مهمة في الذاكرة وإعادتها فوراً (التنفيذ في الخلفية)"""
+        job = BulkJob(self.new_id(), user_type, users, commands, self.chunk_size, on_results, meta)
+        return self.submit_job(job)
+
+    def submit_job(self, job: BulkJob) -> BulkJob:
+        """إضافة مهمة جاهزة (مثل مهمة مستأنفة) إلى طابور التنفيذ"""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._stats['submitted'] += 1
+            self._prune()
+            if job.has_chunks():
+                self._ready.append(job)
+                self._ensure_workers()
+                self._lock.notify()
+        logger.info(f"مهمة جديدة {job.id}: {job.total} مستخدم {job.user_type}")
+        return job
+
+    def get(self, job_id: str) -> Optional[BulkJob]:
+        """المهمة برقمها أو None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[BulkJob]:
+        """كل المهام المحفوظة من الأحدث للأقدم"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> bool:
+        """إلغاء مهمة؛ False إذا لم توجد أو كانت منتهية"""
+        job = self.get(job_id)
+        return job.cancel() if job else False
+
+    def _prune(self):
+        """حذف أقدم المهام المنتهية بعد الحد (يُستدعى مع القفل)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            self._jobs.pop(job_id).discard()
+
+    def _ensure_workers(self):
+        """تشغيل العمال عند الحاجة (يُستدعى مع القفل)"""
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker, daemon=True, name='bulk-job-worker')
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_chunk(self) -> Optional[Tuple[BulkJob, int, int]]:
+        """الدفعة التالية بالتناوب: المهمة تعود لآخر الطابور بعد كل دفعة"""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    job = heapq.heappop(self._delayed)[2]
+                    if job not in self._ready:
+                        self._ready.append(job)
+                while self._ready:
+                    job = self._ready.popleft()
+                    chunk = job.take_chunk()
+                    if chunk is None:
+                        continue
+                    if job.has_chunks() and not job.sequential:
+                        self._ready.append(job)
+                    self._stats['chunks'] += 1
+                    return (job,) + chunk
+                if self._delayed:
+                    # انتظار موعد أول مهمة مؤجلة
+                    self._lock.wait(timeout=self._delayed[0][0] - now)
+                    continue
+                # لا توجد مهام: العامل ينتهي بعد مدة خمول ويُعاد تشغيله مع المهمة التالية
+                if not self._lock.wait(timeout=30) and not self._ready and not self._delayed:
+                    self._workers.remove(threading.current_thread())
+                    return None
+
+    def _chunk_failed(self, job: BulkJob, start: int, error: Exception):
+        """دفعة رفعت خطأ غير متوقع: تأجيل مهمتها مع تأخير متزايد أو إنهاؤها بالفشل"""
+        try:
+            delay = job.chunk_error(start, error, self.max_attempts, self.retry_delay)
+        except Exception as e:
+            # مثل تعذر حفظ الحالة النهائية: المهمة منتهية في الذاكرة
+            logger.error(f"خطأ في إنهاء دفعة المهمة {job.id}: {e}")
+            return
+        with self._lock:
+            if delay is None:
+                self._stats['failed_jobs'] += 1
+                logger.error(f"فشلت المهمة {job.id} بعد {self.max_attempts} محاولات للدفعة {start}: {error}")
+                return
+            self._stats['retries'] += 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._sequence), job))
+            self._lock.notify()
+        logger.warning(f"إعادة دفعة المهمة {job.id} من {start} بعد {delay} ثانية")
+
+    def _worker(self):
+        """عامل يأخذ الدفعات من كل المهام بالتناوب"""
+        while True:
+            item = self._next_chunk()
+            if item is None:
+                return
+            job, start, end = item
+            try:
+                job.run_chunk(self.writer, start, end)
+            except Exception as e:
+                # خطأ غير متوقع (مثل فشل الكتابة على القرص أو في on_results): الدفعة تعود
+                # للمهمة بعد تأخير، وبعد آخر محاولة تنتهي المهمة بالفشل
+                logger.error(f"خطأ في دفعة المهمة {job.id}: {e}")
+                self._chunk_failed(job, start, e)
+                continue
+            if job.sequential and job.has_chunks():
+                # المهمة تعود لآخر الطابور بعد اكتمال دفعتها
+                with self._lock:
+                    self._ready.append(job)
+                    self._lock.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        """عدد المهام حسب الحالة وعدد الدفعات المنفذة"""
+        with self._lock:
+            stats = dict(self._stats)
+            statuses = [job.status for job in self._jobs.values()]
+            stats.update({
+                'jobs': {
+                    status: statuses.count(status) for status in (QUEUED, RUNNING, COMPLETED, CANCELLED, FAILED)
+                },
+                'ready': len(self._ready),
+                'delayed': len(self._delayed),
+                'workers': len(self._workers),
+                'max_workers': self.max_workers
+            })
+            return stats
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+كاتب العمليات بالجملة على عدة جلسات متوازية
+يوزع أوامر الإنشاء/الحذف/التفعيل/السرعة على جلسات المجمع ويضبط عدد
+الجلسات المتوازية حسب cpu-load الجهاز حتى لا يُرهق جهاز الإنتاج
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+import logging
+
+from command_channel import CommandResult, Command
+from name_index import index_for
+from mikrotik_manager import (
+    build_ppp_user_params, build_hotspot_user_params, build_rate_limit, new_bulk_users
+)
+
+logger = logging.getLogger(__name__)
+
+# مسار جدول المستخدمين لكل نوع
+USER_PATHS = {
+    'ppp': '/ppp/secret',
+    'hotspot': '/ip/hotspot/user'
+}
+
+# جدول الجلسات النشطة وحقل اسم المستخدم فيه لكل نوع (للتجديد)
+ACTIVE_PATHS = {
+    'ppp': ('/ppp/active', 'name'),
+    'hotspot': ('/ip/hotspot/active', 'user')
+}
+
+# الإجراءات المتاحة على عدة مستخدمين بالاسم وأمر كل منها
+BATCH_ACTIONS = {
+    'enable': 'enable',
+    'disable': 'disable',
+    'delete': 'remove',
+    'renew': 'remove',  # قطع كل جلسات المستخدم
+    'reset': 'set'      # كلمة مرور جديدة
+}
+
+# إجراء داخلي: set بمعاملات يحددها المستدعي (سياسات السرعة وحد البيانات)
+POLICY_ACTION = 'policy'
+
+
+class AdaptiveBulkWriter:
+    """تنفيذ أوامر كثيرة على عدة جلسات من المجمع مع تحكم تكيفي في التوازي"""
+
+    def __init__(self, pool, max_workers: int = 4, min_workers: int = 1, window: int = 32,
+                 chunk_size: int = 50, high_load: int = 80, low_load: int = 50,
+                 sample_interval: float = 1.0):
+        """
+        Args:
+            pool: مجمع الاتصالات MikroTikConnectionPool
+            max_workers: أقصى عدد من الجلسات المتوازية
+            min_workers: أقل عدد من الجلسات المتوازية عند تشبع الجهاز
+            window: أوامر معلقة لكل جلسة
+            chunk_size: عدد الأوامر التي تأخذها الجلسة في كل دفعة
+            high_load: نسبة cpu-load التي يُخفض عندها التوازي للنصف
+            low_load: نسبة cpu-load التي يُزاد تحتها التوازي بجلسة واحدة
+            sample_interval: أقل مدة بين قراءتين لـ cpu-load بالثواني
+        """
+        if max_workers < 1 or min_workers < 1 or min_workers > max_workers:
+            raise ValueError("يجب أن يكون 1 <= min_workers <= max_workers")
+
+        self.pool = pool
+        self.max_workers = max_workers
+        self.min_workers = min_workers
+        self.window = window
+        self.chunk_size = chunk_size
+        self.high_load = high_load
+        self.low_load = low_load
+        self.sample_interval = sample_interval
+
+        # الحد مشترك بين كل العمليات الجارية حتى يبقى الضغط الكلي على الجهاز محدوداً
+        self._condition = threading.Condition()
+        self._limit = min_workers
+        self._active = 0
+        self._last_sample = 0.0
+        self._sampling = False
+        self._stats = {
+            'commands': 0,
+            'failed': 0,
+            'samples': 0,
+            'backoffs': 0,
+            'rampups': 0,
+            'last_cpu_load': None,
+            'peak_workers': 0
+        }
+
+    # ==================== التحكم في التوازي ====================
+
+    def _sample_due(self) -> bool:
+        """حجز قراءة cpu-load إن حان وقتها (قارئ واحد في كل مرة)"""
+        with self._condition:
+            if self._sampling or time.monotonic() - self._last_sample < self.sample_interval:
+                return False
+            self._sampling = True
+            return True
+
+    def _adjust(self, manager):
+        """قراءة cpu-load على الجلسة الحالية وتعديل حد التوازي"""
+        load = None
+        try:
+            rows = manager.execute_command('/system/resource/print', {'.proplist': 'cpu-load'})
+            if rows:
+                load = int(rows[0].get('cpu-load', 0))
+        except Exception as e:
+            logger.warning(f"تعذر قراءة حمل المعالج: {e}")
+
+        with self._condition:
+            self._sampling = False
+            self._last_sample = time.monotonic()
+            if load is None:
+                return
+            self._stats['samples'] += 1
+            self._stats['last_cpu_load'] = load
+
+            if load >= self.high_load and self._limit > self.min_workers:
+                # تخفيض سريع عند التشبع وزيادة تدريجية عند الفراغ
+                self._limit = max(self.min_workers, self._limit // 2)
+                self._stats['backoffs'] += 1
+                logger.info(f"حمل المعالج {load}% - تخفيض التوازي إلى {self._limit}")
+            elif load <= self.low_load and self._limit < self.max_workers:
+                self._limit += 1
+                self._stats['rampups'] += 1
+                self._condition.notify_all()
+
+    # ==================== التنفيذ ====================
+
+    def _run_chunk(self, commands: Sequence[Command], start: int, end: int,
+                   results: List[Optional[CommandResult]]):
+        """تنفيذ جزء من الأوامر على جلسة مستعارة من المجمع"""
+        manager = self.pool.acquire()
+        discard = False
+        try:
+            for position, result in manager.stream_batch(
+                    (commands[i] for i in range(start, end)), self.window):
+                results[start + position] = result
+
+            if self._sample_due():
+                self._adjust(manager)
+
+        except Exception as e:
+            discard = True
+            logger.error(f"خطأ في تنفيذ الأوامر {start}-{end}: {e}")
+            # الأوامر التي لم يصل ردها لا يُعاد إرسالها لأنها قد تكون نُفذت
+            for i in range(start, end):
+                if results[i] is None:
+                    command, arguments = commands[i]
+                    result = CommandResult(command, arguments)
+                    result.error = e
+                    results[i] = result
+        finally:
+            self.pool.release(manager, discard=discard or not manager.is_connected())
+
+    def _worker(self, commands: Sequence[Command], chunks: deque,
+                results: List[Optional[CommandResult]]):
+        """خيط عامل يأخذ الأجزاء ما دام عدد الجلسات النشطة أقل من الحد"""
+        while True:
+            with self._condition:
+                while chunks and self._active >= self._limit:
+                    self._condition.wait(0.1)
+                if not chunks:
+                    return
+                start, end = chunks.popleft()
+                self._active += 1
+                self._stats['peak_workers'] = max(self._stats['peak_workers'], self._active)
+
+            try:
+                self._run_chunk(commands, start, end, results)
+            except Exception as e:
+                # فشل استعارة جلسة من المجمع
+                logger.error(f"خطأ في استعارة جلسة للأوامر {start}-{end}: {e}")
+                for i in range(start, end):
+                    if results[i] is None:
+                        command, arguments = commands[i]
+                        result = CommandResult(command, arguments)
+                        result.error = e
+                        results[i] = result
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
+
+    def execute(self, commands: Sequence[Command]) -> List[CommandResult]:
+        """
+        تنفيذ الأوامر على عدة جلسات متوازية
+
+        Returns:
+            نتيجة كل أمر بنفس ترتيب المدخلات (أخطاء !trap والاتصال تُحفظ في النتيجة)
+        """
+        commands = list(commands)
+        results: List[Optional[CommandResult]] = [None] * len(commands)
+        if not commands:
+            return []
+
+        chunks = deque(
+            (start, min(start + self.chunk_size, len(commands)))
+            for start in range(0, len(commands), self.chunk_size)
+        )
+        workers = [
+            threading.Thread(target=self._worker, args=(commands, chunks, results), daemon=True)
+            for _ in range(min(self.max_workers, len(chunks)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        failed = sum(1 for result in results if not result.ok)
+        with self._condition:
+            self._stats['commands'] += len(commands)
+            self._stats['failed'] += failed
+        return results
+
+    # ==================== عمليات المستخدمين ====================
+
+    def _apply(self, user_type: str, verb: str, user_ids: Sequence[str],
+               arguments: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """تنفيذ أمر واحد على عدة مستخدمين بالمعرف وإرجاع حالة كل مستخدم"""
+        path = USER_PATHS[user_type]
+        commands = [
+            (f'{path}/{verb}', dict(arguments or {}, **{'.id': user_id})) for user_id in user_ids
+        ]
+        statuses = []
+        for user_id, result in zip(user_ids, self.execute(commands)):
+            status = {'id': user_id, 'status': 'تم' if result.ok else 'فشل'}
+            if not result.ok:
+                status['error'] = str(result.error)
+            statuses.append(status)
+        return statuses
+
+    @staticmethod
+    def prepare_users(user_type: str, usernames: Sequence[str], password_length: int = 8,
+                      profile: str = 'default', server: str = 'all',
+                      alphabet: Optional[str] = None) -> Tuple[List[Dict], List[Command]]:
+        """توليد كلمات المرور (بالأبجدية alphabet) وأوامر add دون تنفيذها (لتنفيذها على دفعات)"""
+        if user_type == 'hotspot':
+            extra = {'profile': profile, 'server': server, 'type': 'hotspot'}
+        else:  # PPP
+            extra = {'profile': profile, 'type': 'ppp'}
+        created_users = new_bulk_users(usernames, password_length, extra, alphabet)
+        return created_users, AdaptiveBulkWriter.add_commands(user_type, created_users, profile, server)
+
+    @staticmethod
+    def add_commands(user_type: str, users: Sequence[Dict], profile: str = 'default',
+                     server: str = 'all') -> List[Command]:
+        """أوامر add لمستخدمين كلمات مرورهم معروفة"""
+        if user_type == 'hotspot':
+            return [
+                ('/ip/hotspot/user/add',
+                 build_hotspot_user_params(user['username'], user['password'], profile, server))
+                for user in users
+            ]
+        return [
+            ('/ppp/secret/add', build_ppp_user_params(user['username'], user['password'], profile))
+            for user in users
+        ]
+
+    @staticmethod
+    def apply_results(created_users: Sequence[Dict], results: Sequence[CommandResult]):
+        """تحديث حالة كل مستخدم من نتيجة أمر add الخاص به"""
+        for user, result in zip(created_users, results):
+            if result.ok:
+                user['status'] = 'تم الإنشاء'
+            else:
+                user['error'] = str(result.error)
+
+    def create_users(self, user_type: str, usernames: Sequence[str], password_length: int = 8,
+                     profile: str = 'default', server: str = 'all') -> List[Dict]:
+        """إنشاء مستخدمين PPP أو Hotspot بنفس صيغة نتيجة create_bulk_users"""
+        created_users, commands = self.prepare_users(user_type, usernames, password_length, profile, server)
+        self.apply_results(created_users, self.execute(commands))
+        return created_users
+
+    def delete_users(self, user_type: str, user_ids: Sequence[str]) -> List[Dict]:
+        """حذف مستخدمين بالمعرف"""
+        return self._apply(user_type, 'remove', user_ids)
+
+    def toggle_users(self, user_type: str, user_ids: Sequence[str], disabled: bool) -> List[Dict]:
+        """تعطيل أو تفعيل مستخدمين بالمعرف"""
+        return self._apply(user_type, 'disable' if disabled else 'enable', user_ids)
+
+    def set_speed_limit(self, user_type: str, user_ids: Sequence[str], upload_speed: str = '',
+                        download_speed: str = '') -> List[Dict]:
+        """تحديد حد السرعة لعدة مستخدمين"""
+        rate_limit = build_rate_limit(upload_speed, download_speed)
+        return self._apply(user_type, 'set', user_ids, {'rate-limit': rate_limit})
+
+    def run_action(self, user_type: str, action: str, usernames: Sequence[str],
+                   password_length: int = 8, known_ids: Optional[Dict[str, str]] = None,
+                   arguments: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        تنفيذ إجراء من BATCH_ACTIONS على عدة مستخدمين بالاسم
+
+        المعرفات تُحل دفعة واحدة من الفهرس ثم تُرسل الأوامر متوازية؛ من فشل أمره لأن
+        معرفه قديم (no such item) يُعاد حل اسمه من الجهاز ويُعاد أمره مرة واحدة
+
+        Args:
+            known_ids: الاسم ← المعرف إذا كان معروفاً مسبقاً (من المحدد) فلا يُحل مرة أخرى
+            arguments: معاملات set لإجراء POLICY_ACTION
+
+        Returns:
+            لكل اسم: username و type و status، و error عند الفشل، و password بعد reset
+        """
+        verb = 'set' if action == POLICY_ACTION else BATCH_ACTIONS[action]
+        usernames = list(dict.fromkeys(usernames))
+        if action == 'renew':
+            path, key = ACTIVE_PATHS[user_type]
+        else:
+            path, key = USER_PATHS[user_type], 'name'
+
+        outcomes = {
+            username: {'username': username, 'type': user_type, 'status': 'فشل'} for username in usernames
+        }
+        passwords = {}
+        if action == 'reset':
+            passwords = {
+                user['username']: user['password']
+                for user in new_bulk_users(usernames, password_length, {})
+            }
+
+        pending = usernames
+        # الجلسات النشطة تتغير باستمرار فتُقرأ من الجهاز دائماً
+        refresh = action == 'renew'
+        for attempt in range(2):
+            index = index_for(self.pool.host, self.pool.port)
+            if attempt == 0 and known_ids and action != 'renew':
+                found = {username: [known_ids[username]] for username in pending if username in known_ids}
+            else:
+                with self.pool.connection() as mt:
+                    found = mt.find_ids_many(path, pending, key, refresh=refresh)
+
+            commands, owners = [], []
+            for username in pending:
+                ids = found.get(username)
+                if not ids:
+                    if action == 'renew':
+                        # غير متصل: لا جلسات لقطعها
+                        outcomes[username].update(status='تم')
+                    else:
+                        outcomes[username]['error'] = 'المستخدم غير موجود'
+                    continue
+                params = dict(arguments or {})
+                params['.id'] = ','.join(ids) if action == 'renew' else ids[0]
+                if action == 'reset':
+                    params['password'] = passwords[username]
+                commands.append((f'{path}/{verb}', params))
+                owners.append(username)
+
+            retry = []
+            for username, result in zip(owners, self.execute(commands)):
+                outcome = outcomes[username]
+                if result.ok:
+                    outcome['status'] = 'تم'
+                    outcome.pop('error', None)
+                    if action == 'reset':
+                        outcome['password'] = passwords[username]
+                    if verb == 'remove':
+                        index.forget(path, username)
+                elif attempt == 0 and 'no such item' in str(result.error):
+                    index.forget(path, username, stale=True)
+                    retry.append(username)
+                else:
+                    outcome['error'] = str(result.error)
+
+            if not retry:
+                break
+            pending, refresh = retry, True
+
+        return [outcomes[username] for username in usernames]
+
+    def apply_policy(self, user_type: str, users: Dict[str, str], arguments: Dict[str, Any]) -> List[Dict]:
+        """
+        تطبيق نفس معاملات set (rate-limit أو limit-bytes-total ...) على عدة مستخدمين
+
+        Args:
+            users: الاسم ← المعرف (من select_users)
+        """
+        return self.run_action(user_type, POLICY_ACTION, list(users), known_ids=users, arguments=arguments)
+
+    def stats(self) -> Dict[str, Any]:
+        """إحصائيات الكاتب وحد التوازي الحالي"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'workers': self._limit,
+                'active': self._active,
+                'min_workers': self.min_workers,
+                'max_workers': self.max_workers
+            })
+            return stats
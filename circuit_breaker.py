@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قاطع دائرة لكل جهاز MikroTik
+بعد عدة أخطاء اتصال متتالية تُرفض الطلبات فوراً بدلاً من انتظار مهلة الاتصال،
+ثم يُسمح بطلب اختبار واحد بعد reset_timeout لمعرفة هل عاد الجهاز
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Any, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(ConnectionError):
+    """الجهاز غير متاح والدائرة مفتوحة"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"الجهاز {name} غير متاح حالياً، أعد المحاولة بعد {retry_after:.0f} ثانية")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """قاطع دائرة آمن بين الخيوط: مغلق ← مفتوح ← نصف مفتوح (اختبار واحد)"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: اسم الجهاز (host:port) للسجلات
+            failure_threshold: عدد أخطاء الاتصال المتتالية قبل فتح الدائرة
+            reset_timeout: مدة بقاء الدائرة مفتوحة قبل السماح بطلب اختبار
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_owner: Optional[int] = None
+        self._probe_started = 0.0
+        self._stats = {
+            'opened': 0,
+            'rejected': 0,
+            'probes': 0
+        }
+
+    def configure(self, failure_threshold: int, reset_timeout: float):
+        """تحديث حدود القاطع"""
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.reset_timeout = reset_timeout
+
+    @property
+    def state(self) -> str:
+        """الحالة الحالية للدائرة"""
+        return self._state
+
+    def _probe_expired(self, now: float) -> bool:
+        """طلب الاختبار لم يُبلغ عن نتيجته خلال reset_timeout"""
+        return now - self._probe_started >= self.reset_timeout
+
+    def allow(self) -> bool:
+        """
+        هل يُسمح بمحاولة الوصول إلى الجهاز الآن
+
+        في حالة نصف مفتوح يُسمح لخيط واحد فقط (طلب الاختبار)؛ نفس الخيط
+        يمكنه الاستدعاء مرة أخرى (مثلاً connect داخل execute_command)
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+
+            now = time.monotonic()
+            current = threading.get_ident()
+
+            if self._state == OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    self._stats['rejected'] += 1
+                    return False
+                self._state = HALF_OPEN
+            elif self._probe_owner == current:
+                return True
+            elif not self._probe_expired(now):
+                self._stats['rejected'] += 1
+                return False
+
+            self._probe_owner = current
+            self._probe_started = now
+            self._stats['probes'] += 1
+            logger.info(f"اختبار توفر الجهاز {self.name}")
+            return True
+
+    def rejecting(self, count: bool = False) -> bool:
+        """
+        هل سيُرفض الطلب التالي (دون حجز طلب الاختبار)
+
+        Args:
+            count: احتساب الرفض في stats()['rejected'] (عند رفض الطلب فعلاً بناءً على النتيجة)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN:
+                rejected = now - self._opened_at < self.reset_timeout
+            elif self._state == HALF_OPEN:
+                rejected = self._probe_owner != threading.get_ident() and not self._probe_expired(now)
+            else:
+                rejected = False
+            if rejected and count:
+                self._stats['rejected'] += 1
+            return rejected
+
+    def retry_after(self) -> float:
+        """الثواني المتبقية قبل السماح بطلب اختبار"""
+        with self._lock:
+            if self._state == CLOSED:
+                return 0.0
+            start = self._opened_at if self._state == OPEN else self._probe_started
+            return max(0.0, self.reset_timeout - (time.monotonic() - start))
+
+    def record_success(self):
+        """رد من الجهاز (حتى لو !trap): إغلاق الدائرة"""
+        if self._state == CLOSED and not self._failures:
+            return  # المسار الشائع دون قفل (يُستدعى مع كل صف)
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"عاد الجهاز {self.name} للعمل - إغلاق الدائرة")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_owner = None
+
+    def record_failure(self):
+        """خطأ اتصال أو انتهاء مهلة"""
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (
+                    self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_owner = None
+                self._stats['opened'] += 1
+                logger.warning(
+                    f"الجهاز {self.name} غير متاح بعد {self._failures} خطأ - "
+                    f"رفض الطلبات لمدة {self.reset_timeout:.0f} ثانية"
+                )
+
+    def check(self):
+        """رفع CircuitOpenError إذا لم يُسمح بالمحاولة"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def stats(self) -> Dict[str, Any]:
+        """إحصائيات القاطع"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'state': self._state,
+                'failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout
+            })
+        stats['retry_after'] = round(self.retry_after(), 1)
+        return stats
+
+
+# قاطع واحد لكل جهاز مشترك بين كل الجلسات (المجمع، الاختبار، النبض)
+_breakers: Dict[Tuple[str, int], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(host: str, port: int) -> CircuitBreaker:
+    """قاطع الدائرة الخاص بجهاز معين"""
+    key = (host, int(port))
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(f"{host}:{port}")
+        return breaker
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قناة أوامر متعددة على مقبس RouterOS API واحد
+ترسل عدة جمل موسومة بـ .tag دفعة واحدة وتوزع الردود على أوامرها
+"""
+
+import itertools
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Sequence, Tuple
+import logging
+
+from librouteros.api import Api
+from librouteros.exceptions import TrapError
+from librouteros.protocol import compose_word, cast_to_api, parse_word
+
+logger = logging.getLogger(__name__)
+
+# أمر واحد: (المسار، المعاملات)
+Command = Tuple[str, Optional[Dict[str, Any]]]
+
+# حقول نصية تُقرأ كما هي: librouteros يحول '007' إلى 7 و '01234' إلى 1234
+# فيضيع الاسم أو كلمة المرور الأصلية ولا تطابق القيمة المرسلة
+TEXT_FIELDS = frozenset(('name', 'password', 'comment', 'profile', 'user', 'server', 'caller-id'))
+
+
+def parse_reply_word(word: str) -> Tuple[str, Any]:
+    """تحويل كلمة رد إلى (المفتاح، القيمة) دون تحويل الحقول النصية إلى أرقام"""
+    _, key, value = word.split('=', 2)
+    if key in TEXT_FIELDS:
+        return key, value
+    return parse_word(word)
+
+
+class TextFieldsApi(Api):
+    """جلسة librouteros تقرأ الردود بـ parse_reply_word (تُمرر إلى connect بـ subclass)"""
+
+    def readSentence(self) -> Tuple[str, Dict]:
+        reply_word, words = self.protocol.readSentence()
+        return reply_word, dict(parse_reply_word(word) for word in words)
+
+
+def compose_words(arguments: Optional[Dict[str, Any]]) -> List[str]:
+    """تحويل المعاملات إلى كلمات API (المفاتيح التي تبدأ بـ ? شروط استعلام)"""
+    words = []
+    for key, value in (arguments or {}).items():
+        if key.startswith('?'):
+            words.append(f'{key}={cast_to_api(value)}')
+        else:
+            words.append(compose_word(key, value))
+    return words
+
+
+class CommandResult:
+    """نتيجة أمر واحد ضمن دفعة أوامر"""
+
+    __slots__ = ('command', 'arguments', 'rows', 'error')
+
+    def __init__(self, command: str, arguments: Optional[Dict[str, Any]] = None):
+        self.command = command
+        self.arguments = arguments
+        self.rows: List[Dict] = []
+        self.error: Optional[TrapError] = None
+
+    @property
+    def ok(self) -> bool:
+        """هل نُفذ الأمر دون !trap"""
+        return self.error is None
+
+    def raise_for_error(self) -> List[Dict]:
+        """إرجاع الصفوف أو رفع خطأ الجهاز"""
+        if self.error is not None:
+            raise self.error
+        return self.rows
+
+    def __repr__(self) -> str:
+        status = 'ok' if self.ok else f'trap: {self.error}'
+        return f"<CommandResult {self.command} rows={len(self.rows)} {status}>"
+
+
+class TaggedCommandChannel:
+    """إرسال أوامر متعددة موسومة على جلسة librouteros واحدة"""
+
+    def __init__(self, api, window: int = 64):
+        """
+        Args:
+            api: جلسة librouteros متصلة
+            window: أقصى عدد من الأوامر المعلقة بانتظار الرد في نفس الوقت
+        """
+        if window < 1:
+            raise ValueError("window يجب أن يكون 1 على الأقل")
+        self.api = api
+        self.window = window
+        self._tags = itertools.count(1)
+
+    def _send(self, command: str, arguments: Optional[Dict[str, Any]]) -> str:
+        """كتابة جملة موسومة وإرجاع الوسم"""
+        tag = str(next(self._tags))
+        self.api.protocol.writeSentence(command, *compose_words(arguments), f'.tag={tag}')
+        return tag
+
+    def _read(self) -> Tuple[Optional[str], str, Dict]:
+        """قراءة جملة رد واحدة: (الوسم، كلمة الرد، السمات)"""
+        reply_word, words = self.api.protocol.readSentence()
+        tag = None
+        attributes = {}
+        for word in words:
+            if word.startswith('.tag='):
+                tag = word[5:]
+            elif word.startswith('='):
+                key, value = parse_reply_word(word)
+                attributes[key] = value
+        return tag, reply_word, attributes
+
+    def stream(self, commands: Iterable[Command]) -> Iterator[Tuple[int, CommandResult]]:
+        """
+        تنفيذ الأوامر مع إبقاء حتى window أمراً معلقاً
+
+        Yields:
+            (ترتيب الأمر في المدخلات، النتيجة) بترتيب اكتمال الردود
+        """
+        pending: Dict[str, Tuple[int, CommandResult]] = {}
+        source = iter(commands)
+        index = 0
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < self.window:
+                try:
+                    command, arguments = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                tag = self._send(command, arguments)
+                pending[tag] = (index, CommandResult(command, arguments))
+                index += 1
+
+            if not pending:
+                return
+
+            tag, reply_word, attributes = self._read()
+            entry = pending.get(tag)
+            if entry is None:
+                logger.warning(f"رد بوسم غير معروف {tag}: {reply_word}")
+                continue
+
+            position, result = entry
+            if reply_word == '!re':
+                result.rows.append(attributes)
+            elif reply_word == '!trap':
+                if result.error is None:
+                    result.error = TrapError(
+                        message=str(attributes.get('message', '')),
+                        category=attributes.get('category')
+                    )
+            elif reply_word == '!done':
+                if attributes:
+                    result.rows.append(attributes)
+                del pending[tag]
+                yield position, result
+
+    def execute(self, commands: Sequence[Command]) -> List[CommandResult]:
+        """تنفيذ الأوامر وإرجاع النتائج بنفس ترتيب المدخلات"""
+        results: List[Optional[CommandResult]] = [None] * len(commands)
+        for position, result in self.stream(commands):
+            results[position] = result
+        return results
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مجمع اتصالات MikroTik RouterOS
+يحتفظ بجلسات API مسجلة الدخول لإعادة استخدامها بين الطلبات
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Any
+import logging
+
+from mikrotik_manager import MikroTikManager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhaustedError(ConnectionError):
+    """لا يوجد اتصال متاح في المجمع خلال مهلة الانتظار"""
+
+
+class MikroTikConnectionPool:
+    """مجمع محدود وآمن بين الخيوط لجلسات MikroTik API"""
+
+    def __init__(self, host: str, username: str, password: str, port: int = 2080,
+                 timeout: int = 10, min_size: int = 1, max_size: int = 8,
+                 idle_timeout: float = 300, validate_after: float = 30,
+                 acquire_timeout: float = 15, keepalive_interval: Optional[float] = None):
+        """
+        إنشاء مجمع اتصالات
+
+        Args:
+            host: عنوان IP للجهاز
+            username: اسم المستخدم
+            password: كلمة المرور
+            port: منفذ API
+            timeout: مهلة الاتصال بالثواني
+            min_size: أقل عدد من الجلسات الخاملة يُحتفظ به عند الإخلاء
+            max_size: أقصى عدد من الجلسات المفتوحة في نفس الوقت
+            idle_timeout: مدة الخمول (بالثواني) قبل إغلاق الجلسة
+            validate_after: مدة الخمول التي بعدها يتم فحص الجلسة قبل تسليمها
+            acquire_timeout: مهلة انتظار جلسة متاحة بالثواني
+            keepalive_interval: عند تحديده تصبح الجلسات دائمة مع نبض دوري
+        """
+        if max_size < 1:
+            raise ValueError("max_size يجب أن يكون 1 على الأقل")
+
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self.acquire_timeout = acquire_timeout
+        self.keepalive_interval = keepalive_interval
+
+        self._condition = threading.Condition()
+        self._idle = deque()  # (manager, آخر استخدام)
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'evicted': 0,
+            'failed_checks': 0,
+            'waits': 0,
+            'timeouts': 0
+        }
+
+    def _create_manager(self) -> MikroTikManager:
+        """إنشاء جلسة جديدة وتسجيل الدخول"""
+        manager = MikroTikManager(
+            host=self.host,
+            username=self.username,
+            password=self.password,
+            port=self.port,
+            timeout=self.timeout,
+            persistent=self.keepalive_interval is not None,
+            keepalive_interval=self.keepalive_interval or 60
+        )
+        if not manager.connect():
+            raise ConnectionError("فشل في الاتصال بالجهاز")
+        return manager
+
+    def _matches_config(self, manager: MikroTikManager) -> bool:
+        """هل أُنشئت الجلسة بإعدادات الاتصال الحالية"""
+        return (manager.host, manager.port, manager.username, manager.password) == \
+            (self.host, self.port, self.username, self.password)
+
+    def _is_alive(self, manager: MikroTikManager) -> bool:
+        """فحص صلاحية الجلسة بأمر خفيف"""
+        if not manager.is_connected():
+            return False
+        try:
+            manager.execute_command('/system/identity/print', shared=False)
+            return True
+        except Exception:
+            return False
+
+    def _close_manager(self, manager: MikroTikManager):
+        """إغلاق جلسة دون رفع استثناءات"""
+        try:
+            manager.disconnect()
+        except Exception:
+            pass
+
+    def _evict_expired_locked(self, now: float) -> list:
+        """إزالة الجلسات الخاملة المنتهية (يُستدعى مع القفل)"""
+        expired = []
+        while len(self._idle) > self.min_size:
+            manager, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._stats['evicted'] += 1
+            expired.append(manager)
+        return expired
+
+    def acquire(self, timeout: Optional[float] = None) -> MikroTikManager:
+        """
+        استعارة جلسة من المجمع
+
+        Args:
+            timeout: مهلة الانتظار (افتراضياً acquire_timeout)
+
+        Returns:
+            جلسة متصلة يجب إرجاعها عبر release
+        """
+        wait_timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + wait_timeout
+
+        while True:
+            candidate = None
+            last_used = 0.0
+            create = False
+
+            with self._condition:
+                if self._closed:
+                    raise ConnectionError("مجمع الاتصالات مغلق")
+
+                expired = self._evict_expired_locked(time.monotonic())
+
+                if self._idle:
+                    # أحدث جلسة أولاً حتى تبقى القديمة مرشحة للإخلاء
+                    candidate, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolExhaustedError("لا يوجد اتصال متاح في المجمع")
+                    self._stats['waits'] += 1
+                    self._condition.wait(remaining)
+
+            for manager in expired:
+                self._close_manager(manager)
+
+            if create:
+                try:
+                    manager = self._create_manager()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._stats['created'] += 1
+                return manager
+
+            if candidate is None:
+                continue
+
+            idle_for = time.monotonic() - last_used
+            if not candidate.is_connected() or (
+                    idle_for >= self.validate_after and not self._is_alive(candidate)):
+                logger.warning(f"تم تجاهل جلسة غير صالحة إلى {self.host}:{self.port}")
+                self._close_manager(candidate)
+                with self._condition:
+                    self._size -= 1
+                    self._stats['failed_checks'] += 1
+                    self._condition.notify()
+                continue
+
+            with self._condition:
+                self._stats['reused'] += 1
+            return candidate
+
+    def release(self, manager: MikroTikManager, discard: bool = False):
+        """
+        إرجاع جلسة إلى المجمع
+
+        Args:
+            manager: الجلسة المستعارة
+            discard: إغلاق الجلسة بدلاً من إرجاعها
+        """
+        with self._condition:
+            if discard or self._closed or not manager.is_connected() or not self._matches_config(manager):
+                self._size -= 1
+                self._stats['discarded'] += 1
+                self._condition.notify()
+                close = True
+            else:
+                self._idle.append((manager, time.monotonic()))
+                self._condition.notify()
+                close = False
+
+        if close:
+            self._close_manager(manager)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """استعارة جلسة داخل with وإرجاعها تلقائياً"""
+        manager = self.acquire(timeout)
+        discard = False
+        try:
+            yield manager
+        except (ConnectionError, OSError):
+            discard = True
+            raise
+        finally:
+            self.release(manager, discard=discard)
+
+    def evict_idle(self) -> int:
+        """إغلاق الجلسات الخاملة المنتهية وإرجاع عددها"""
+        with self._condition:
+            expired = self._evict_expired_locked(time.monotonic())
+        for manager in expired:
+            self._close_manager(manager)
+        return len(expired)
+
+    def warm_up(self) -> int:
+        """فتح جلسات مسبقاً حتى الوصول إلى min_size"""
+        opened = 0
+        while True:
+            with self._condition:
+                if self._closed or len(self._idle) >= self.min_size or self._size >= self.max_size:
+                    return opened
+                self._size += 1
+            try:
+                manager = self._create_manager()
+            except Exception as e:
+                logger.error(f"خطأ في تجهيز اتصالات المجمع: {e}")
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                return opened
+            with self._condition:
+                self._stats['created'] += 1
+                self._idle.append((manager, time.monotonic()))
+                self._condition.notify()
+            opened += 1
+
+    def close_all(self):
+        """إغلاق كل الجلسات الخاملة؛ الجلسات المستعارة تُغلق عند إرجاعها"""
+        with self._condition:
+            idle = [manager for manager, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for manager in idle:
+            self._close_manager(manager)
+
+    def close(self):
+        """إغلاق المجمع نهائياً"""
+        with self._condition:
+            self._closed = True
+        self.close_all()
+
+    def reconfigure(self, host: str, username: str, password: str, port: int = 2080):
+        """تحديث بيانات الاتصال وإسقاط الجلسات القديمة"""
+        with self._condition:
+            self.host = host
+            self.username = username
+            self.password = password
+            self.port = port
+        self.close_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """إحصائيات المجمع"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size
+            })
+            return stats
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+توليد بيانات الدخول للعمليات بالجملة
+كلمات مرور من مولد عشوائي آمن (os.urandom) بأبجديات قابلة للتهيئة، وأسماء مستخدمين
+فريدة تُفحص مقابل مجموعة الأسماء الموجودة قبل إرسال أي أمر إلى الجهاز
+"""
+
+import os
+import string
+from typing import Dict, List, Optional, Iterable, Set
+
+# الأبجديات المتاحة بالاسم؛ كل الأحرف ASCII لأن جلسات API ترمز بـ ASCII
+ALPHABETS: Dict[str, str] = {
+    'alnum': string.ascii_letters + string.digits,
+    'lower': string.ascii_lowercase + string.digits,
+    'digits': string.digits,
+    'hex': string.digits + 'abcdef',
+    # دون الأحرف المتشابهة (0 O o 1 l I) لكروت الطباعة
+    'readable': 'abcdefghijkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+}
+
+DEFAULT_ALPHABET = 'alnum'
+
+# بادئة الأبجدية الصريحة (مثل chars:abc123)؛ بدونها يجب أن يكون الاسم من ALPHABETS
+LITERAL_PREFIX = 'chars:'
+
+
+def resolve_alphabet(alphabet: Optional[str]) -> str:
+    """
+    الأبجدية باسمها في ALPHABETS أو كنص أحرف صريح بعد البادئة chars:
+
+    Raises:
+        ValueError: اسم غير معروف، أو أبجدية فارغة أو بأحرف مكررة أو غير ASCII
+    """
+    alphabet = alphabet or DEFAULT_ALPHABET
+    if alphabet.startswith(LITERAL_PREFIX):
+        chars = alphabet[len(LITERAL_PREFIX):]
+    elif alphabet in ALPHABETS:
+        chars = ALPHABETS[alphabet]
+    else:
+        # خطأ إملائي مثل hexa يجب ألا يصبح أبجدية من الأحرف h و e و x و a
+        raise ValueError(
+            f"أبجدية غير معروفة: {alphabet} (المتاح: {', '.join(ALPHABETS)} أو {LITERAL_PREFIX}<الأحرف>)"
+        )
+    if len(chars) < 2 or len(set(chars)) != len(chars):
+        raise ValueError('الأبجدية يجب أن تحتوي حرفين مختلفين على الأقل دون تكرار')
+    if not chars.isascii() or not chars.isprintable():
+        raise ValueError('الأبجدية يجب أن تكون أحرف ASCII قابلة للطباعة')
+    return chars
+
+
+class CredentialGenerator:
+    """مولد كلمات مرور وأسماء مستخدمين لأبجدية واحدة"""
+
+    def __init__(self, alphabet: Optional[str] = None):
+        """
+        Args:
+            alphabet: اسم من ALPHABETS أو chars:<الأحرف> (افتراضياً alnum)
+        """
+        self.alphabet = resolve_alphabet(alphabet)
+
+        # جدول تحويل البايت العشوائي إلى حرف؛ البايتات فوق آخر مضاعف لطول
+        # الأبجدية تُحذف حتى يكون لكل حرف نفس الاحتمال (دون انحياز باقي القسمة)
+        size = len(self.alphabet)
+        self._limit = 256 - 256 % size
+        encoded = self.alphabet.encode('ascii')
+        self._table = bytes(encoded[byte % size] if byte < self._limit else 0 for byte in range(256))
+        self._reject = bytes(range(self._limit, 256))
+
+    def random_chars(self, count: int) -> str:
+        """count حرفاً عشوائياً من الأبجدية (تحويل بالجملة دون حلقة لكل حرف)"""
+        chunks = []
+        remaining = count
+        while remaining > 0:
+            # زيادة بسيطة لتعويض البايتات المحذوفة
+            raw = os.urandom(remaining * 256 // self._limit + 16)
+            data = raw.translate(self._table, self._reject)[:remaining]
+            chunks.append(data)
+            remaining -= len(data)
+        return b''.join(chunks).decode('ascii')
+
+    def password(self, length: int = 8) -> str:
+        """كلمة مرور واحدة"""
+        return self.random_chars(length)
+
+    def passwords(self, count: int, length: int = 8) -> List[str]:
+        """count كلمة مرور (ملايين في ثوانٍ قليلة)"""
+        if length < 1:
+            raise ValueError('طول كلمة المرور يجب أن يكون 1 على الأقل')
+        chars = self.random_chars(count * length)
+        return [chars[i:i + length] for i in range(0, count * length, length)]
+
+    def sequential_usernames(self, prefix: str, count: int, taken: Iterable[str] = (),
+                             start: int = 0) -> List[str]:
+        """
+        أسماء بادئة مع رقم (مثل user001) تتخطى الأسماء المحجوزة
+
+        Args:
+            taken: الأسماء الموجودة في الجهاز (مجموعة للبحث بـ O(1))
+            start: الرقم الذي يبدأ العد بعده
+        """
+        taken = taken if isinstance(taken, (set, frozenset)) else set(taken)
+        usernames = []
+        number = start
+        while len(usernames) < count:
+            number += 1
+            username = f"{prefix}{number:03d}"  # مثل: user001, محمد001
+            if username not in taken:
+                usernames.append(username)
+        return usernames
+
+    def random_usernames(self, prefix: str, count: int, length: int = 6,
+                         taken: Iterable[str] = ()) -> List[str]:
+        """
+        أسماء بادئة مع أحرف عشوائية (كروت الشحن) فريدة فيما بينها ومع الأسماء المحجوزة
+
+        Raises:
+            ValueError: لا تكفي الاحتمالات لهذا العدد من الأسماء الفريدة
+        """
+        taken = taken if isinstance(taken, (set, frozenset)) else set(taken)
+        if count > len(self.alphabet) ** length // 2:
+            raise ValueError('طول الاسم العشوائي قصير جداً لهذا العدد من الأسماء')
+        usernames: List[str] = []
+        seen: Set[str] = set()
+        while len(usernames) < count:
+            for suffix in self.passwords(count - len(usernames), length):
+                username = f"{prefix}{suffix}"
+                if username not in taken and username not in seen:
+                    seen.add(username)
+                    usernames.append(username)
+        return usernames
+
+
+_generators: Dict[str, CredentialGenerator] = {}
+
+
+def generator_for(alphabet: Optional[str] = None) -> CredentialGenerator:
+    """مولد الأبجدية (جدول التحويل يُبنى مرة واحدة لكل أبجدية)"""
+    key = alphabet or DEFAULT_ALPHABET
+    generator = _generators.get(key)
+    if generator is None:
+        generator = _generators[key] = CredentialGenerator(key)
+    return generator
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ذاكرة مؤقتة لبيانات الجهاز التي نادراً ما تتغير
+(الملفات الشخصية، خوادم Hotspot، الواجهات، عناوين IP)
+القراءة تمر عبر الذاكرة مع مدة صلاحية لكل مورد، وأوامر الكتابة على نفس المسار تلغيها
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# مدة الصلاحية الافتراضية (بالثواني) لكل مسار
+DEFAULT_TTLS = {
+    '/ppp/profile': 300,
+    '/ip/hotspot/user/profile': 300,
+    '/ip/hotspot': 300,
+    '/interface': 60,
+    '/ip/address': 120
+}
+
+# أوامر تغير محتوى المسار
+WRITE_VERBS = ('add', 'set', 'remove', 'enable', 'disable', 'unset', 'move')
+
+
+def split_command(command: str) -> Tuple[str, str]:
+    """فصل الأمر إلى (المسار، الفعل)"""
+    path, _, verb = command.rpartition('/')
+    return path, verb
+
+
+class MetadataCache:
+    """ذاكرة مؤقتة محدودة الحجم (LRU) مع مدة صلاحية لكل مسار"""
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 256):
+        """
+        Args:
+            ttls: مدة الصلاحية لكل مسار؛ المسارات غير المذكورة لا تُخزن
+            max_entries: أقصى عدد من النتائج المخزنة (الأقدم استخداماً يُحذف أولاً)
+        """
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[float, List[Dict]]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._keys_by_path: Dict[str, set] = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evicted': 0,
+            'invalidations': 0
+        }
+
+    def is_cacheable(self, command: str) -> bool:
+        """أمر print على مسار له مدة صلاحية"""
+        path, verb = split_command(command)
+        return verb == 'print' and path in self.ttls
+
+    def lookup(self, command: str, words: Sequence[str]) -> Optional[List[Dict]]:
+        """نسخة من النتيجة المخزنة أو None"""
+        key = (command, tuple(words))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            expires_at, rows = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._keys_by_path.get(split_command(command)[0], set()).discard(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+        return [dict(row) for row in rows]
+
+    def store(self, command: str, words: Sequence[str], rows: List[Dict], version: Optional[int] = None):
+        """
+        تخزين نتيجة أمر print
+
+        Args:
+            version: رقم إصدار المسار قبل القراءة؛ إذا تغير أثناءها فالنتيجة قديمة ولا تُخزن
+        """
+        path, _ = split_command(command)
+        ttl = self.ttls.get(path)
+        if not ttl:
+            return
+        key = (command, tuple(words))
+        with self._lock:
+            if version is not None and self._versions.get(path, 0) != version:
+                return
+            self._entries[key] = (time.monotonic() + ttl, [dict(row) for row in rows])
+            self._entries.move_to_end(key)
+            self._keys_by_path.setdefault(path, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._keys_by_path.get(split_command(old_key[0])[0], set()).discard(old_key)
+                self._stats['evicted'] += 1
+
+    def invalidate(self, command: str):
+        """إلغاء نتائج المسار بعد أمر كتابة عليه وزيادة رقم إصداره"""
+        path, verb = split_command(command)
+        if verb not in WRITE_VERBS:
+            return
+        with self._lock:
+            self._versions[path] = self._versions.get(path, 0) + 1
+            stale = self._keys_by_path.pop(path, None)
+            if stale:
+                for key in stale:
+                    self._entries.pop(key, None)
+                self._stats['invalidations'] += 1
+
+    def version(self, path: str) -> int:
+        """عدد أوامر الكتابة التي مرت على المسار من هذه العملية"""
+        with self._lock:
+            return self._versions.get(path, 0)
+
+    def clear(self):
+        """حذف كل النتائج المخزنة"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_path.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """عدادات الإصابة والإخفاق"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hit_ratio': round(stats['hits'] / lookups, 3) if lookups else 0.0
+            })
+            return stats
+
+
+# ذاكرة واحدة لكل جهاز مشتركة بين كل جلسات المجمع
+_caches: Dict[Tuple[str, int], MetadataCache] = {}
+_caches_lock = threading.Lock()
+
+
+def cache_for(host: str, port: int) -> MetadataCache:
+    """الذاكرة المؤقتة الخاصة بجهاز معين"""
+    key = (host, int(port))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = MetadataCache()
+        return cache
@@ -6,19 +6,347 @@
 """
 
 import librouteros
+from librouteros.exceptions import ConnectionClosed, FatalError, TrapError
 import socket
+import threading
 import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Sequence, Set, Tuple
 import logging
 
+from command_channel import TaggedCommandChannel, TextFieldsApi, CommandResult, Command, compose_words
+from circuit_breaker import CircuitBreaker, CircuitOpenError, breaker_for
+from metadata_cache import MetadataCache, cache_for, split_command
+from user_mirror import mirror_for
+from name_index import NameIndex, index_for
+from single_flight import SingleFlight, flight_for
+from credentials import generator_for
+
 # إعداد السجلات
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# أخطاء تعني أن جلسة API نفسها تالفة (وليس أن الأمر رُفض من الجهاز)
+CONNECTION_ERRORS = (socket.error, ConnectionClosed, FatalError)
+
+# أوامر لا تغير حالة الجهاز ويمكن إعادة إرسالها
+IDEMPOTENT_VERBS = ('print', 'getall')
+
+# أكثر من هذا العدد من الأسماء غير المفهرسة يُعاد تحميل فهرس الجدول بدلاً من استعلام كل اسم
+NAME_QUERY_LIMIT = 50
+
+# ==================== تنسيق ردود الجهاز ====================
+# دوال مشتركة بين MikroTikManager و AsyncMikroTikManager
+
+# الحقول التي تحتاجها كل دالة تنسيق؛ تُرسل كـ .proplist حتى لا يرسل الجهاز باقي الأعمدة
+ACTIVE_PPP_FIELDS = ('name', 'address', 'uptime', 'service')
+ACTIVE_HOTSPOT_FIELDS = ('user', 'address', 'uptime')
+INTERFACE_FIELDS = ('name', 'type', 'running', 'disabled')
+IP_ADDRESS_FIELDS = ('address', 'interface', 'network', 'disabled')
+PPP_SECRET_FIELDS = ('.id', 'name', 'service', 'profile', 'local-address', 'remote-address', 'disabled')
+USER_TRAFFIC_FIELDS = ('bytes-in', 'bytes-out', 'packets-in', 'packets-out', 'uptime')
+PPP_PROFILE_FIELDS = ('.id', 'name', 'local-address', 'remote-address', 'rate-limit')
+HOTSPOT_USER_FIELDS = ('.id', 'name', 'password', 'profile', 'server', 'address', 'mac-address',
+                       'comment', 'disabled', 'limit-uptime', 'limit-bytes-in', 'limit-bytes-out')
+HOTSPOT_PROFILE_FIELDS = ('.id', 'name', 'session-timeout', 'idle-timeout', 'keepalive-timeout',
+                          'status-autorefresh', 'shared-users', 'rate-limit')
+HOTSPOT_SERVER_FIELDS = ('.id', 'name', 'interface', 'address-pool', 'profile', 'disabled')
+USER_SUMMARY_FIELDS = ('.id', 'name', 'password', 'profile', 'comment', 'disabled')
+USER_DETAIL_FIELDS = USER_SUMMARY_FIELDS + ('rate-limit', 'limit-bytes-total')
+
+
+def projection(fields: Sequence[str], extra_fields: Optional[Sequence[str]] = None,
+               arguments: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    معاملات print مع .proplist يحتوي الحقول المطلوبة فقط
+
+    Args:
+        fields: الحقول التي تحتاجها دالة التنسيق
+        extra_fields: حقول إضافية يطلبها المستدعي صراحة
+        arguments: معاملات أخرى للأمر (مثل شروط الاستعلام)
+    """
+    names = list(fields)
+    for field in extra_fields or ():
+        if field not in names:
+            names.append(field)
+    params = dict(arguments or {})
+    params['.proplist'] = ','.join(names)
+    return params
+
+def with_extra_fields(formatted: Dict, row: Dict, extra_fields: Optional[Sequence[str]] = None) -> Dict:
+    """إضافة الحقول الإضافية المطلوبة إلى الصف المنسق (مع تحويل - إلى _)"""
+    for field in extra_fields or ():
+        key = field.lstrip('.').replace('-', '_')
+        formatted.setdefault(key, row.get(field, ''))
+    return formatted
+
+def as_bool(value: Any) -> bool:
+    """تحويل قيمة منطقية من الجهاز (true/yes أو True بعد تحويل librouteros)"""
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('true', 'yes')
+
+def format_active_ppp_user(user: Dict) -> Dict:
+    """تنسيق مستخدم PPP متصل"""
+    return {
+        'type': 'PPP',
+        'name': user.get('name', 'غير معروف'),
+        'address': user.get('address', 'غير معروف'),
+        'uptime': user.get('uptime', '0'),
+        'service': user.get('service', 'غير معروف')
+    }
+
+def format_active_hotspot_user(user: Dict) -> Dict:
+    """تنسيق مستخدم Hotspot متصل"""
+    return {
+        'type': 'Hotspot',
+        'name': user.get('user', 'غير معروف'),
+        'address': user.get('address', 'غير معروف'),
+        'uptime': user.get('uptime', '0'),
+        'service': 'hotspot'
+    }
+
+def format_interface(iface: Dict) -> Dict:
+    """تنسيق واجهة شبكة"""
+    return {
+        'name': iface.get('name', 'غير معروف'),
+        'type': iface.get('type', 'غير معروف'),
+        'running': as_bool(iface.get('running', 'false')),
+        'disabled': as_bool(iface.get('disabled', 'false'))
+    }
+
+def format_ip_address(addr: Dict) -> Dict:
+    """تنسيق عنوان IP"""
+    return {
+        'address': addr.get('address', 'غير معروف'),
+        'interface': addr.get('interface', 'غير معروف'),
+        'network': addr.get('network', 'غير معروف'),
+        'disabled': as_bool(addr.get('disabled', 'false'))
+    }
+
+def format_ppp_secret(secret: Dict) -> Dict:
+    """تنسيق مستخدم PPP"""
+    return {
+        'id': secret.get('.id', ''),
+        'name': secret.get('name', 'غير معروف'),
+        'service': secret.get('service', 'غير معروف'),
+        'profile': secret.get('profile', 'غير معروف'),
+        'local_address': secret.get('local-address', ''),
+        'remote_address': secret.get('remote-address', ''),
+        'disabled': as_bool(secret.get('disabled', 'false'))
+    }
+
+def format_user_traffic(user: Dict) -> Dict:
+    """تنسيق إحصائيات حركة البيانات لمستخدم متصل"""
+    return {
+        'bytes_in': user.get('bytes-in', '0'),
+        'bytes_out': user.get('bytes-out', '0'),
+        'packets_in': user.get('packets-in', '0'),
+        'packets_out': user.get('packets-out', '0'),
+        'uptime': user.get('uptime', '0')
+    }
+
+def format_ppp_profile(profile: Dict) -> Dict:
+    """تنسيق ملف PPP شخصي"""
+    return {
+        'id': profile.get('.id', ''),
+        'name': profile.get('name', 'غير معروف'),
+        'local_address': profile.get('local-address', ''),
+        'remote_address': profile.get('remote-address', ''),
+        'rate_limit': profile.get('rate-limit', '')
+    }
+
+def format_system_resources(resource: Dict) -> Dict:
+    """تنسيق موارد النظام"""
+    return {
+        'cpu_load': resource.get('cpu-load', '0'),
+        'free_memory': resource.get('free-memory', '0'),
+        'total_memory': resource.get('total-memory', '0'),
+        'free_hdd_space': resource.get('free-hdd-space', '0'),
+        'total_hdd_space': resource.get('total-hdd-space', '0'),
+        'uptime': resource.get('uptime', '0'),
+        'version': resource.get('version', 'غير معروف'),
+        'board_name': resource.get('board-name', 'غير معروف'),
+        'architecture': resource.get('architecture', 'غير معروف')
+    }
+
+def format_hotspot_user(user: Dict) -> Dict:
+    """تنسيق مستخدم Hotspot"""
+    return {
+        'id': user.get('.id', ''),
+        'name': user.get('name', 'غير معروف'),
+        'password': user.get('password', ''),
+        'profile': user.get('profile', 'default'),
+        'server': user.get('server', 'all'),
+        'address': user.get('address', ''),
+        'mac_address': user.get('mac-address', ''),
+        'comment': user.get('comment', ''),
+        'disabled': as_bool(user.get('disabled', 'false')),
+        'limit_uptime': user.get('limit-uptime', ''),
+        'limit_bytes_in': user.get('limit-bytes-in', ''),
+        'limit_bytes_out': user.get('limit-bytes-out', '')
+    }
+
+def format_hotspot_profile(profile: Dict) -> Dict:
+    """تنسيق ملف Hotspot شخصي"""
+    return {
+        'id': profile.get('.id', ''),
+        'name': profile.get('name', 'غير معروف'),
+        'session_timeout': profile.get('session-timeout', ''),
+        'idle_timeout': profile.get('idle-timeout', ''),
+        'keepalive_timeout': profile.get('keepalive-timeout', ''),
+        'status_autorefresh': profile.get('status-autorefresh', ''),
+        'shared_users': profile.get('shared-users', ''),
+        'rate_limit': profile.get('rate-limit', '')
+    }
+
+def format_hotspot_server(server: Dict) -> Dict:
+    """تنسيق خادم Hotspot"""
+    return {
+        'id': server.get('.id', ''),
+        'name': server.get('name', 'غير معروف'),
+        'interface': server.get('interface', ''),
+        'address_pool': server.get('address-pool', ''),
+        'profile': server.get('profile', ''),
+        'disabled': as_bool(server.get('disabled', 'false'))
+    }
+
+def format_user_details(user: Dict, user_type: str) -> Dict:
+    """تنسيق معلومات مفصلة لمستخدم PPP أو Hotspot"""
+    return {
+        'id': user.get('.id', ''),
+        'name': user.get('name', ''),
+        'password': user.get('password', ''),
+        'profile': user.get('profile', ''),
+        'comment': user.get('comment', ''),
+        'disabled': as_bool(user.get('disabled', 'false')),
+        'rate_limit': user.get('rate-limit', ''),
+        'data_limit': user.get('limit-bytes-total', '') if user_type == 'hotspot' else '',
+        'type': user_type
+    }
+
+def format_user_summary(user: Dict, user_type: str) -> Dict:
+    """تنسيق مختصر لمستخدم PPP أو Hotspot (للبحث حسب الملف أو التعليق)"""
+    return {
+        'id': user.get('.id', ''),
+        'name': user.get('name', ''),
+        'password': user.get('password', ''),
+        'profile': user.get('profile', ''),
+        'comment': user.get('comment', ''),
+        'disabled': as_bool(user.get('disabled', 'false')),
+        'type': user_type
+    }
+
+def build_ppp_user_params(username: str, password: str, profile: str = 'default',
+                          local_address: str = '', remote_address: str = '',
+                          service: str = 'any') -> Dict[str, str]:
+    """معاملات أمر /ppp/secret/add"""
+    params = {
+        'name': username,
+        'password': password,
+        'profile': profile,
+        'service': service
+    }
+
+    if local_address:
+        params['local-address'] = local_address
+    if remote_address:
+        params['remote-address'] = remote_address
+    return params
+
+def build_hotspot_user_params(username: str, password: str, profile: str = 'default',
+                              server: str = 'all', address: str = '', mac_address: str = '',
+                              comment: str = '', limit_uptime: str = '',
+                              limit_bytes_in: str = '', limit_bytes_out: str = '') -> Dict[str, str]:
+    """معاملات أمر /ip/hotspot/user/add"""
+    params = {
+        'name': username,
+        'password': password,
+        'profile': profile,
+        'server': server
+    }
+
+    if address:
+        params['address'] = address
+    if mac_address:
+        params['mac-address'] = mac_address
+    if comment:
+        params['comment'] = comment
+    if limit_uptime:
+        params['limit-uptime'] = limit_uptime
+    if limit_bytes_in:
+        params['limit-bytes-in'] = limit_bytes_in
+    if limit_bytes_out:
+        params['limit-bytes-out'] = limit_bytes_out
+    return params
+
+def build_rate_limit(upload_speed: str = '', download_speed: str = '') -> str:
+    """بناء قيمة rate-limit بصيغة رفع/تنزيل"""
+    if upload_speed and download_speed:
+        return f"{upload_speed}/{download_speed}"
+    elif download_speed:
+        return f"0/{download_speed}"
+    elif upload_speed:
+        return f"{upload_speed}/0"
+    return ''
+
+def build_data_limit_params(user_type: str, data_limit_gb: float) -> Dict[str, str]:
+    """
+    معاملات set لحد البيانات بالجيجابايت (للـ PPP يُحفظ في التعليق)
+
+    نص التعليق ASCII: جلسات API بترميز librouteros الافتراضي، والقيمة التي لا تُرمز
+    تُفشل دفعتها كاملة في العمليات بالجملة
+    """
+    if user_type == 'hotspot':
+        # تحويل الجيجابايت إلى بايت
+        return {'limit-bytes-total': str(int(data_limit_gb * 1024 * 1024 * 1024))}
+    return {'comment': f'data-limit: {data_limit_gb}GB'}
+
+# الأسماء العشوائية (name_type=random): أحرف صغيرة وأرقام بطول ثابت بعد البادئة
+RANDOM_NAME_ALPHABET = 'lower'
+RANDOM_NAME_LENGTH = 6
+
+def bulk_usernames(prefix: str = '', count: int = 10, name_type: str = 'prefix',
+                   custom_names: List[str] = None, taken: Iterable[str] = ()) -> List[str]:
+    """
+    أسماء المستخدمين للإنشاء بالجملة (بادئة مع رقم، أو بادئة مع أحرف عشوائية لكروت الشحن،
+    أو أسماء مخصصة)
+
+    Args:
+        taken: الأسماء الموجودة في الجهاز؛ الأسماء المرقمة والعشوائية تتخطاها حتى لا يرفضها الجهاز
+    """
+    if name_type == 'custom' and custom_names:
+        return list(custom_names)
+    if name_type == 'random':
+        return generator_for(RANDOM_NAME_ALPHABET).random_usernames(prefix, count, RANDOM_NAME_LENGTH, taken)
+    return generator_for().sequential_usernames(prefix, count, taken)
+
+def bulk_username_range(prefix: str, start: int, end: int) -> List[str]:
+    """أسماء المستخدمين من الموضع start إلى end (دون توليد القائمة كاملة)"""
+    return [f"{prefix}{i:03d}" for i in range(start + 1, end + 1)]  # مثل: user001, محمد001
+
+def new_bulk_users(usernames: Iterable[str], password_length: int, extra: Dict[str, Any],
+                   alphabet: Optional[str] = None) -> List[Dict]:
+    """
+    صفوف نتيجة الإنشاء بالجملة مع كلمات مرور عشوائية آمنة (الحالة فشل حتى يصل رد الجهاز)
+
+    Args:
+        alphabet: أبجدية كلمات المرور (اسم من credentials.ALPHABETS أو chars:<الأحرف>)
+    """
+    usernames = list(usernames)
+    passwords = generator_for(alphabet).passwords(len(usernames), password_length)
+    return [
+        dict(username=username, password=password, **extra, status='فشل')
+        for username, password in zip(usernames, passwords)
+    ]
+
 class MikroTikManager:
     """فئة لإدارة أجهزة MikroTik RouterOS عبر API"""
     
-    def __init__(self, host: str, username: str, password: str, port: int = 2080, timeout: int = 10):
+    def __init__(self, host: str, username: str, password: str, port: int = 2080, timeout: int = 10,
+                 persistent: bool = False, keepalive_interval: float = 60, max_retries: int = 2,
+                 max_backoff: float = 30, breaker: Optional[CircuitBreaker] = None,
+                 cache: Optional[MetadataCache] = None, index: Optional[NameIndex] = None,
+                 flights: Optional[SingleFlight] = None):
         """
         إنشاء اتصال جديد بجهاز MikroTik
         
@@ -28,6 +356,14 @@ class MikroTikManager:
             password: كلمة المرور
             port: منفذ API (افتراضي 8728)
             timeout: مهلة الاتصال بالثواني
+            persistent: جلسة طويلة العمر مع نبض دوري وإعادة اتصال تلقائية
+            keepalive_interval: الفاصل (بالثواني) بين نبضات الجلسة الخاملة
+            max_retries: عدد مرات إعادة محاولة أوامر القراءة عند انقطاع الجلسة
+            max_backoff: أقصى انتظار (بالثواني) بين محاولات إعادة الاتصال الفاشلة
+            breaker: قاطع الدائرة (افتراضياً القاطع المشترك لهذا الجهاز)
+            cache: ذاكرة البيانات الثابتة (افتراضياً الذاكرة المشتركة لهذا الجهاز)
+            index: فهرس الاسم ← .id (افتراضياً الفهرس المشترك لهذا الجهاز)
+            flights: دمج القراءات المتطابقة المتزامنة (افتراضياً المشترك لهذا الجهاز)
         """
         self.host = host
         self.username = username
@@ -36,6 +372,22 @@ class MikroTikManager:
         self.timeout = timeout
         self.api = None
         self.connected = False
+        self.persistent = persistent
+        self.keepalive_interval = keepalive_interval
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.breaker = breaker or breaker_for(host, port)
+        self.cache = cache or cache_for(host, port)
+        self.index = index or index_for(host, port)
+        self.flights = flights or flight_for(host, port)
+
+        # قفل الجلسة: يمنع تداخل الأوامر مع النبض على نفس المقبس
+        self._lock = threading.RLock()
+        self._last_activity = 0.0
+        self._connect_failures = 0
+        self._next_connect_at = 0.0
+        self._keepalive_stop = threading.Event()
+        self._keepalive_thread = None
         
     def connect(self) -> bool:
         """
@@ -44,71 +396,347 @@ class MikroTikManager:
         Returns:
             True إذا نجح الاتصال، False إذا فشل
         """
-        try:
-            logger.info(f"محاولة الاتصال بـ {self.host}:{self.port}")
-
-            # إنشاء اتصال باستخدام librouteros
-            self.api = librouteros.connect(
-                host=self.host,
-                username=self.username,
-                password=self.password,
-                port=self.port,
-                timeout=self.timeout
-            )
-            self.connected = True
-
-            logger.info("تم الاتصال بنجاح!")
-            return True
+        with self._lock:
+            if not self.breaker.allow():
+                logger.warning(f"تخطي الاتصال بـ {self.host}:{self.port}: الجهاز غير متاح حالياً")
+                return False
 
-        except socket.timeout:
-            logger.error("انتهت مهلة الاتصال")
-            return False
-        except socket.error as e:
-            logger.error(f"خطأ في الشبكة: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"خطأ في تسجيل الدخول: {e}")
+            try:
+                logger.info(f"محاولة الاتصال بـ {self.host}:{self.port}")
+
+                # إنشاء اتصال باستخدام librouteros
+                self.api = librouteros.connect(
+                    host=self.host,
+                    username=self.username,
+                    password=self.password,
+                    port=self.port,
+                    timeout=self.timeout,
+                    subclass=TextFieldsApi
+                )
+                self.connected = True
+                self._last_activity = time.monotonic()
+                self._connect_failures = 0
+                self._next_connect_at = 0.0
+                self.breaker.record_success()
+
+                logger.info("تم الاتصال بنجاح!")
+                if self.persistent:
+                    self._start_keepalive()
+                return True
+
+            except socket.timeout:
+                logger.error("انتهت مهلة الاتصال")
+                self.breaker.record_failure()
+            except socket.error as e:
+                logger.error(f"خطأ في الشبكة: {e}")
+                self.breaker.record_failure()
+            except Exception as e:
+                logger.error(f"خطأ في تسجيل الدخول: {e}")
+                # الجهاز رد على الطلب؛ خطأ بيانات الدخول لا يعني أنه غير متاح
+                self.breaker.record_success()
+
+            self._record_connect_failure()
             return False
     
     def disconnect(self):
         """قطع الاتصال"""
+        self._keepalive_stop.set()
+        with self._lock:
+            if self.api:
+                try:
+                    self.api.close()
+                    self.connected = False
+                    logger.info("تم قطع الاتصال")
+                except:
+                    pass
+    
+    def _drop_connection(self):
+        """إغلاق جلسة تالفة دون رفع استثناءات"""
+        self.connected = False
         if self.api:
             try:
                 self.api.close()
-                self.connected = False
-                logger.info("تم قطع الاتصال")
-            except:
+            except Exception:
                 pass
-    
+            self.api = None
+
+    def _record_connect_failure(self):
+        """تسجيل فشل اتصال وحساب موعد المحاولة التالية (تراجع أسي محدود)"""
+        self._connect_failures += 1
+        delay = min(2 ** (self._connect_failures - 1), self.max_backoff)
+        self._next_connect_at = time.monotonic() + delay
+
+    def _ensure_connected(self) -> bool:
+        """الاتصال عند الحاجة مع احترام فترة التراجع بعد الفشل وقاطع الدائرة"""
+        self.breaker.check()
+        if self.is_connected():
+            return True
+        if time.monotonic() < self._next_connect_at:
+            return False
+        return self.connect()
+
+    def _mark_activity(self):
+        """وصل رد من الجهاز"""
+        self._last_activity = time.monotonic()
+        self.breaker.record_success()
+
+    def _mark_failure(self):
+        """انقطعت الجلسة أثناء أمر"""
+        self.breaker.record_failure()
+        self._drop_connection()
+
+    def _start_keepalive(self):
+        """تشغيل خيط النبض للجلسة الدائمة"""
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+        self._keepalive_stop = threading.Event()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop,
+            args=(self._keepalive_stop,),
+            name=f"mikrotik-keepalive-{self.host}:{self.port}",
+            daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def _keepalive_loop(self, stop: threading.Event):
+        """إرسال أمر خفيف عند الخمول وإعادة الاتصال إذا انقطعت الجلسة"""
+        interval = max(1.0, self.keepalive_interval / 2)
+        while not stop.wait(interval):
+            if not self._lock.acquire(timeout=interval):
+                continue  # الجلسة مشغولة بأمر آخر
+            try:
+                if stop.is_set():
+                    return
+                if not self.is_connected():
+                    self._ensure_connected()
+                elif time.monotonic() - self._last_activity >= self.keepalive_interval:
+                    try:
+                        list(self.api(cmd='/system/identity/print'))
+                        self._mark_activity()
+                    except CONNECTION_ERRORS as e:
+                        logger.warning(f"فشل نبض الجلسة إلى {self.host}:{self.port}: {e}")
+                        self._mark_failure()
+                        self._ensure_connected()
+            except CircuitOpenError:
+                pass  # الجهاز غير متاح؛ المحاولة عند انتهاء مهلة القاطع
+            except Exception as e:
+                logger.error(f"خطأ في نبض الجلسة: {e}")
+            finally:
+                self._lock.release()
+
     def is_connected(self) -> bool:
         """فحص حالة الاتصال"""
         return self.connected and self.api is not None
-    
-    def execute_command(self, command: str, arguments: Dict[str, Any] = None) -> List[Dict]:
+
+    @staticmethod
+    def _is_idempotent(command: str) -> bool:
+        """أوامر القراءة التي يمكن إعادتها بأمان بعد انقطاع الجلسة"""
+        return command.rsplit('/', 1)[-1] in IDEMPOTENT_VERBS
+
+    def execute_command(self, command: str, arguments: Dict[str, Any] = None, shared: bool = True) -> List[Dict]:
         """
         تنفيذ أمر RouterOS
         
         Args:
             command: الأمر المراد تنفيذه
             arguments: معاملات الأمر
+            shared: السماح بمشاركة نتيجة قراءة متطابقة جارية على جلسة أخرى
+                (False لفحص هذه الجلسة نفسها)
             
         Returns:
             قائمة بالنتائج
         """
-        if not self.is_connected():
-            if not self.connect():
-                raise ConnectionError("فشل في الاتصال بالجهاز")
-        
-        try:
-            if arguments:
-                result = list(self.api(cmd=command, **arguments))
-            else:
-                result = list(self.api(cmd=command))
+        words = compose_words(arguments)
+        path, verb = split_command(command)
+        if verb != 'print' or not shared:
+            return self._run_command(command, words)
+
+        cacheable = self.cache.is_cacheable(command)
+        if cacheable:
+            cached = self.cache.lookup(command, words)
+            if cached is not None:
+                return cached
+        # رقم الإصدار في المفتاح: قراءة بعد أمر كتابة لا تشترك في قراءة بدأت قبله
+        version = self.cache.version(path)
+
+        def fetch() -> List[Dict]:
+            result = self._run_command(command, words)
+            if cacheable:
+                self.cache.store(command, words, result, version)
             return result
-        except Exception as e:
-            logger.error(f"خطأ في تنفيذ الأمر {command}: {e}")
-            raise
-    
+
+        return self.flights.do((command, tuple(words), version), fetch)
+
+    def _run_command(self, command: str, words: List[str]) -> List[Dict]:
+        """إرسال الأمر على هذه الجلسة مع إعادة المحاولة لأوامر القراءة"""
+        attempts = 1 + (self.max_retries if self._is_idempotent(command) else 0)
+
+        for attempt in range(attempts):
+            with self._lock:
+                if not self._ensure_connected():
+                    raise ConnectionError("فشل في الاتصال بالجهاز")
+
+                try:
+                    result = list(self.api.rawCmd(command, *words))
+                    self._mark_activity()
+                    return result
+                except CONNECTION_ERRORS as e:
+                    # الجلسة لم تعد صالحة؛ لا يجب إعادة استخدامها
+                    logger.error(f"انقطع الاتصال أثناء تنفيذ الأمر {command}: {e}")
+                    self._mark_failure()
+                    if attempt + 1 >= attempts:
+                        raise
+                    logger.info(f"إعادة محاولة الأمر {command} ({attempt + 1}/{self.max_retries})")
+                except TrapError as e:
+                    # الجهاز رد بخطأ؛ الجلسة ما زالت صالحة
+                    self._mark_activity()
+                    logger.error(f"خطأ في تنفيذ الأمر {command}: {e}")
+                    raise
+                except Exception as e:
+                    logger.error(f"خطأ في تنفيذ الأمر {command}: {e}")
+                    raise
+                finally:
+                    # قد يكون أمر الكتابة نُفذ حتى لو فشل انتظار رده
+                    self.cache.invalidate(command)
+
+    def iter_command(self, command: str, arguments: Dict[str, Any] = None) -> Iterator[Dict]:
+        """
+        تنفيذ أمر RouterOS وإرجاع الصفوف واحداً تلو الآخر فور وصولها
+        
+        لا تُجمع الردود في قائمة، لذلك تبقى الذاكرة ثابتة مهما كان عدد الصفوف.
+        الجلسة محجوزة حتى انتهاء القراءة أو إغلاق المولد.
+        
+        Args:
+            command: الأمر المراد تنفيذه
+            arguments: معاملات الأمر
+        """
+        words = compose_words(arguments)
+        attempts = 1 + (self.max_retries if self._is_idempotent(command) else 0)
+
+        with self._lock:
+            for attempt in range(attempts):
+                if not self._ensure_connected():
+                    raise ConnectionError("فشل في الاتصال بالجهاز")
+
+                yielded = False
+                finished = False
+                error = None
+                try:
+                    self.api.protocol.writeSentence(command, *words)
+                    while True:
+                        reply_word, row = self.api.readSentence()
+                        self._mark_activity()
+                        if reply_word == '!re':
+                            yielded = True
+                            yield row
+                        elif reply_word == '!trap':
+                            error = TrapError(message=str(row.get('message', '')),
+                                              category=row.get('category'))
+                        elif reply_word == '!done':
+                            break
+                    finished = True
+                except CONNECTION_ERRORS as e:
+                    logger.error(f"انقطع الاتصال أثناء تنفيذ الأمر {command}: {e}")
+                    self._mark_failure()
+                    # لا يمكن إعادة المحاولة بعد تسليم صفوف للمستدعي
+                    if yielded or attempt + 1 >= attempts:
+                        raise
+                    continue
+                finally:
+                    if not finished and self.is_connected():
+                        # أُغلق المولد قبل !done؛ بقية الرد ما زالت في المقبس
+                        self._drop_connection()
+
+                if error is not None:
+                    logger.error(f"خطأ في تنفيذ الأمر {command}: {error}")
+                    raise error
+                return
+
+    def execute_batch(self, commands: Sequence[Command], window: int = 64) -> List[CommandResult]:
+        """
+        تنفيذ عدة أوامر معاً على نفس الجلسة باستخدام .tag
+        
+        Args:
+            commands: قائمة (الأمر، المعاملات)
+            window: أقصى عدد من الأوامر المعلقة في نفس الوقت
+            
+        Returns:
+            نتيجة كل أمر بنفس الترتيب (أخطاء !trap تُحفظ في النتيجة ولا تُرفع)
+        """
+        commands = list(commands)
+        results: List[Optional[CommandResult]] = [None] * len(commands)
+
+        # أوامر print المخزنة في الذاكرة المؤقتة لا تُرسل
+        pending = []
+        stored = {}
+        for position, (command, arguments) in enumerate(commands):
+            if self.cache.is_cacheable(command):
+                words = compose_words(arguments)
+                cached = self.cache.lookup(command, words)
+                if cached is not None:
+                    results[position] = CommandResult(command, arguments)
+                    results[position].rows = cached
+                    continue
+                stored[position] = (words, self.cache.version(split_command(command)[0]))
+            pending.append(position)
+        if not pending:
+            return results
+
+        idempotent = all(self._is_idempotent(commands[position][0]) for position in pending)
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            with self._lock:
+                if not self._ensure_connected():
+                    raise ConnectionError("فشل في الاتصال بالجهاز")
+
+                try:
+                    fetched = TaggedCommandChannel(self.api, window).execute(
+                        [commands[position] for position in pending]
+                    )
+                    self._mark_activity()
+                    for position, result in zip(pending, fetched):
+                        results[position] = result
+                        if position in stored and result.ok:
+                            words, version = stored[position]
+                            self.cache.store(result.command, words, result.rows, version)
+                    return results
+                except CONNECTION_ERRORS as e:
+                    logger.error(f"انقطع الاتصال أثناء تنفيذ دفعة من {len(commands)} أمر: {e}")
+                    self._mark_failure()
+                    if attempt + 1 >= attempts:
+                        raise
+                finally:
+                    for command in {commands[position][0] for position in pending}:
+                        self.cache.invalidate(command)
+
+    def stream_batch(self, commands: Iterable[Command], window: int = 64) -> Iterator[Tuple[int, CommandResult]]:
+        """
+        تنفيذ أوامر كثيرة بشكل متدفق مع نافذة محدودة من الأوامر المعلقة
+        
+        Yields:
+            (ترتيب الأمر، النتيجة) بترتيب اكتمال الردود
+        """
+        with self._lock:
+            if not self._ensure_connected():
+                raise ConnectionError("فشل في الاتصال بالجهاز")
+
+            completed = False
+            try:
+                for item in TaggedCommandChannel(self.api, window).stream(commands):
+                    self._mark_activity()
+                    self.cache.invalidate(item[1].command)
+                    yield item
+                completed = True
+            except CONNECTION_ERRORS as e:
+                logger.error(f"انقطع الاتصال أثناء تنفيذ دفعة أوامر: {e}")
+                self.breaker.record_failure()
+                raise
+            finally:
+                if not completed:
+                    # توجد ردود معلقة لم تُقرأ؛ الجلسة لم تعد متزامنة
+                    self._drop_connection()
+
     def get_system_info(self) -> Dict:
         """الحصول على معلومات النظام"""
         try:
@@ -123,36 +751,21 @@ class MikroTikManager:
     def get_active_users(self) -> List[Dict]:
         """الحصول على قائمة المستخدمين المتصلين"""
         try:
-            # المستخدمين النشطين في PPP
-            ppp_users = self.execute_command('/ppp/active/print')
+            # المستخدمين النشطين في PPP و Hotspot في رحلة واحدة
+            ppp_result, hotspot_result = self.execute_batch([
+                ('/ppp/active/print', projection(ACTIVE_PPP_FIELDS)),
+                ('/ip/hotspot/active/print', projection(ACTIVE_HOTSPOT_FIELDS))
+            ])
+            ppp_users = ppp_result.raise_for_error()
             
-            # المستخدمين النشطين في Hotspot
-            hotspot_users = []
-            try:
-                hotspot_users = self.execute_command('/ip/hotspot/active/print')
-            except:
-                pass  # قد لا يكون Hotspot مفعل
+            # قد لا يكون Hotspot مفعل
+            hotspot_users = hotspot_result.rows if hotspot_result.ok else []
             
             # دمج القوائم
             all_users = []
             
-            for user in ppp_users:
-                all_users.append({
-                    'type': 'PPP',
-                    'name': user.get('name', 'غير معروف'),
-                    'address': user.get('address', 'غير معروف'),
-                    'uptime': user.get('uptime', '0'),
-                    'service': user.get('service', 'غير معروف')
-                })
-            
-            for user in hotspot_users:
-                all_users.append({
-                    'type': 'Hotspot',
-                    'name': user.get('user', 'غير معروف'),
-                    'address': user.get('address', 'غير معروف'),
-                    'uptime': user.get('uptime', '0'),
-                    'service': 'hotspot'
-                })
+            all_users.extend(format_active_ppp_user(user) for user in ppp_users)
+            all_users.extend(format_active_hotspot_user(user) for user in hotspot_users)
             
             return all_users
             
@@ -160,40 +773,62 @@ class MikroTikManager:
             logger.error(f"خطأ في الحصول على المستخدمين: {e}")
             return []
     
-    def get_interfaces(self) -> List[Dict]:
-        """الحصول على قائمة الواجهات"""
+    def get_interfaces(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة الواجهات (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
         try:
-            interfaces = self.execute_command('/interface/print')
-            return [
-                {
-                    'name': iface.get('name', 'غير معروف'),
-                    'type': iface.get('type', 'غير معروف'),
-                    'running': iface.get('running', 'false') == 'true',
-                    'disabled': iface.get('disabled', 'false') == 'true'
-                }
-                for iface in interfaces
-            ]
+            interfaces = self.execute_command('/interface/print', projection(INTERFACE_FIELDS, extra_fields))
+            return [with_extra_fields(format_interface(iface), iface, extra_fields) for iface in interfaces]
         except Exception as e:
             logger.error(f"خطأ في الحصول على الواجهات: {e}")
             return []
     
-    def get_ip_addresses(self) -> List[Dict]:
-        """الحصول على عناوين IP"""
+    def get_ip_addresses(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على عناوين IP (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
         try:
-            addresses = self.execute_command('/ip/address/print')
-            return [
-                {
-                    'address': addr.get('address', 'غير معروف'),
-                    'interface': addr.get('interface', 'غير معروف'),
-                    'network': addr.get('network', 'غير معروف'),
-                    'disabled': addr.get('disabled', 'false') == 'true'
-                }
-                for addr in addresses
-            ]
+            addresses = self.execute_command('/ip/address/print', projection(IP_ADDRESS_FIELDS, extra_fields))
+            return [with_extra_fields(format_ip_address(addr), addr, extra_fields) for addr in addresses]
         except Exception as e:
             logger.error(f"خطأ في الحصول على عناوين IP: {e}")
             return []
 
+    def get_dashboard(self, resources: bool = True) -> Dict[str, Any]:
+        """
+        بيانات الصفحة الرئيسية كلها في رحلة واحدة على هذه الجلسة
+
+        Args:
+            resources: قراءة /system/resource أيضاً (False إذا كانت متوفرة من مصدر آخر)
+
+        Returns:
+            system_info و system_resources (عند الطلب) و active_users و interfaces و ip_addresses
+        """
+        commands = [
+            ('/ppp/active/print', projection(ACTIVE_PPP_FIELDS)),
+            ('/ip/hotspot/active/print', projection(ACTIVE_HOTSPOT_FIELDS)),
+            ('/interface/print', projection(INTERFACE_FIELDS)),
+            ('/ip/address/print', projection(IP_ADDRESS_FIELDS))
+        ]
+        if resources:
+            commands.append(('/system/resource/print', None))
+        results = self.execute_batch(commands)
+        ppp_active, hotspot_active, interfaces, addresses = results[:4]
+
+        active_users = [format_active_ppp_user(user) for user in ppp_active.raise_for_error()]
+        # قد لا يكون Hotspot مفعل
+        if hotspot_active.ok:
+            active_users.extend(format_active_hotspot_user(user) for user in hotspot_active.rows)
+
+        dashboard = {
+            'active_users': active_users,
+            'active_count': len(active_users),
+            'interfaces': [format_interface(iface) for iface in interfaces.raise_for_error()],
+            'ip_addresses': [format_ip_address(addr) for addr in addresses.raise_for_error()]
+        }
+        if resources:
+            rows = results[4].raise_for_error()
+            dashboard['system_info'] = rows[0] if rows else {}
+            dashboard['system_resources'] = format_system_resources(rows[0]) if rows else {}
+        return dashboard
+
     def disconnect_user(self, user_id: str, user_type: str = 'ppp') -> bool:
         """قطع اتصال مستخدم"""
         try:
@@ -213,26 +848,32 @@ class MikroTikManager:
             logger.error(f"خطأ في قطع اتصال المستخدم {user_id}: {e}")
             return False
 
-    def get_ppp_secrets(self) -> List[Dict]:
-        """الحصول على قائمة مستخدمي PPP"""
+    def _mirrored_rows(self, path: str) -> Optional[List[Dict]]:
+        """صفوف الجدول من النسخة المحلية إذا كانت مشغلة وحديثة، وإلا None"""
+        mirror = mirror_for(self.host, self.port)
+        if mirror is None or not mirror.is_fresh(path):
+            return None
+        return mirror.rows(path)
+
+    def get_ppp_secrets(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة مستخدمي PPP (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
         try:
-            secrets = self.execute_command('/ppp/secret/print')
-            return [
-                {
-                    'id': secret.get('.id', ''),
-                    'name': secret.get('name', 'غير معروف'),
-                    'service': secret.get('service', 'غير معروف'),
-                    'profile': secret.get('profile', 'غير معروف'),
-                    'local_address': secret.get('local-address', ''),
-                    'remote_address': secret.get('remote-address', ''),
-                    'disabled': secret.get('disabled', 'false') == 'true'
-                }
-                for secret in secrets
-            ]
+            secrets = self._mirrored_rows('/ppp/secret')
+            if secrets is None:
+                secrets = self.execute_command('/ppp/secret/print', projection(PPP_SECRET_FIELDS, extra_fields))
+            return [with_extra_fields(format_ppp_secret(secret), secret, extra_fields) for secret in secrets]
         except Exception as e:
             logger.error(f"خطأ في الحصول على مستخدمي PPP: {e}")
             return []
 
+    def iter_ppp_secrets(self, extra_fields: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+        """مستخدمو PPP كمولد (للقوائم الكبيرة)"""
+        secrets = self._mirrored_rows('/ppp/secret')
+        if secrets is None:
+            secrets = self.iter_command('/ppp/secret/print', projection(PPP_SECRET_FIELDS, extra_fields))
+        for secret in secrets:
+            yield with_extra_fields(format_ppp_secret(secret), secret, extra_fields)
+
     def disable_user(self, user_id: str) -> bool:
         """تعطيل مستخدم PPP"""
         try:
@@ -257,16 +898,11 @@ class MikroTikManager:
         """الحصول على إحصائيات حركة البيانات للمستخدم"""
         try:
             # البحث في PPP active
-            ppp_active = self.execute_command('/ppp/active/print', {'?name': username})
+            ppp_active = self.execute_command(
+                '/ppp/active/print', projection(USER_TRAFFIC_FIELDS, arguments={'?name': username})
+            )
             if ppp_active:
-                user = ppp_active[0]
-                return {
-                    'bytes_in': user.get('bytes-in', '0'),
-                    'bytes_out': user.get('bytes-out', '0'),
-                    'packets_in': user.get('packets-in', '0'),
-                    'packets_out': user.get('packets-out', '0'),
-                    'uptime': user.get('uptime', '0')
-                }
+                return format_user_traffic(ppp_active[0])
             return {}
         except Exception as e:
             logger.error(f"خطأ في الحصول على إحصائيات المستخدم {username}: {e}")
@@ -277,19 +913,10 @@ class MikroTikManager:
                        service: str = 'any') -> bool:
         """إنشاء مستخدم PPP جديد"""
         try:
-            params = {
-                'name': username,
-                'password': password,
-                'profile': profile,
-                'service': service
-            }
-
-            if local_address:
-                params['local-address'] = local_address
-            if remote_address:
-                params['remote-address'] = remote_address
-
-            self.execute_command('/ppp/secret/add', params)
+            params = build_ppp_user_params(
+                username, password, profile, local_address, remote_address, service
+            )
+            self._remember_added('/ppp/secret', username, self.execute_command('/ppp/secret/add', params))
             logger.info(f"تم إنشاء المستخدم {username} بنجاح")
             return True
 
@@ -320,86 +947,83 @@ class MikroTikManager:
             logger.error(f"خطأ في تحديث كلمة مرور المستخدم {user_id}: {e}")
             return False
 
-    def get_ppp_profiles(self) -> List[Dict]:
-        """الحصول على قائمة ملفات PPP الشخصية"""
+    def get_ppp_profiles(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة ملفات PPP الشخصية (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
         try:
-            profiles = self.execute_command('/ppp/profile/print')
-            return [
-                {
-                    'id': profile.get('.id', ''),
-                    'name': profile.get('name', 'غير معروف'),
-                    'local_address': profile.get('local-address', ''),
-                    'remote_address': profile.get('remote-address', ''),
-                    'rate_limit': profile.get('rate-limit', '')
-                }
-                for profile in profiles
-            ]
+            profiles = self.execute_command('/ppp/profile/print', projection(PPP_PROFILE_FIELDS, extra_fields))
+            return [with_extra_fields(format_ppp_profile(profile), profile, extra_fields) for profile in profiles]
         except Exception as e:
             logger.error(f"خطأ في الحصول على ملفات PPP: {e}")
             return []
 
-    def create_bulk_users(self, prefix: str = '', count: int = 10, password_length: int = 8,
-                         profile: str = 'default', name_type: str = 'prefix',
-                         custom_names: List[str] = None) -> List[Dict]:
-        """إنشاء عدد كبير من مستخدمي PPP مع دعم الأسماء العربية"""
-        import random
-        import string
-
-        created_users = []
-
-        # تحديد الأسماء حسب النوع
-        if name_type == 'custom' and custom_names:
-            usernames = custom_names
-            count = len(usernames)
-        else:
-            usernames = []
-            for i in range(1, count + 1):
-                username = f"{prefix}{i:03d}"  # مثل: user001, محمد001
-                usernames.append(username)
-
-        for username in usernames:
-            # توليد كلمة مرور عشوائية
-            password = ''.join(random.choices(
-                string.ascii_letters + string.digits,
-                k=password_length
-            ))
+    def _create_bulk(self, command: str, usernames: List[str], password_length: int,
+                     build_params, extra: Dict[str, Any], window: int = 64,
+                     taken: Set[str] = frozenset()) -> List[Dict]:
+        """
+        إنشاء مستخدمين بإرسال أوامر add متتابعة دون انتظار رد كل أمر
+        
+        Args:
+            command: أمر الإضافة (/ppp/secret/add أو /ip/hotspot/user/add)
+            usernames: أسماء المستخدمين
+            password_length: طول كلمة المرور
+            build_params: دالة (الاسم، كلمة المرور) -> معاملات الأمر
+            extra: حقول ثابتة تُضاف لكل صف في النتيجة
+            window: أقصى عدد من أوامر add المعلقة في نفس الوقت
+            taken: الأسماء الموجودة في الجهاز؛ لا يُرسل لها أمر add
+            
+        Returns:
+            حالة كل مستخدم بنفس ترتيب الأسماء مع سبب الفشل من الجهاز إن وجد
+        """
+        created_users = new_bulk_users(usernames, password_length, extra)
 
-            if self.create_ppp_user(username, password, profile):
-                created_users.append({
-                    'username': username,
-                    'password': password,
-                    'profile': profile,
-                    'type': 'ppp',
-                    'status': 'تم الإنشاء'
-                })
+        # الأسماء الموجودة تُرفض محلياً دون رحلة إلى الجهاز
+        to_send = []
+        for user in created_users:
+            if user['username'] in taken:
+                user['error'] = 'اسم المستخدم موجود مسبقاً'
             else:
-                created_users.append({
-                    'username': username,
-                    'password': password,
-                    'profile': profile,
-                    'type': 'ppp',
-                    'status': 'فشل'
-                })
+                to_send.append(user)
 
+        commands = (
+            (command, build_params(user['username'], user['password'])) for user in to_send
+        )
+        answered = 0
+        try:
+            for position, result in self.stream_batch(commands, window):
+                answered += 1
+                user = to_send[position]
+                if result.ok:
+                    user['status'] = 'تم الإنشاء'
+                else:
+                    user['error'] = str(result.error)
+        except Exception as e:
+            logger.error(f"خطأ في إنشاء المستخدمين بالجملة بعد {answered} رد: {e}")
+            # المستخدمون الذين لم يصل ردهم: قد يكون بعضهم أُنشئ فعلاً
+            for user in created_users:
+                if user['status'] != 'تم الإنشاء' and 'error' not in user:
+                    user['error'] = str(e)
+
+        success_count = sum(1 for user in created_users if user['status'] == 'تم الإنشاء')
+        logger.info(f"تم إنشاء {success_count} من أصل {len(created_users)} مستخدم عبر {command}")
         return created_users
 
+    def create_bulk_users(self, prefix: str = '', count: int = 10, password_length: int = 8,
+                         profile: str = 'default', name_type: str = 'prefix',
+                         custom_names: List[str] = None, window: int = 64) -> List[Dict]:
+        """إنشاء عدد كبير من مستخدمي PPP مع دعم الأسماء العربية"""
+        taken = self._taken_names('/ppp/secret')
+        return self._create_bulk(
+            '/ppp/secret/add', bulk_usernames(prefix, count, name_type, custom_names, taken), password_length,
+            lambda username, password: build_ppp_user_params(username, password, profile),
+            {'profile': profile, 'type': 'ppp'}, window, taken
+        )
+
     def get_system_resources(self) -> Dict:
         """الحصول على موارد النظام المفصلة"""
         try:
             result = self.execute_command('/system/resource/print')
             if result:
-                resource = result[0]
-                return {
-                    'cpu_load': resource.get('cpu-load', '0'),
-                    'free_memory': resource.get('free-memory', '0'),
-                    'total_memory': resource.get('total-memory', '0'),
-                    'free_hdd_space': resource.get('free-hdd-space', '0'),
-                    'total_hdd_space': resource.get('total-hdd-space', '0'),
-                    'uptime': resource.get('uptime', '0'),
-                    'version': resource.get('version', 'غير معروف'),
-                    'board_name': resource.get('board-name', 'غير معروف'),
-                    'architecture': resource.get('architecture', 'غير معروف')
-                }
+                return format_system_resources(result[0])
             return {}
         except Exception as e:
             logger.error(f"خطأ في الحصول على موارد النظام: {e}")
@@ -407,58 +1031,36 @@ class MikroTikManager:
 
     # ==================== وظائف Hotspot ====================
 
-    def get_hotspot_users(self) -> List[Dict]:
-        """الحصول على قائمة مستخدمي Hotspot"""
+    def get_hotspot_users(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة مستخدمي Hotspot (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
         try:
-            users = self.execute_command('/ip/hotspot/user/print')
-            return [
-                {
-                    'id': user.get('.id', ''),
-                    'name': user.get('name', 'غير معروف'),
-                    'password': user.get('password', ''),
-                    'profile': user.get('profile', 'default'),
-                    'server': user.get('server', 'all'),
-                    'address': user.get('address', ''),
-                    'mac_address': user.get('mac-address', ''),
-                    'comment': user.get('comment', ''),
-                    'disabled': user.get('disabled', 'false') == 'true',
-                    'limit_uptime': user.get('limit-uptime', ''),
-                    'limit_bytes_in': user.get('limit-bytes-in', ''),
-                    'limit_bytes_out': user.get('limit-bytes-out', '')
-                }
-                for user in users
-            ]
+            users = self._mirrored_rows('/ip/hotspot/user')
+            if users is None:
+                users = self.execute_command('/ip/hotspot/user/print', projection(HOTSPOT_USER_FIELDS, extra_fields))
+            return [with_extra_fields(format_hotspot_user(user), user, extra_fields) for user in users]
         except Exception as e:
             logger.error(f"خطأ في الحصول على مستخدمي Hotspot: {e}")
             return []
 
+    def iter_hotspot_users(self, extra_fields: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+        """مستخدمو Hotspot كمولد (للقوائم الكبيرة)"""
+        users = self._mirrored_rows('/ip/hotspot/user')
+        if users is None:
+            users = self.iter_command('/ip/hotspot/user/print', projection(HOTSPOT_USER_FIELDS, extra_fields))
+        for user in users:
+            yield with_extra_fields(format_hotspot_user(user), user, extra_fields)
+
     def create_hotspot_user(self, username: str, password: str, profile: str = 'default',
                            server: str = 'all', address: str = '', mac_address: str = '',
                            comment: str = '', limit_uptime: str = '',
                            limit_bytes_in: str = '', limit_bytes_out: str = '') -> bool:
         """إنشاء مستخدم Hotspot جديد"""
         try:
-            params = {
-                'name': username,
-                'password': password,
-                'profile': profile,
-                'server': server
-            }
-
-            if address:
-                params['address'] = address
-            if mac_address:
-                params['mac-address'] = mac_address
-            if comment:
-                params['comment'] = comment
-            if limit_uptime:
-                params['limit-uptime'] = limit_uptime
-            if limit_bytes_in:
-                params['limit-bytes-in'] = limit_bytes_in
-            if limit_bytes_out:
-                params['limit-bytes-out'] = limit_bytes_out
-
-            self.execute_command('/ip/hotspot/user/add', params)
+            params = build_hotspot_user_params(
+                username, password, profile, server, address, mac_address,
+                comment, limit_uptime, limit_bytes_in, limit_bytes_out
+            )
+            self._remember_added('/ip/hotspot/user', username, self.execute_command('/ip/hotspot/user/add', params))
             logger.info(f"تم إنشاء مستخدم Hotspot {username} بنجاح")
             return True
 
@@ -509,92 +1111,35 @@ class MikroTikManager:
             logger.error(f"خطأ في تعطيل مستخدم Hotspot {user_id}: {e}")
             return False
 
-    def get_hotspot_profiles(self) -> List[Dict]:
-        """الحصول على قائمة ملفات Hotspot الشخصية"""
+    def get_hotspot_profiles(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة ملفات Hotspot الشخصية (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
         try:
-            profiles = self.execute_command('/ip/hotspot/user/profile/print')
-            return [
-                {
-                    'id': profile.get('.id', ''),
-                    'name': profile.get('name', 'غير معروف'),
-                    'session_timeout': profile.get('session-timeout', ''),
-                    'idle_timeout': profile.get('idle-timeout', ''),
-                    'keepalive_timeout': profile.get('keepalive-timeout', ''),
-                    'status_autorefresh': profile.get('status-autorefresh', ''),
-                    'shared_users': profile.get('shared-users', ''),
-                    'rate_limit': profile.get('rate-limit', '')
-                }
-                for profile in profiles
-            ]
+            profiles = self.execute_command('/ip/hotspot/user/profile/print', projection(HOTSPOT_PROFILE_FIELDS, extra_fields))
+            return [with_extra_fields(format_hotspot_profile(profile), profile, extra_fields) for profile in profiles]
         except Exception as e:
             logger.error(f"خطأ في الحصول على ملفات Hotspot: {e}")
             return []
 
-    def get_hotspot_servers(self) -> List[Dict]:
-        """الحصول على قائمة خوادم Hotspot"""
+    def get_hotspot_servers(self, extra_fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """الحصول على قائمة خوادم Hotspot (extra_fields: حقول إضافية تُضاف إلى .proplist)"""
         try:
-            servers = self.execute_command('/ip/hotspot/print')
-            return [
-                {
-                    'id': server.get('.id', ''),
-                    'name': server.get('name', 'غير معروف'),
-                    'interface': server.get('interface', ''),
-                    'address_pool': server.get('address-pool', ''),
-                    'profile': server.get('profile', ''),
-                    'disabled': server.get('disabled', 'false') == 'true'
-                }
-                for server in servers
-            ]
+            servers = self.execute_command('/ip/hotspot/print', projection(HOTSPOT_SERVER_FIELDS, extra_fields))
+            return [with_extra_fields(format_hotspot_server(server), server, extra_fields) for server in servers]
         except Exception as e:
             logger.error(f"خطأ في الحصول على خوادم Hotspot: {e}")
             return []
 
     def create_bulk_hotspot_users(self, prefix: str = '', count: int = 10, password_length: int = 8,
                                  profile: str = 'default', server: str = 'all',
-                                 name_type: str = 'prefix', custom_names: List[str] = None) -> List[Dict]:
+                                 name_type: str = 'prefix', custom_names: List[str] = None,
+                                 window: int = 64) -> List[Dict]:
         """إنشاء عدد كبير من مستخدمي Hotspot مع دعم الأسماء العربية"""
-        import random
-        import string
-
-        created_users = []
-
-        # تحديد الأسماء حسب النوع
-        if name_type == 'custom' and custom_names:
-            usernames = custom_names
-            count = len(usernames)
-        else:
-            usernames = []
-            for i in range(1, count + 1):
-                username = f"{prefix}{i:03d}"  # مثل: hotspot001, محمد001
-                usernames.append(username)
-
-        for username in usernames:
-            # توليد كلمة مرور عشوائية
-            password = ''.join(random.choices(
-                string.ascii_letters + string.digits,
-                k=password_length
-            ))
-
-            if self.create_hotspot_user(username, password, profile, server):
-                created_users.append({
-                    'username': username,
-                    'password': password,
-                    'profile': profile,
-                    'server': server,
-                    'type': 'hotspot',
-                    'status': 'تم الإنشاء'
-                })
-            else:
-                created_users.append({
-                    'username': username,
-                    'password': password,
-                    'profile': profile,
-                    'server': server,
-                    'type': 'hotspot',
-                    'status': 'فشل'
-                })
-
-        return created_users
+        taken = self._taken_names('/ip/hotspot/user')
+        return self._create_bulk(
+            '/ip/hotspot/user/add', bulk_usernames(prefix, count, name_type, custom_names, taken), password_length,
+            lambda username, password: build_hotspot_user_params(username, password, profile, server),
+            {'profile': profile, 'server': server, 'type': 'hotspot'}, window, taken
+        )
 
     # ==================== وظائف التحكم المتقدمة ====================
 
@@ -602,13 +1147,7 @@ class MikroTikManager:
                            download_speed: str = '') -> bool:
         """تحديد حد السرعة للمستخدم"""
         try:
-            rate_limit = ''
-            if upload_speed and download_speed:
-                rate_limit = f"{upload_speed}/{download_speed}"
-            elif download_speed:
-                rate_limit = f"0/{download_speed}"
-            elif upload_speed:
-                rate_limit = f"{upload_speed}/0"
+            rate_limit = build_rate_limit(upload_speed, download_speed)
 
             if user_type == 'hotspot':
                 # للـ Hotspot نحتاج تحديث الملف الشخصي أو المستخدم مباشرة
@@ -636,20 +1175,11 @@ class MikroTikManager:
             if data_limit_gb <= 0:
                 return True  # لا حد للبيانات
 
-            # تحويل الجيجابايت إلى بايت
-            data_limit_bytes = int(data_limit_gb * 1024 * 1024 * 1024)
-
-            if user_type == 'hotspot':
-                self.execute_command('/ip/hotspot/user/set', {
-                    '.id': user_id,
-                    'limit-bytes-total': str(data_limit_bytes)
-                })
-            else:  # PPP
-                # للـ PPP نستخدم الملف الشخصي أو نضع تعليق
-                self.execute_command('/ppp/secret/set', {
-                    '.id': user_id,
-                    'comment': f'حد البيانات: {data_limit_gb}GB'
-                })
+            # للـ Hotspot حد البايتات، وللـ PPP تعليق
+            path = '/ip/hotspot/user' if user_type == 'hotspot' else '/ppp/secret'
+            self.execute_command(f'{path}/set', dict(
+                build_data_limit_params(user_type, data_limit_gb), **{'.id': user_id}
+            ))
 
             logger.info(f"تم تحديد حد البيانات للمستخدم {user_id}: {data_limit_gb}GB")
             return True
@@ -661,24 +1191,13 @@ class MikroTikManager:
     def get_user_detailed_info(self, user_id: str, user_type: str) -> Dict:
         """الحصول على معلومات مفصلة للمستخدم"""
         try:
-            if user_type == 'hotspot':
-                users = self.execute_command('/ip/hotspot/user/print', {'.id': user_id})
-            else:  # PPP
-                users = self.execute_command('/ppp/secret/print', {'.id': user_id})
+            path = '/ip/hotspot/user' if user_type == 'hotspot' else '/ppp/secret'
+            users = self.execute_command(
+                f'{path}/print', projection(USER_DETAIL_FIELDS, arguments={'?.id': user_id})
+            )
 
             if users:
-                user = users[0]
-                return {
-                    'id': user.get('.id', ''),
-                    'name': user.get('name', ''),
-                    'password': user.get('password', ''),
-                    'profile': user.get('profile', ''),
-                    'comment': user.get('comment', ''),
-                    'disabled': user.get('disabled', 'false') == 'true',
-                    'rate_limit': user.get('rate-limit', ''),
-                    'data_limit': user.get('limit-bytes-total', '') if user_type == 'hotspot' else '',
-                    'type': user_type
-                }
+                return format_user_details(users[0], user_type)
             return {}
 
         except Exception as e:
@@ -690,31 +1209,17 @@ class MikroTikManager:
         try:
             users = []
 
-            if user_type in ['ppp', 'both']:
-                ppp_users = self.execute_command('/ppp/secret/print', {'?profile': profile_name})
-                for user in ppp_users:
-                    users.append({
-                        'id': user.get('.id', ''),
-                        'name': user.get('name', ''),
-                        'password': user.get('password', ''),
-                        'profile': user.get('profile', ''),
-                        'comment': user.get('comment', ''),
-                        'disabled': user.get('disabled', 'false') == 'true',
-                        'type': 'ppp'
-                    })
-
-            if user_type in ['hotspot', 'both']:
-                hotspot_users = self.execute_command('/ip/hotspot/user/print', {'?profile': profile_name})
-                for user in hotspot_users:
-                    users.append({
-                        'id': user.get('.id', ''),
-                        'name': user.get('name', ''),
-                        'password': user.get('password', ''),
-                        'profile': user.get('profile', ''),
-                        'comment': user.get('comment', ''),
-                        'disabled': user.get('disabled', 'false') == 'true',
-                        'type': 'hotspot'
-                    })
+            for kind, path in (('ppp', '/ppp/secret'), ('hotspot', '/ip/hotspot/user')):
+                if user_type not in [kind, 'both']:
+                    continue
+                rows = self._mirrored_rows(path)
+                if rows is None:
+                    rows = self.execute_command(
+                        f'{path}/print', projection(USER_SUMMARY_FIELDS, arguments={'?profile': profile_name})
+                    )
+                else:
+                    rows = [row for row in rows if row.get('profile') == profile_name]
+                users.extend(format_user_summary(user, kind) for user in rows)
 
             return users
 
@@ -727,139 +1232,242 @@ class MikroTikManager:
         try:
             users = []
 
-            if user_type in ['ppp', 'both']:
-                ppp_users = self.get_ppp_users()
-                for user in ppp_users:
-                    if comment_text.lower() in user.get('comment', '').lower():
-                        users.append(user)
+            needle = comment_text.lower()
 
-            if user_type in ['hotspot', 'both']:
-                hotspot_users = self.get_hotspot_users()
-                for user in hotspot_users:
-                    if comment_text.lower() in user.get('comment', '').lower():
-                        users.append(user)
+            for kind, path in (('ppp', '/ppp/secret'), ('hotspot', '/ip/hotspot/user')):
+                if user_type not in [kind, 'both']:
+                    continue
+                rows = self._mirrored_rows(path)
+                if rows is None:
+                    rows = self.execute_command(f'{path}/print', projection(USER_SUMMARY_FIELDS))
+                users.extend(format_user_summary(user, kind) for user in rows
+                             if needle in str(user.get('comment', '')).lower())
 
             return users
 
         except Exception as e:
             logger.error(f"خطأ في البحث بالتعليق {comment_text}: {e}")
             return []
-    
-    def __enter__(self):
-        """دعم استخدام with statement"""
-        self.connect()
-        return self
-    
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """إغلاق الاتصال عند الخروج من with statement"""
-        self.disconnect()
 
-# مثال على الاستخدام
-if __name__ == "__main__":
-    # إعدادات الاتصال
-    HOST = "89.189.68.60"
-    PORT = 2080  # منفذ API (ليس منفذ Winbox)
-    USERNAME = "admin"
-    PASSWORD = "khalid"
+    def iter_users(self, user_type: str = 'both', profile: Optional[str] = None,
+                   comment: Optional[str] = None, disabled: Optional[bool] = None,
+                   detailed: bool = False) -> Iterator[Dict]:
+        """
+        المستخدمون المطابقون للمحدد كمولد (من النسخة المحلية إن أمكن، وإلا من رد الجهاز مباشرة)
+
+        Args:
+            profile: اسم الملف الشخصي (مطابقة تامة)
+            comment: جزء من التعليق (دون تمييز حالة الأحرف)
+            disabled: حالة التعطيل
+            detailed: صيغة format_user_details (مع حد السرعة والبيانات) بدلاً من format_user_summary
+
+        الأخطاء تُرفع للمستدعي حتى لا تُطبق العملية على قائمة ناقصة
+        """
+        needle = comment.lower() if comment else None
+        fields = USER_DETAIL_FIELDS if detailed else USER_SUMMARY_FIELDS
+        format_user = format_user_details if detailed else format_user_summary
+
+        for kind, path in (('ppp', '/ppp/secret'), ('hotspot', '/ip/hotspot/user')):
+            if user_type not in [kind, 'both']:
+                continue
+            rows = self._mirrored_rows(path)
+            if rows is None:
+                # الملف الشخصي والحالة يُفلتران في الجهاز، والتعليق محلياً
+                arguments = {}
+                if profile is not None:
+                    arguments['?profile'] = profile
+                if disabled is not None:
+                    arguments['?disabled'] = 'true' if disabled else 'false'
+                rows = self.iter_command(f'{path}/print', projection(fields, arguments=arguments))
+            for row in rows:
+                user = format_user(row, kind)
+                if profile is not None and user['profile'] != profile:
+                    continue
+                if disabled is not None and user['disabled'] != disabled:
+                    continue
+                if needle is not None and needle not in str(user['comment']).lower():
+                    continue
+                yield user
+
+    def select_users(self, user_type: str = 'both', profile: Optional[str] = None,
+                     comment: Optional[str] = None, disabled: Optional[bool] = None) -> List[Dict]:
+        """المستخدمون المطابقون للمحدد (للعمليات بالجملة)"""
+        return list(self.iter_users(user_type, profile, comment, disabled))
+
+    def user_names(self, path: str) -> Set[str]:
+        """
+        أسماء كل العناصر في جدول المستخدمين كمجموعة (لفحص التكرار قبل الإرسال بـ O(1))
+
+        من النسخة المحلية إن كانت حديثة، وإلا قراءة واحدة للأسماء فقط؛ الأخطاء تُرفع للمستدعي
+        """
+        rows = self._mirrored_rows(path)
+        if rows is None:
+            rows = self.iter_command(f'{path}/print', {'.proplist': 'name'})
+        return {str(row.get('name', '')) for row in rows}
+
+    def _taken_names(self, path: str) -> Set[str]:
+        """user_names أو مجموعة فارغة عند تعذر القراءة (يرفض الجهاز الأسماء المكررة عندها)"""
+        try:
+            return self.user_names(path)
+        except Exception as e:
+            logger.warning(f"تعذر قراءة أسماء {path} للتحقق من التكرار: {e}")
+            return set()
     
-    # استخدام الأداة
-    with MikroTikManager(HOST, USERNAME, PASSWORD, PORT) as mt:
-        print("=== معلومات النظام ===")
-        system_info = mt.get_system_info()
-        if system_info:
-            print(f"اسم الجهاز: {system_info.get('board-name', 'غير معروف')}")
-            print(f"إصدار RouterOS: {system_info.get('version', 'غير معروف')}")
-            print(f"وقت التشغيل: {system_info.get('uptime', 'غير معروف')}")
-        
-        print("\n=== المستخدمون المتصلون ===")
-        users = mt.get_active_users()
-        if users:
-            for user in users:
-                print(f"- {user['name']} ({user['type']}) - {user['address']}")
+    # ==================== وظائف الإدارة باسم المستخدم ====================
+
+    def _find_ids(self, path: str, username: str, key: str = 'name') -> List[str]:
+        """
+        معرفات العناصر التي تطابق اسم المستخدم كما هي في الجهاز الآن
+
+        الأوامر باسم المستخدم تغير الجهاز، فلا يُعتمد فيها على معرف من الفهرس أو النسخة
+        المحلية: إذا أُعيدت تسمية المستخدم وأُنشئ آخر بنفس اسمه فالمعرف المخزن يشير إلى
+        المستخدم الخطأ دون أي خطأ من الجهاز؛ استعلام ?name= واحد يؤكد المعرف ويحدث الفهرس
+        """
+        rows = self.execute_command(f'{path}/print', {
+            '.proplist': '.id',
+            f'?{key}': username
+        })
+        ids = [row['.id'] for row in rows if '.id' in row]
+        if ids:
+            self.index.put(path, username, ids)
         else:
-            print("لا يوجد مستخدمون متصلون")
-        
-        print("\n=== الواجهات ===")
-        interfaces = mt.get_interfaces()
-        for iface in interfaces[:5]:  # أول 5 واجهات فقط
-            status = "نشط" if iface['running'] else "متوقف"
-            print(f"- {iface['name']} ({iface['type']}) - {status}")
+            self.index.forget(path, username)
+        return ids
 
-    def delete_ppp_user(self, username: str) -> bool:
-        """حذف مستخدم PPP"""
+    def find_ids_many(self, path: str, usernames: Iterable[str], key: str = 'name',
+                      refresh: bool = False) -> Dict[str, List[str]]:
+        """
+        معرفات عدة أسماء دفعة واحدة (للعمليات بالجملة)
+
+        الأسماء غير الموجودة في النسخة المحلية أو الفهرس (أو التي انتهى عمرها فيه) تُطلب
+        من الجهاز: بإعادة تحميل الفهرس إذا كان قديماً أو كانت كثيرة، ثم باستعلام ?name
+        مجمع لما بقي منها
+
+        Returns:
+            الاسم ← المعرفات للأسماء الموجودة فقط
+        """
+        found: Dict[str, List[str]] = {}
+        missing = list(dict.fromkeys(usernames))
+
+        if not refresh:
+            mirror = mirror_for(self.host, self.port)
+            if key == 'name' and mirror is not None and mirror.is_fresh(path):
+                remaining = []
+                for username in missing:
+                    ids = mirror.find_ids(path, username)
+                    if ids:
+                        found[username] = ids
+                    else:
+                        remaining.append(username)
+                missing = remaining
+            remaining = []
+            for username in missing:
+                ids = self.index.get(path, username)
+                if ids:
+                    found[username] = ids
+                else:
+                    remaining.append(username)
+            missing = remaining
+
+        if not missing:
+            return found
+
+        if self.index.needs_reload(path) or len(missing) > NAME_QUERY_LIMIT:
+            rows = self.execute_command(f'{path}/print', {'.proplist': f'.id,{key}'})
+            self.index.load(path, rows, key)
+            remaining = []
+            for username in missing:
+                ids = self.index.get(path, username)
+                if ids:
+                    found[username] = ids
+                else:
+                    remaining.append(username)
+            missing = remaining
+            if not missing:
+                return found
+
+        # ما لم يوجد في الفهرس يُسأل عنه الجهاز قبل الحكم بعدم وجوده
+        results = self.execute_batch([
+            (f'{path}/print', {'.proplist': '.id', f'?{key}': username}) for username in missing
+        ])
+        for username, result in zip(missing, results):
+            ids = [row['.id'] for row in result.raise_for_error() if '.id' in row]
+            if ids:
+                self.index.put(path, username, ids)
+                found[username] = ids
+        return found
+
+    def _remember_added(self, path: str, username: str, rows: List[Dict]):
+        """إضافة معرف العنصر الجديد (ret في رد add) إلى فهرس الأسماء"""
+        for row in rows:
+            if row.get('ret'):
+                self.index.put(path, username, [row['ret']])
+
+    def _execute_by_name(self, path: str, username: str, verb: str, arguments: Dict[str, Any] = None,
+                         key: str = 'name', all_ids: bool = False) -> List[str]:
+        """
+        تنفيذ أمر على العنصر الذي يحمل الاسم بعد تأكيد معرفه من الجهاز
+
+        Returns:
+            المعرفات التي نُفذ عليها الأمر، أو [] إذا لم يوجد الاسم
+        """
+        ids = self._find_ids(path, username, key)
+        if not ids:
+            return []
+        params = dict(arguments or {})
+        params['.id'] = ','.join(ids) if all_ids else ids[0]
         try:
-            if not self.connect():
-                return False
-            
-            # البحث عن المستخدم
-            ppp_secrets = self.api.path('ppp', 'secret')
-            users = list(ppp_secrets.select('name').where('name', username))
-            
-            if not users:
+            self.execute_command(f'{path}/{verb}', params)
+        except TrapError as e:
+            # حُذف العنصر بين الاستعلام والأمر
+            if 'no such item' not in str(e):
+                raise
+            self.index.forget(path, username, stale=True)
+            return []
+        if verb == 'remove':
+            self.index.forget(path, username)
+        return ids
+
+    def delete_ppp_user_by_name(self, username: str) -> bool:
+        """حذف مستخدم PPP باسم المستخدم"""
+        try:
+            # حذف المستخدم بمعرفه من الفهرس
+            if not self._execute_by_name('/ppp/secret', username, 'remove'):
                 logger.warning(f"المستخدم {username} غير موجود")
                 return False
             
-            # حذف المستخدم
-            user_id = users[0]['.id']
-            ppp_secrets.remove(user_id)
-            
             logger.info(f"تم حذف مستخدم PPP: {username}")
             return True
             
         except Exception as e:
             logger.error(f"خطأ في حذف مستخدم PPP {username}: {e}")
             return False
-        finally:
-            self.disconnect()
 
-    def delete_hotspot_user(self, username: str) -> bool:
-        """حذف مستخدم Hotspot"""
+    def delete_hotspot_user_by_name(self, username: str) -> bool:
+        """حذف مستخدم Hotspot باسم المستخدم"""
         try:
-            if not self.connect():
-                return False
-            
-            # البحث عن المستخدم
-            hotspot_users = self.api.path('ip', 'hotspot', 'user')
-            users = list(hotspot_users.select('name').where('name', username))
-            
-            if not users:
+            # حذف المستخدم بمعرفه من الفهرس
+            if not self._execute_by_name('/ip/hotspot/user', username, 'remove'):
                 logger.warning(f"المستخدم {username} غير موجود")
                 return False
             
-            # حذف المستخدم
-            user_id = users[0]['.id']
-            hotspot_users.remove(user_id)
-            
             logger.info(f"تم حذف مستخدم Hotspot: {username}")
             return True
             
         except Exception as e:
             logger.error(f"خطأ في حذف مستخدم Hotspot {username}: {e}")
             return False
-        finally:
-            self.disconnect()
 
     def toggle_ppp_user(self, username: str, disabled: bool) -> bool:
         """تفعيل/تعطيل مستخدم PPP"""
         try:
-            if not self.connect():
-                return False
-            
-            # البحث عن المستخدم
-            ppp_secrets = self.api.path('ppp', 'secret')
-            users = list(ppp_secrets.select('.id', 'name').where('name', username))
-            
-            if not users:
+            # تحديث حالة المستخدم بمعرفه من الفهرس
+            if not self._execute_by_name('/ppp/secret', username, 'set', {
+                'disabled': 'yes' if disabled else 'no'
+            }):
                 logger.warning(f"المستخدم {username} غير موجود")
                 return False
             
-            # تحديث حالة المستخدم
-            user_id = users[0]['.id']
-            ppp_secrets.update(**{
-                '.id': user_id,
-                'disabled': 'yes' if disabled else 'no'
-            })
-            
             status = 'معطل' if disabled else 'مفعل'
             logger.info(f"تم تغيير حالة مستخدم PPP {username} إلى {status}")
             return True
@@ -867,30 +1475,17 @@ if __name__ == "__main__":
         except Exception as e:
             logger.error(f"خطأ في تغيير حالة مستخدم PPP {username}: {e}")
             return False
-        finally:
-            self.disconnect()
 
     def toggle_hotspot_user(self, username: str, disabled: bool) -> bool:
         """تفعيل/تعطيل مستخدم Hotspot"""
         try:
-            if not self.connect():
-                return False
-            
-            # البحث عن المستخدم
-            hotspot_users = self.api.path('ip', 'hotspot', 'user')
-            users = list(hotspot_users.select('.id', 'name').where('name', username))
-            
-            if not users:
+            # تحديث حالة المستخدم بمعرفه من الفهرس
+            if not self._execute_by_name('/ip/hotspot/user', username, 'set', {
+                'disabled': 'yes' if disabled else 'no'
+            }):
                 logger.warning(f"المستخدم {username} غير موجود")
                 return False
             
-            # تحديث حالة المستخدم
-            user_id = users[0]['.id']
-            hotspot_users.update(**{
-                '.id': user_id,
-                'disabled': 'yes' if disabled else 'no'
-            })
-            
             status = 'معطل' if disabled else 'مفعل'
             logger.info(f"تم تغيير حالة مستخدم Hotspot {username} إلى {status}")
             return True
@@ -898,23 +1493,13 @@ if __name__ == "__main__":
         except Exception as e:
             logger.error(f"خطأ في تغيير حالة مستخدم Hotspot {username}: {e}")
             return False
-        finally:
-            self.disconnect()
 
     def renew_ppp_user(self, username: str) -> bool:
         """تجديد مستخدم PPP (إعادة تعيين حدود البيانات)"""
         try:
-            if not self.connect():
-                return False
-            
             # إعادة تعيين إحصائيات المستخدم
-            ppp_active = self.api.path('ppp', 'active')
-            active_users = list(ppp_active.select('.id', 'name').where('name', username))
-            
-            if active_users:
-                # قطع الاتصال لإعادة تعيين الإحصائيات
-                user_id = active_users[0]['.id']
-                ppp_active.remove(user_id)
+            # قطع الاتصال لإعادة تعيين الإحصائيات (لا شيء إذا لم يكن متصلاً)
+            self._execute_by_name('/ppp/active', username, 'remove')
             
             logger.info(f"تم تجديد مستخدم PPP: {username}")
             return True
@@ -922,23 +1507,13 @@ if __name__ == "__main__":
         except Exception as e:
             logger.error(f"خطأ في تجديد مستخدم PPP {username}: {e}")
             return False
-        finally:
-            self.disconnect()
 
     def renew_hotspot_user(self, username: str) -> bool:
         """تجديد مستخدم Hotspot (إعادة تعيين حدود البيانات)"""
         try:
-            if not self.connect():
-                return False
-            
             # إعادة تعيين إحصائيات المستخدم
-            hotspot_active = self.api.path('ip', 'hotspot', 'active')
-            active_users = list(hotspot_active.select('.id', 'user').where('user', username))
-            
-            if active_users:
-                # قطع الاتصال لإعادة تعيين الإحصائيات
-                for user in active_users:
-                    hotspot_active.remove(user['.id'])
+            # قطع كل جلسات المستخدم لإعادة تعيين الإحصائيات (لا شيء إذا لم يكن متصلاً)
+            self._execute_by_name('/ip/hotspot/active', username, 'remove', key='user', all_ids=True)
             
             logger.info(f"تم تجديد مستخدم Hotspot: {username}")
             return True
@@ -946,106 +1521,81 @@ if __name__ == "__main__":
         except Exception as e:
             logger.error(f"خطأ في تجديد مستخدم Hotspot {username}: {e}")
             return False
-        finally:
-            self.disconnect()
 
     def reset_ppp_user(self, username: str) -> bool:
         """إعادة ضبط مستخدم PPP (إعادة تعيين كلمة المرور)"""
         try:
-            if not self.connect():
-                return False
-            
-            # إنشاء كلمة مرور جديدة
-            import random
-            import string
-            new_password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+            # إنشاء كلمة مرور جديدة من المولد الآمن
+            new_password = generator_for().password(8)
             
-            # البحث عن المستخدم وتحديث كلمة المرور
-            ppp_secrets = self.api.path('ppp', 'secret')
-            users = list(ppp_secrets.select('.id', 'name').where('name', username))
-            
-            if not users:
+            # تحديث كلمة المرور بمعرف المستخدم من الفهرس
+            if not self._execute_by_name('/ppp/secret', username, 'set', {'password': new_password}):
                 logger.warning(f"المستخدم {username} غير موجود")
                 return False
             
-            user_id = users[0]['.id']
-            ppp_secrets.update(**{
-                '.id': user_id,
-                'password': new_password
-            })
-            
             logger.info(f"تم إعادة ضبط مستخدم PPP {username} بكلمة مرور جديدة: {new_password}")
             return True
             
         except Exception as e:
             logger.error(f"خطأ في إعادة ضبط مستخدم PPP {username}: {e}")
             return False
-        finally:
-            self.disconnect()
 
     def reset_hotspot_user(self, username: str) -> bool:
         """إعادة ضبط مستخدم Hotspot (إعادة تعيين كلمة المرور)"""
         try:
-            if not self.connect():
-                return False
-            
-            # إنشاء كلمة مرور جديدة
-            import random
-            import string
-            new_password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+            # إنشاء كلمة مرور جديدة من المولد الآمن
+            new_password = generator_for().password(8)
             
-            # البحث عن المستخدم وتحديث كلمة المرور
-            hotspot_users = self.api.path('ip', 'hotspot', 'user')
-            users = list(hotspot_users.select('.id', 'name').where('name', username))
-            
-            if not users:
+            # تحديث كلمة المرور بمعرف المستخدم من الفهرس
+            if not self._execute_by_name('/ip/hotspot/user', username, 'set', {'password': new_password}):
                 logger.warning(f"المستخدم {username} غير موجود")
                 return False
             
-            user_id = users[0]['.id']
-            hotspot_users.update(**{
-                '.id': user_id,
-                'password': new_password
-            })
-            
             logger.info(f"تم إعادة ضبط مستخدم Hotspot {username} بكلمة مرور جديدة: {new_password}")
             return True
             
         except Exception as e:
             logger.error(f"خطأ في إعادة ضبط مستخدم Hotspot {username}: {e}")
             return False
-        finally:
-            self.disconnect()
 
-    def get_hotspot_users(self) -> List[Dict[str, Any]]:
-        """الحصول على قائمة مستخدمي Hotspot"""
-        try:
-            if not self.connect():
-                return []
-            
-            hotspot_users = self.api.path('ip', 'hotspot', 'user')
-            users_data = list(hotspot_users.select(
-                'name', 'password', 'profile', 'server', 'disabled', 'comment'
-            ))
-            
-            users = []
-            for user in users_data:
-                users.append({
-                    'name': user.get('name', ''),
-                    'password': user.get('password', ''),
-                    'profile': user.get('profile', ''),
-                    'server': user.get('server', ''),
-                    'disabled': user.get('disabled', 'false'),
-                    'comment': user.get('comment', ''),
-                    'type': 'hotspot'
-                })
-            
-            logger.info(f"تم جلب {len(users)} مستخدم Hotspot")
-            return users
-            
-        except Exception as e:
-            logger.error(f"خطأ في جلب مستخدمي Hotspot: {e}")
-            return []
-        finally:
+    def __enter__(self):
+        """دعم استخدام with statement"""
+        if not self.is_connected():
+            self.connect()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """إغلاق الاتصال عند الخروج من with statement (الجلسة الدائمة تبقى مفتوحة)"""
+        if not self.persistent:
             self.disconnect()
 
+# مثال على الاستخدام
+if __name__ == "__main__":
+    # إعدادات الاتصال
+    HOST = "89.189.68.60"
+    PORT = 2080  # منفذ API (ليس منفذ Winbox)
+    USERNAME = "admin"
+    PASSWORD = "khalid"
+    
+    # استخدام الأداة
+    with MikroTikManager(HOST, USERNAME, PASSWORD, PORT) as mt:
+        print("=== معلومات النظام ===")
+        system_info = mt.get_system_info()
+        if system_info:
+            print(f"اسم الجهاز: {system_info.get('board-name', 'غير معروف')}")
+            print(f"إصدار RouterOS: {system_info.get('version', 'غير معروف')}")
+            print(f"وقت التشغيل: {system_info.get('uptime', 'غير معروف')}")
+        
+        print("\n=== المستخدمون المتصلون ===")
+        users = mt.get_active_users()
+        if users:
+            for user in users:
+                print(f"- {user['name']} ({user['type']}) - {user['address']}")
+        else:
+            print("لا يوجد مستخدمون متصلون")
+        
+        print("\n=== الواجهات ===")
+        interfaces = mt.get_interfaces()
+        for iface in interfaces[:5]:  # أول 5 واجهات فقط
+            status = "نشط" if iface['running'] else "متوقف"
+            print(f"- {iface['name']} ({iface['type']}) - {status}")
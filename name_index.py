@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+فهرس اسم المستخدم ← .id لجداول المستخدمين والجلسات النشطة
+مشترك بين كل الطلبات حتى تُحل أسماء العمليات بالجملة بقراءة واحدة للجدول؛
+المعرف يُعتمد لمدة قصيرة فقط لأن الاسم قد يُنقل إلى عنصر آخر من خارج التطبيق
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NameIndex:
+    """فهرس الاسم ← المعرفات لكل مسار مع عمر محدود لكل اسم"""
+
+    def __init__(self, reload_after: float = 10):
+        """
+        Args:
+            reload_after: عمر الاسم (بالثواني منذ تحميله أو إضافته) الذي بعده لا يُعتمد معرفه،
+                وعمر فهرس المسار الذي بعده يُعاد تحميله كاملاً عند أول إخفاق
+        """
+        self.reload_after = reload_after
+
+        self._lock = threading.Lock()
+        # المسار ← الاسم ← (المعرفات، وقت التخزين)
+        self._names: Dict[str, Dict[str, Tuple[List[str], float]]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'reloads': 0,
+            'stale': 0
+        }
+
+    def get(self, path: str, name: str) -> Optional[List[str]]:
+        """
+        معرفات الاسم أو None عند عدم وجوده في الفهرس أو انتهاء عمره
+
+        العمر يُفحص عند كل إصابة: إعادة تسمية المستخدم وإنشاء آخر بنفس الاسم لا تُرجع
+        خطأ no such item، فالمعرف القديم يبقى صالحاً ويشير إلى المستخدم الخطأ
+        """
+        with self._lock:
+            names = self._names.get(path, {})
+            entry = names.get(name)
+            if entry is not None and time.monotonic() - entry[1] >= self.reload_after:
+                del names[name]
+                self._stats['expired'] += 1
+                entry = None
+            if entry is not None and entry[0]:
+                self._stats['hits'] += 1
+                return list(entry[0])
+            self._stats['misses'] += 1
+            return None
+
+    def needs_reload(self, path: str) -> bool:
+        """هل فهرس المسار غير محمل أو قديم"""
+        with self._lock:
+            loaded_at = self._loaded_at.get(path)
+        return loaded_at is None or time.monotonic() - loaded_at >= self.reload_after
+
+    def load(self, path: str, rows: Iterable[Dict], key: str = 'name'):
+        """
+        استبدال فهرس المسار بنتيجة print (.id والاسم)
+
+        الصفوف يجب أن تُقرأ بـ parse_reply_word حتى يبقى الاسم '007' نصاً كما هو
+        """
+        ids_by_name: Dict[str, List[str]] = {}
+        for row in rows:
+            if '.id' in row and key in row:
+                ids_by_name.setdefault(str(row[key]), []).append(row['.id'])
+        now = time.monotonic()
+        with self._lock:
+            self._names[path] = {name: (ids, now) for name, ids in ids_by_name.items()}
+            self._loaded_at[path] = now
+            self._stats['reloads'] += 1
+
+    def put(self, path: str, name: str, ids: List[str]):
+        """إضافة أو تحديث اسم واحد"""
+        with self._lock:
+            self._names.setdefault(path, {})[name] = (list(ids), time.monotonic())
+
+    def forget(self, path: str, name: str, stale: bool = False):
+        """حذف اسم من الفهرس (بعد الحذف أو عند اكتشاف معرف قديم)"""
+        with self._lock:
+            self._names.get(path, {}).pop(name, None)
+            if stale:
+                self._stats['stale'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """عدادات الفهرس"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['names'] = {path: len(names) for path, names in self._names.items()}
+            return stats
+
+
+# فهرس واحد لكل جهاز مشترك بين كل جلسات المجمع
+_indexes: Dict[Tuple[str, int], NameIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(host: str, port: int) -> NameIndex:
+    """فهرس الأسماء الخاص بجهاز معين"""
+    key = (host, int(port))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = NameIndex()
+        return index
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+إنشاء عشرات الآلاف من المستخدمين على دفعات مع حفظ التقدم على القرص
+كل دفعة تُولد عند الحاجة وتُكتب قبل إرسالها، فبعد توقف التطبيق أو انقطاع الجهاز
+تُستأنف المهمة من آخر دفعة مؤكدة دون تكرار المستخدمين، والذاكرة بحجم دفعة واحدة
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Any, Iterator, Set, Tuple
+import logging
+
+from librouteros.exceptions import TrapError
+
+from bulk_jobs import BulkJob, failed_results, QUEUED, RUNNING, COMPLETED, CANCELLED, FAILED
+from bulk_writer import USER_PATHS, AdaptiveBulkWriter
+from mikrotik_manager import bulk_username_range, new_bulk_users
+
+logger = logging.getLogger(__name__)
+
+# الحالة بعد التحقق من أن المستخدم أُنشئ قبل التوقف
+CREATED_STATUS = 'تم الإنشاء'
+
+
+def _write_private(path: str, data: str):
+    """كتابة ملف لا يقرؤه غير المالك (يحتوي كلمات مرور) بشكل ذري"""
+    temp = f"{path}.tmp"
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+# ملف قفل فارغ أقدم من هذا (بالثواني) تركته عملية توقفت قبل كتابة رقمها
+EMPTY_LOCK_TIMEOUT = 60
+
+
+def _pid_alive(pid: int) -> bool:
+    """هل العملية ما زالت تعمل"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_owner(path: str) -> Optional[int]:
+    """رقم العملية المكتوب في ملف القفل (None إذا كان فارغاً أو محذوفاً)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return int(f.read().strip() or 0) or None
+    except (OSError, ValueError):
+        return None
+
+
+def acquire_lock(path: str) -> bool:
+    """
+    حجز ملف قفل المهمة بـ O_EXCL حتى لا تنفذها عمليتان (المُعيد أو عدة عمال WSGI)
+
+    القفل الذي تركته عملية منتهية يُستعاد؛ يُنقل أولاً باسم فريد ثم يُتحقق أنه نفس
+    القفل القديم، فلا تحذف عمليتان متزامنتان قفلاً حجزته إحداهما للتو
+    """
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            owner = _lock_owner(path)
+            if owner is not None and (owner == os.getpid() or _pid_alive(owner)):
+                return False
+            if owner is None:
+                try:
+                    if time.time() - os.path.getmtime(path) < EMPTY_LOCK_TIMEOUT:
+                        return False
+                except OSError:
+                    continue
+            stale = f"{path}.stale.{os.getpid()}"
+            try:
+                os.rename(path, stale)
+            except OSError:
+                continue
+            if _lock_owner(stale) != owner:
+                # حُجز القفل بين القراءة والنقل: يُعاد إلى صاحبه
+                os.rename(stale, path)
+                return False
+            os.remove(stale)
+            continue
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def _remove(path: str):
+    """حذف ملف إن وُجد"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class CheckpointedBulkJob(BulkJob):
+    """مهمة إنشاء بالجملة محفوظة على القرص: ملف الحالة، ودفعة معلقة، وملف النتائج"""
+
+    sequential = True
+
+    def __init__(self, job_id: str, directory: str, pool, params: Dict[str, Any],
+                 chunk_size: int = 200, max_backoff: float = 60, state: Optional[Dict] = None):
+        """
+        Args:
+            directory: مجلد ملفات المهام
+            pool: مجمع الاتصالات (للتحقق من الدفعة المعلقة بعد الاستئناف)
+            params: user_type و prefix و count و password_length و profile و server
+                    و password_alphabet (اختياري)
+            chunk_size: عدد المستخدمين في كل دفعة (وحدة الحفظ على القرص)
+            max_backoff: أقصى انتظار بين محاولات الدفعة عند انقطاع الجهاز
+            state: الحالة المحفوظة عند الاستئناف
+        """
+        super().__init__(
+            job_id, params['user_type'], [], [], chunk_size,
+            meta={'profile': params['profile'], 'prefix': params['prefix'], 'resumable': True},
+            total=params['count']
+        )
+        self.directory = directory
+        self.pool = pool
+        self.params = params
+        self.max_backoff = max_backoff
+
+        base = os.path.join(directory, job_id)
+        self.state_path = f"{base}.json"
+        self.results_path = f"{base}.ndjson"
+        self.lock_path = f"{base}.lock"
+
+        self._results_size = 0
+        self._offsets: List[int] = [0]  # موضع بداية كل دفعة في ملف النتائج
+        self._failures = 0
+        # أسماء الجهاز قبل الدفعة الأولى (تُقرأ مرة واحدة لكل تشغيل)
+        self._taken: Optional[Set[str]] = None
+
+        if state is None:
+            os.makedirs(directory, exist_ok=True)
+            acquire_lock(self.lock_path)
+            os.close(os.open(self.results_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+            self._save()
+        else:
+            self._restore(state)
+
+    # ==================== الحفظ والاستئناف ====================
+
+    def _pending_path(self, start: int) -> str:
+        """ملف الدفعة المرسلة التي لم تُحفظ نتيجتها بعد"""
+        return os.path.join(self.directory, f"{self.id}.pending.{start}.ndjson")
+
+    def _state(self) -> Dict[str, Any]:
+        """الحالة القابلة للحفظ"""
+        return {
+            'id': self.id,
+            'params': self.params,
+            'chunk_size': self.chunk_size,
+            'status': self.status,
+            'error': self.error,
+            'next': self._next,
+            'done': self._done,
+            'succeeded': self._succeeded,
+            'results_size': self._results_size,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+    def _save(self):
+        """حفظ الحالة (بعد كتابة نتائج الدفعة وقبل حذف الدفعة المعلقة)"""
+        _write_private(self.state_path, json.dumps(self._state(), ensure_ascii=False))
+
+    def _restore(self, state: Dict[str, Any]):
+        """استعادة الحالة وحذف أي نتائج كُتبت بعد آخر حفظ"""
+        self.status = state['status']
+        self.created_at = state['created_at']
+        self.started_at = state.get('started_at')
+        self.finished_at = state.get('finished_at')
+        self._next = self._done = state['done']
+        self._succeeded = state['succeeded']
+        self._results_size = state['results_size']
+        # المهمة التي فشلت (مثل امتلاء القرص) تُستأنف من آخر دفعة محفوظة
+        if self.status in (RUNNING, FAILED):
+            self.status = QUEUED
+            self.finished_at = None
+
+        # دفعات معلقة حُفظت نتيجتها قبل حذف ملفها
+        prefix = f"{self.id}.pending."
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and int(name[len(prefix):].split('.')[0]) < self._done:
+                os.remove(os.path.join(self.directory, name))
+
+        with open(self.results_path, 'r+b') as f:
+            f.truncate(self._results_size)
+            # إعادة بناء مواضع الدفعات بقراءة الملف مرة واحدة
+            count = 0
+            for line in iter(f.readline, b''):
+                count += 1
+                if count % self.chunk_size == 0:
+                    self._offsets.append(f.tell())
+
+    @staticmethod
+    def read_state(state_path: str) -> Dict[str, Any]:
+        """الحالة المحفوظة للمهمة"""
+        with open(state_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @classmethod
+    def load(cls, state_path: str, pool, max_backoff: float = 60,
+             state: Optional[Dict[str, Any]] = None) -> 'CheckpointedBulkJob':
+        """تحميل مهمة محفوظة (قفلها محجوز مسبقاً بـ acquire_lock)"""
+        if state is None:
+            state = cls.read_state(state_path)
+        return cls(
+            state['id'], os.path.dirname(state_path), pool, state['params'],
+            state['chunk_size'], max_backoff, state=state
+        )
+
+    # ==================== التنفيذ ====================
+
+    def _chunk_users(self, start: int, end: int) -> Tuple[List[Dict], bool]:
+        """
+        مستخدمو الدفعة: من الملف المعلق إذا بقي من محاولة سابقة، وإلا يُولدون ويُكتبون قبل الإرسال
+
+        Returns:
+            (المستخدمون، هل يجب التحقق من وجودهم في الجهاز)
+        """
+        pending_path = self._pending_path(start)
+        if os.path.exists(pending_path):
+            with open(pending_path, encoding='utf-8') as f:
+                users = [json.loads(line) for line in f if line.strip()]
+            return users, True
+
+        params = self.params
+        extra = {'profile': params['profile'], 'type': params['user_type']}
+        if params['user_type'] == 'hotspot':
+            extra['server'] = params['server']
+        users = new_bulk_users(
+            bulk_username_range(params['prefix'], start, end), params['password_length'], extra,
+            params.get('password_alphabet')
+        )
+        # الأسماء المرقمة ثابتة المواضع فلا تُتخطى؛ الموجود منها في الجهاز يُرفض دون إرسال
+        for user in users:
+            if user['username'] in self._taken:
+                user['error'] = 'اسم المستخدم موجود مسبقاً'
+
+        _write_private(
+            pending_path, ''.join(json.dumps(user, ensure_ascii=False) + '\n' for user in users)
+        )
+        return users, False
+
+    def _existing_users(self, users: List[Dict]) -> Dict[str, str]:
+        """كلمات مرور المستخدمين الموجودين فعلاً في الجهاز من هذه الدفعة (رحلة واحدة)"""
+        path = USER_PATHS[self.user_type]
+        with self.pool.connection() as mt:
+            results = mt.execute_batch([
+                (f'{path}/print', {'.proplist': 'name,password', '?name': user['username']})
+                for user in users
+            ])
+        # الاسم وكلمة المرور نصان كما أُرسلا (parse_reply_word لا يحول 007 أو 01234 إلى أرقام)
+        existing = {}
+        for result in results:
+            for row in result.raise_for_error():
+                existing[str(row.get('name', ''))] = str(row.get('password', ''))
+        return existing
+
+    def run_chunk(self, writer, start: int, end: int):
+        """تنفيذ دفعة: التحقق بعد الاستئناف، ثم الإرسال، ثم الحفظ قبل حذف الدفعة المعلقة"""
+        try:
+            if self._taken is None:
+                with self.pool.connection() as mt:
+                    self._taken = mt.user_names(USER_PATHS[self.user_type])
+            users, verify = self._chunk_users(start, end)
+            to_send = [user for user in users if 'error' not in user]
+            if verify:
+                # قد تكون بعض الأوامر نُفذت قبل التوقف: المستخدم بنفس كلمة المرور من هذه المهمة
+                existing = self._existing_users(users)
+                to_send = []
+                for user in users:
+                    password = existing.get(user['username'])
+                    if password is None:
+                        user.pop('error', None)
+                        to_send.append(user)
+                    elif password == user['password']:
+                        user['status'] = CREATED_STATUS
+                        user.pop('error', None)
+                    else:
+                        user['error'] = 'اسم المستخدم موجود مسبقاً'
+
+            commands = AdaptiveBulkWriter.add_commands(
+                self.user_type, to_send, self.params['profile'], self.params['server']
+            )
+            try:
+                results = writer.execute(commands)
+            except Exception as e:
+                results = failed_results(commands, e)
+
+            if any(not result.ok and not isinstance(result.error, TrapError) for result in results):
+                # انقطاع الاتصال: لا يُعرف أي الأوامر نُفذ، فتُعاد الدفعة مع التحقق
+                raise ConnectionError(next(
+                    result.error for result in results
+                    if not result.ok and not isinstance(result.error, TrapError)
+                ))
+        except Exception as e:
+            self._failures += 1
+            delay = min(self.max_backoff, 2 ** min(self._failures, 6))
+            logger.warning(f"تعذر تنفيذ دفعة المهمة {self.id} ({start}-{end}): {e} - إعادة المحاولة بعد {delay} ثانية")
+            with self._condition:
+                # الإلغاء يقطع الانتظار
+                self._condition.wait_for(lambda: self._cancel, delay)
+            self.release_chunk(start)
+            return
+
+        self._failures = 0
+        AdaptiveBulkWriter.apply_results(to_send, results)
+        self.record(users, sum(1 for user in users if user['status'] == CREATED_STATUS))
+        _remove(self._pending_path(start))
+
+    def _store_results(self, users: List[Dict]):
+        """إلحاق نتائج الدفعة بملف النتائج ثم حفظ الحالة (يُستدعى مع القفل)"""
+        data = ''.join(json.dumps(user, ensure_ascii=False) + '\n' for user in users).encode('utf-8')
+        with open(self.results_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._results_size += len(data)
+        self._offsets.append(self._results_size)
+
+    def record(self, users: List[Dict], succeeded: int):
+        """تسجيل الدفعة ثم حفظ الحالة"""
+        super().record(users, succeeded)
+        with self._condition:
+            if not self.finished:
+                self._save()
+
+    def _cancel_remaining(self):
+        """المستخدمون الذين لم يُولدوا بعد لا يُكتبون"""
+
+    def _pending_files(self) -> List[str]:
+        """ملفات الدفعات المعلقة للمهمة"""
+        prefix = f"{self.id}.pending."
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory) if name.startswith(prefix)
+        ]
+
+    def _finished(self):
+        """
+        حفظ الحالة النهائية وحذف الدفعة المعلقة (بعد الإلغاء) ثم تحرير القفل؛ بعد الفشل
+        تبقى الدفعة المعلقة حتى يُتحقق منها عند الاستئناف
+        """
+        try:
+            self._save()
+            if self.status != FAILED:
+                for path in self._pending_files():
+                    _remove(path)
+        finally:
+            _remove(self.lock_path)
+
+    def discard(self):
+        """حذف ملفات المهمة المنتهية (فيها كلمات المرور) عند إخراجها من المدير"""
+        for path in [self.state_path, self.results_path, self.lock_path] + self._pending_files():
+            _remove(path)
+
+    # ==================== المتابعة ====================
+
+    def results_since(self, since: int, limit: Optional[int] = None) -> List[Dict]:
+        """قراءة النتائج من الملف بدءاً من أقرب دفعة قبل since"""
+        chunk = min(since // self.chunk_size, len(self._offsets) - 1)
+        skip = since - chunk * self.chunk_size
+        results = []
+        with open(self.results_path, 'rb') as f:
+            f.seek(self._offsets[chunk])
+            for line in self._lines(f, self._results_size):
+                if skip:
+                    skip -= 1
+                    continue
+                results.append(json.loads(line))
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    @staticmethod
+    def _lines(f, size: int) -> Iterator[bytes]:
+        """أسطر الملف حتى الحجم المؤكد"""
+        while f.tell() < size:
+            line = f.readline()
+            if not line:
+                return
+            yield line
+
+
+def remove_job_files(directory: str, job_id: str):
+    """حذف كل ملفات مهمة من المجلد"""
+    for name in os.listdir(directory):
+        if name.startswith(f"{job_id}.") and not name.startswith(f"{job_id}.lock"):
+            _remove(os.path.join(directory, name))
+    _remove(os.path.join(directory, f"{job_id}.lock"))
+
+
+def resume_jobs(manager, directory: str, pool, max_backoff: float = 60) -> List[CheckpointedBulkJob]:
+    """
+    استئناف المهام المحفوظة غير المنتهية أو الفاشلة وحذف ملفات المهام المكتملة والملغاة
+
+    كل مهمة تُستأنف بعد حجز قفلها، فالمهمة التي تنفذها عملية أخرى تُتخطى
+
+    Returns:
+        المهام المستأنفة
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    jobs = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        state_path = os.path.join(directory, name)
+        job_id = name[:-len('.json')]
+        if not acquire_lock(os.path.join(directory, f"{job_id}.lock")):
+            continue
+        try:
+            state = CheckpointedBulkJob.read_state(state_path)
+            if state['status'] in (COMPLETED, CANCELLED):
+                remove_job_files(directory, job_id)
+                continue
+            jobs.append(CheckpointedBulkJob.load(state_path, pool, max_backoff, state))
+        except Exception as e:
+            _remove(os.path.join(directory, f"{job_id}.lock"))
+            logger.error(f"تعذر تحميل المهمة المحفوظة {name}: {e}")
+
+    for job in sorted(jobs, key=lambda job: job.created_at):
+        manager.submit_job(job)
+        logger.info(f"استئناف المهمة {job.id} من {job.progress(job.total)['done']} من {job.total}")
+    return jobs
@@ -142,7 +142,10 @@ def main():
     
     # تشغيل التطبيق
     try:
-        from app import app
+        from app import app, start_background_tasks
+        # مع debug يعمل الخادم في عملية فرعية من المُعيد (reloader)؛ المهام الخلفية تبدأ فيها وحدها
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_background_tasks()
         app.run(debug=True, port=5002, host='0.0.0.0')
     except KeyboardInterrupt:
         print("\n👋 تم إيقاف التطبيق")
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+بث مباشر للجلسات النشطة (PPP و Hotspot) إلى عدة مشتركين
+خيط واحد يقرأ الجدولين بفاصل ثابت ويرسل الفروق فقط (دخول، خروج، تحديث)،
+فتكلفة 50 لوحة مفتوحة على الجهاز مثل تكلفة لوحة واحدة
+"""
+
+import itertools
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Any, Tuple
+import logging
+
+from mikrotik_manager import (
+    ACTIVE_PPP_FIELDS, ACTIVE_HOTSPOT_FIELDS, projection, with_extra_fields,
+    format_active_ppp_user, format_active_hotspot_user
+)
+
+logger = logging.getLogger(__name__)
+
+# حقول تتغير في كل قراءة ولا تُعد تحديثاً (يحسبها العميل من وقت الدخول)
+VOLATILE_FIELDS = ('uptime',)
+
+# حدث: (الرقم التسلسلي، النوع، البيانات)
+Event = Tuple[int, str, Any]
+
+
+class Subscription:
+    """طابور أحداث مشترك واحد"""
+
+    def __init__(self, max_pending: int = 256):
+        self._queue: 'queue.Queue[Optional[Event]]' = queue.Queue(max_pending)
+        self.closed = False
+
+    def put(self, event: Event) -> bool:
+        """إضافة حدث؛ False إذا امتلأ الطابور (مشترك بطيء)"""
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self):
+        """إنهاء الاشتراك (يستيقظ القارئ ويخرج)"""
+        self.closed = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def next(self, timeout: float) -> Optional[Event]:
+        """الحدث التالي أو None عند انتهاء المهلة أو إغلاق الاشتراك"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def session_key(session: Dict) -> str:
+    """مفتاح الجلسة الثابت طوال مدة اتصالها"""
+    return f"{session['type']}:{session['id']}"
+
+
+class ActiveSessionFeed:
+    """قارئ واحد للجلسات النشطة يوزع الفروق على المشتركين"""
+
+    def __init__(self, pool, interval: float = 2.0, max_pending: int = 256):
+        """
+        Args:
+            pool: مجمع الاتصالات MikroTikConnectionPool
+            interval: الفاصل بين قراءتين بالثواني
+            max_pending: أقصى عدد من الأحداث غير المقروءة لكل مشترك قبل فصله
+        """
+        self.pool = pool
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._sessions: Optional[Dict[str, Dict]] = None
+        self._sequence = itertools.count(1)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            'samples': 0,
+            'errors': 0,
+            'events': 0,
+            'dropped_subscribers': 0
+        }
+
+    # ==================== الاشتراك ====================
+
+    def subscribe(self) -> Subscription:
+        """
+        اشتراك جديد؛ أول حدث له snapshot بكل الجلسات الحالية ثم join و leave و update
+        """
+        subscription = Subscription(self.max_pending)
+        with self._lock:
+            self._subscribers.append(subscription)
+            if self._sessions is not None:
+                subscription.put((next(self._sequence), 'snapshot', list(self._sessions.values())))
+        self._start()
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """إلغاء الاشتراك"""
+        subscription.close()
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def clear(self):
+        """نسيان الجلسات المعروفة (بعد تغيير الجهاز): القراءة التالية تُرسل snapshot جديداً"""
+        with self._lock:
+            self._sessions = None
+
+    # ==================== القراءة ====================
+
+    def _start(self):
+        """تشغيل خيط القراءة عند أول مشترك"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='active-session-feed')
+            self._thread.start()
+
+    def stop(self):
+        """إيقاف خيط القراءة وإغلاق كل الاشتراكات"""
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for subscription in subscribers:
+            subscription.close()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        """حلقة القراءة: تعمل ما دام هناك مشتركون"""
+        while not self._stop.is_set():
+            with self._lock:
+                idle = not self._subscribers
+                if idle:
+                    # لا أحد يشاهد: الحالة القديمة لا تصلح أساساً للفروق لاحقاً
+                    self._sessions = None
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+
+            started = time.monotonic()
+            self.sample()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _read_sessions(self) -> Dict[str, Dict]:
+        """قراءة الجدولين في رحلة واحدة على جلسة من المجمع"""
+        with self.pool.connection() as mt:
+            ppp_result, hotspot_result = mt.execute_batch([
+                ('/ppp/active/print', projection(ACTIVE_PPP_FIELDS, ['.id'])),
+                ('/ip/hotspot/active/print', projection(ACTIVE_HOTSPOT_FIELDS, ['.id']))
+            ])
+        sessions = [
+            with_extra_fields(format_active_ppp_user(row), row, ['.id'])
+            for row in ppp_result.raise_for_error()
+        ]
+        # قد لا يكون Hotspot مفعل
+        if hotspot_result.ok:
+            sessions.extend(
+                with_extra_fields(format_active_hotspot_user(row), row, ['.id'])
+                for row in hotspot_result.rows
+            )
+        return {session_key(session): session for session in sessions}
+
+    def sample(self):
+        """قراءة واحدة وإرسال الفروق لكل المشتركين"""
+        try:
+            current = self._read_sessions()
+        except Exception as e:
+            # تبقى الحالة السابقة؛ الفروق تُحسب منها عند نجاح القراءة التالية
+            logger.debug(f"تعذر قراءة الجلسات النشطة: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+            return
+
+        with self._lock:
+            self._stats['samples'] += 1
+            previous, self._sessions = self._sessions, current
+
+            if previous is None:
+                self._publish('snapshot', list(current.values()))
+                return
+
+            joined = [session for key, session in current.items() if key not in previous]
+            left = [
+                {'id': session['id'], 'type': session['type'], 'name': session['name']}
+                for key, session in previous.items() if key not in current
+            ]
+            updated = [
+                session for key, session in current.items()
+                if key in previous and self._changed(previous[key], session)
+            ]
+            for kind, sessions in (('join', joined), ('leave', left), ('update', updated)):
+                if sessions:
+                    self._publish(kind, sessions)
+
+    @staticmethod
+    def _changed(old: Dict, new: Dict) -> bool:
+        """هل تغير حقل غير متقلب"""
+        return any(old.get(key) != value for key, value in new.items() if key not in VOLATILE_FIELDS)
+
+    def _publish(self, kind: str, data: Any):
+        """إرسال حدث لكل المشتركين وفصل من امتلأ طابوره (يُستدعى مع القفل)"""
+        event = (next(self._sequence), kind, data)
+        self._stats['events'] += 1
+        for subscription in list(self._subscribers):
+            if not subscription.put(event):
+                # المشترك البطيء يُفصل ويعيد المتصفح الاتصال فيحصل على snapshot جديد
+                self._subscribers.remove(subscription)
+                subscription.close()
+                self._stats['dropped_subscribers'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """عدد المشتركين وإحصائيات القراءة"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'subscribers': len(self._subscribers),
+                'sessions': None if self._sessions is None else len(self._sessions),
+                'interval': self.interval
+            })
+            return stats
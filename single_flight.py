@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+دمج القراءات المتطابقة المتزامنة (single-flight)
+إذا طلب عدة مستخدمين نفس الأمر بنفس المعاملات في نفس الوقت يُرسل أمر واحد
+إلى الجهاز ويشترك الجميع في نتيجته
+"""
+
+import threading
+from typing import Dict, List, Optional, Any, Callable, Hashable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _fresh_error(error: BaseException) -> BaseException:
+    """
+    نسخة جديدة من الخطأ بنفس النوع والخصائص لكل منتظر
+
+    رفع نفس الكائن في عدة خيوط يجمع مسارات تنفيذها في traceback واحد مشترك؛ النسخة تُرفع
+    مع from حتى يبقى الخطأ الأصلي ظاهراً كسبب
+    """
+    cls = type(error)
+    try:
+        # دون استدعاء __init__ (مثل TrapError الذي يتطلب message ولا يحفظها في args)
+        fresh = cls.__new__(cls, *error.args)
+        fresh.args = error.args
+        fresh.__dict__.update(getattr(error, '__dict__', {}))
+    except Exception:
+        return RuntimeError(str(error))
+    return fresh
+
+
+class _Call:
+    """أمر جارٍ ومن ينتظر نتيجته"""
+
+    __slots__ = ('done', 'rows', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.rows: Optional[List[Dict]] = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """تنفيذ واحد لكل مفتاح في نفس الوقت مهما كان عدد الطالبين"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {
+            'calls': 0,
+            'executions': 0,
+            'coalesced': 0
+        }
+
+    def do(self, key: Hashable, fetch: Callable[[], List[Dict]]) -> List[Dict]:
+        """
+        تنفيذ fetch أو انتظار تنفيذ جارٍ بنفس المفتاح
+
+        الصفوف المشتركة تُنسخ لكل طالب حتى لا يرى أحدهم تعديلات الآخر؛
+        الأخطاء تُرفع لكل المنتظرين بنسخة جديدة سببها الخطأ الأصلي
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise _fresh_error(call.error) from call.error
+            return [dict(row) for row in call.rows]
+
+        try:
+            call.rows = fetch()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # الحذف قبل الإشعار: من يأتي بعد الآن يبدأ تنفيذاً جديداً
+            with self._lock:
+                del self._calls[key]
+                shared = call.followers > 0
+            call.done.set()
+
+        return [dict(row) for row in call.rows] if shared else call.rows
+
+    def stats(self) -> Dict[str, Any]:
+        """عدد الطلبات والتنفيذات الفعلية والطلبات المدمجة"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+            return stats
+
+
+# مجموعة واحدة لكل جهاز مشتركة بين كل جلسات المجمع
+_flights: Dict[Tuple[str, int], SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def flight_for(host: str, port: int) -> SingleFlight:
+    """مجموعة الدمج الخاصة بجهاز معين"""
+    key = (host, int(port))
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is None:
+            flight = _flights[key] = SingleFlight()
+        return flight
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تحديث دوري في الخلفية لبيانات لوحة التحكم (stale-while-revalidate)
+خيط واحد يقرأ كل مورد من الجهاز بفاصل ثابت، وطلبات HTTP تقرأ آخر لقطة وعمرها فقط،
+فيبقى الحمل على الجهاز ثابتاً مهما زاد عدد المتصفحات المفتوحة
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Any, Callable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """آخر قيمة مقروءة لمورد مع وقت قراءتها وآخر خطأ"""
+
+    __slots__ = ('value', 'fetched_at', 'error')
+
+    def __init__(self):
+        self.value: Any = None
+        self.fetched_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def age(self) -> Optional[float]:
+        """عمر القيمة بالثواني أو None إذا لم تُقرأ بعد"""
+        if self.fetched_at is None:
+            return None
+        return time.monotonic() - self.fetched_at
+
+
+class SnapshotRefresher:
+    """قراءة الموارد المسجلة دورياً على جلسة من المجمع"""
+
+    def __init__(self, pool, interval: float = 2.0, idle_after: float = 60.0, first_wait: float = 10.0):
+        """
+        Args:
+            pool: مجمع الاتصالات MikroTikConnectionPool
+            interval: الفاصل بين قراءتين لكل مورد بالثواني
+            idle_after: التوقف عن القراءة إذا لم يُطلب أي مورد خلال هذه المدة
+            first_wait: أقصى انتظار لأول قراءة عند طلب مورد لم يُقرأ بعد
+        """
+        self.pool = pool
+        self.interval = interval
+        self.idle_after = idle_after
+        self.first_wait = first_wait
+
+        self._fetchers: Dict[str, Callable] = {}
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._condition = threading.Condition()
+        self._last_access = 0.0
+        self._generation = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats = {
+            'refreshes': 0,
+            'errors': 0,
+            'reads': 0
+        }
+
+    def register(self, name: str, fetch: Callable):
+        """
+        تسجيل مورد
+
+        Args:
+            fetch: دالة تستقبل اتصال MikroTik وتعيد القيمة (الأخطاء تُبقي اللقطة السابقة)
+        """
+        with self._condition:
+            self._fetchers[name] = fetch
+            self._snapshots[name] = Snapshot()
+
+    # ==================== التشغيل ====================
+
+    def start(self):
+        """تشغيل خيط التحديث (مرة واحدة مهما تعدد المستدعون)"""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='snapshot-refresher')
+            self._thread.start()
+
+    def stop(self):
+        """إيقاف خيط التحديث"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def clear(self):
+        """حذف كل اللقطات (بعد تغيير الجهاز)"""
+        with self._condition:
+            # قراءة جارية من الجهاز السابق لا تُحفظ
+            self._generation += 1
+            for name in self._snapshots:
+                self._snapshots[name] = Snapshot()
+
+    def _idle(self) -> bool:
+        """لم يطلب أحد أي مورد مؤخراً"""
+        return time.monotonic() - self._last_access > self.idle_after
+
+    def _run(self):
+        """حلقة التحديث"""
+        while not self._stop.is_set():
+            if self._idle():
+                # لا أحد يشاهد: انتظار أول طلب بدلاً من إشغال الجهاز
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            started = time.monotonic()
+            self.refresh()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def refresh(self):
+        """قراءة كل الموارد المسجلة على جلسة واحدة"""
+        with self._condition:
+            fetchers = list(self._fetchers.items())
+            generation = self._generation
+
+        try:
+            with self.pool.connection() as mt:
+                for name, fetch in fetchers:
+                    self._refresh_one(mt, name, fetch, generation)
+        except Exception as e:
+            # فشل استعارة الجلسة: تبقى اللقطات السابقة
+            logger.debug(f"تعذر تحديث بيانات لوحة التحكم: {e}")
+            with self._condition:
+                self._stats['errors'] += 1
+                if generation == self._generation:
+                    for name, _ in fetchers:
+                        self._snapshots[name].error = str(e)
+                self._condition.notify_all()
+
+    def _refresh_one(self, mt, name: str, fetch: Callable, generation: int):
+        """قراءة مورد واحد وتحديث لقطته"""
+        try:
+            value = fetch(mt)
+        except Exception as e:
+            logger.debug(f"تعذر تحديث {name}: {e}")
+            with self._condition:
+                self._stats['errors'] += 1
+                if generation == self._generation:
+                    self._snapshots[name].error = str(e)
+                self._condition.notify_all()
+            return
+
+        snapshot = Snapshot()
+        snapshot.value = value
+        snapshot.fetched_at = time.monotonic()
+        with self._condition:
+            if generation == self._generation:
+                self._snapshots[name] = snapshot
+            self._stats['refreshes'] += 1
+            self._condition.notify_all()
+
+    # ==================== القراءة ====================
+
+    def get(self, name: str) -> Tuple[Any, Optional[float], Optional[str]]:
+        """
+        آخر لقطة للمورد
+
+        يشغل خيط التحديث عند أول استخدام إذا لم يُشغل (مثل التشغيل دون start_background_tasks)
+
+        Returns:
+            (القيمة، العمر بالثواني، آخر خطأ)؛ القيمة None والعمر None إذا تعذرت أول قراءة
+        """
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+        with self._condition:
+            self._stats['reads'] += 1
+            was_idle = self._idle()
+            self._last_access = time.monotonic()
+            if was_idle:
+                self._wake.set()
+
+            deadline = time.monotonic() + self.first_wait
+            snapshot = self._snapshots[name]
+            # أول طلب فقط ينتظر القراءة؛ بعدها تُعاد اللقطة الحالية فوراً حتى لو كانت قديمة
+            while snapshot.fetched_at is None and snapshot.error is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not (self._thread and self._thread.is_alive()):
+                    break
+                self._condition.wait(remaining)
+                snapshot = self._snapshots[name]
+
+            return snapshot.value, snapshot.age(), snapshot.error
+
+    def stats(self) -> Dict[str, Any]:
+        """إحصائيات التحديث وعمر كل لقطة"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'interval': self.interval,
+                'idle': self._idle(),
+                'ages': {
+                    name: None if snapshot.age() is None else round(snapshot.age(), 1)
+                    for name, snapshot in self._snapshots.items()
+                }
+            })
+            return stats
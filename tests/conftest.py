@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""أدوات مشتركة للاختبارات: جهاز وهمي ومجمع اتصالات إليه"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app يُستورد مرة واحدة؛ النسخة المحلية معطلة حتى تُقرأ الجداول من الجهاز الوهمي مباشرة
+os.environ.setdefault('MIKROTIK_MIRROR', '0')
+
+from fake_routeros import FakeRouter, FakeRouterServer  # noqa: E402
+from connection_pool import MikroTikConnectionPool  # noqa: E402
+from bulk_writer import AdaptiveBulkWriter  # noqa: E402
+
+
+@pytest.fixture
+def router():
+    return FakeRouter(ppp_users=3, hotspot_users=2)
+
+
+@pytest.fixture
+def server(router):
+    server = FakeRouterServer(router)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def pool(server):
+    # منفذ جديد لكل اختبار، فالقاطع والذاكرة المؤقتة والفهرس لكل جهاز لا تتشارك بين الاختبارات
+    pool = MikroTikConnectionPool(server.host, 'admin', 'secret', port=server.port, timeout=2, max_size=4)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def writer(pool):
+    return AdaptiveBulkWriter(pool, max_workers=2, window=8)
+
+
+@pytest.fixture
+def client(server, tmp_path, monkeypatch):
+    """عميل اختبار Flask موجه إلى الجهاز الوهمي"""
+    import app as app_module
+    config = {'host': server.host, 'port': server.port, 'username': 'admin', 'password': 'secret'}
+    monkeypatch.setattr(app_module, 'MIKROTIK_CONFIG', config)
+    monkeypatch.setattr(app_module, 'JOB_DIR', str(tmp_path))
+    app_module.connection_pool.reconfigure(server.host, 'admin', 'secret', server.port)
+    yield app_module.app.test_client()
+    # الخيطان يبدآن من جديد عند أول طلب في الاختبار التالي دون حالة الجهاز السابق
+    app_module.dashboard_refresher.stop()
+    app_module.session_feed.stop()
+    app_module.session_feed.clear()
+    app_module.connection_pool.close_all()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+جهاز RouterOS وهمي للاختبارات
+يخدم بروتوكول API على منفذ محلي بجداول في الذاكرة (login و print مع .proplist و ?name=
+و add و set و remove و enable و disable) حتى تُختبر الوحدات دون جهاز حقيقي؛
+بخادم متزامن بخيط لكل اتصال، أو بخادم asyncio يرد على كل جملة بشكل مستقل
+"""
+
+import asyncio
+import itertools
+import socket
+import threading
+from typing import Dict, List, Optional
+
+from librouteros.protocol import Encoder, Decoder
+
+
+class _Codec(Encoder, Decoder):
+    encoding = 'utf-8'
+
+
+_codec = _Codec()
+
+# جمل الرد لأمر واحد
+Replies = List[List[str]]
+
+
+def encode_sentence(words: List[str]) -> bytes:
+    """ترميز جملة API (طول كل كلمة ثم الكلمة ثم كلمة فارغة)"""
+    data = b''
+    for word in words:
+        raw = word.encode('utf-8')
+        data += _codec.encodeLength(len(raw)) + raw
+    return data + b'\x00'
+
+
+def word_length(first: bytes, read) -> int:
+    """طول الكلمة من بايتها الأول وبقية بايتات الطول (read(n) يعيد n بايت)"""
+    extra = _codec.determineLength(first)
+    return _codec.decodeLength(first + (read(extra) if extra else b''))
+
+
+class FakeRouter:
+    """جداول الجهاز ومعالجة الأوامر (مشتركة بين الخادمين المتزامن وغير المتزامن)"""
+
+    def __init__(self, ppp_users: int = 0, hotspot_users: int = 0):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.commands: List[str] = []
+        # أوامر لا يُرد عليها (لاختبار المهلة) وتأخير رد أوامر بعينها بالثواني
+        self.silent = set()
+        self.delays: Dict[str, float] = {}
+        # حمل المعالج في رد /system/resource/print (نص كما يرسله الجهاز)
+        self.cpu_load = '5'
+        self.tables: Dict[str, List[Dict[str, str]]] = {
+            '/ppp/secret': [], '/ip/hotspot/user': [], '/ppp/active': [], '/ip/hotspot/active': [],
+            '/ppp/profile': [], '/ip/hotspot/user/profile': [], '/interface': [], '/ip/address': []
+        }
+        for i in range(ppp_users):
+            self.add('/ppp/secret', name=f'u{i:03d}', password='p', profile='default',
+                     service='any', disabled='false')
+        for i in range(hotspot_users):
+            self.add('/ip/hotspot/user', name=f'h{i:03d}', password='p', profile='default',
+                     server='all', disabled='false')
+        self.add('/ppp/profile', name='default')
+        self.add('/ip/hotspot/user/profile', name='default')
+
+    def add(self, path: str, **attributes: str) -> Dict[str, str]:
+        """إضافة صف إلى جدول (القيم نصوص كما يخزنها الجهاز)"""
+        row = {'.id': '*%X' % next(self.ids)}
+        row.update(attributes)
+        self.tables[path].append(row)
+        return row
+
+    def names(self, path: str) -> List[str]:
+        """أسماء صفوف الجدول"""
+        return [row.get('name', '') for row in self.tables[path]]
+
+    def handle(self, words: List[str]) -> Replies:
+        """جمل الرد على جملة أمر واحدة (مع الوسم إن وُجد)"""
+        command = words[0]
+        attributes, queries, tag = {}, [], None
+        for word in words[1:]:
+            if word.startswith('.tag='):
+                tag = word[5:]
+            elif word.startswith('='):
+                key, _, value = word[1:].partition('=')
+                attributes[key] = value
+            elif word.startswith('?'):
+                queries.append(word[1:])
+        suffix = [f'.tag={tag}'] if tag is not None else []
+        with self.lock:
+            self.commands.append(command)
+            replies = self._handle(command, attributes, queries)
+        return [sentence + suffix for sentence in replies]
+
+    @staticmethod
+    def _trap(message: str) -> Replies:
+        return [['!trap', f'=message={message}'], ['!done']]
+
+    def _handle(self, command: str, attributes: Dict[str, str], queries: List[str]) -> Replies:
+        if command == '/login':
+            if attributes.get('password') == 'bad':
+                return self._trap('invalid user name or password (6)')
+            return [['!done']]
+        if command == '/system/identity/print':
+            return [['!re', '=name=fake'], ['!done']]
+        if command == '/system/resource/print':
+            return [['!re', f'=cpu-load={self.cpu_load}', '=version=7.1', '=uptime=1d'], ['!done']]
+
+        path, _, verb = command.rpartition('/')
+        table = self.tables.get(path)
+        if table is None:
+            return self._trap('no such command prefix')
+
+        if verb == 'print':
+            rows = table
+            for query in queries:
+                key, _, value = query.partition('=')
+                rows = [row for row in rows if row.get(key, '') == value]
+            proplist = attributes.get('.proplist')
+            replies = []
+            for row in rows:
+                if proplist:
+                    row = {key: row[key] for key in proplist.split(',') if key in row}
+                replies.append(['!re'] + [f'={key}={value}' for key, value in row.items()])
+            return replies + [['!done']]
+
+        if verb == 'add':
+            if any(row.get('name') == attributes.get('name') for row in table):
+                return self._trap('failure: item with such name already exists')
+            row = self.add(path, **attributes)
+            return [['!done', f"=ret={row['.id']}"]]
+
+        if verb in ('set', 'remove', 'enable', 'disable'):
+            ids = attributes.pop('.id', '').split(',')
+            rows = [next((row for row in table if row['.id'] == item_id), None) for item_id in ids]
+            if None in rows:
+                return self._trap('no such item')
+            for row in rows:
+                if verb == 'remove':
+                    table.remove(row)
+                elif verb == 'set':
+                    row.update(attributes)
+                else:
+                    row['disabled'] = 'true' if verb == 'disable' else 'false'
+            return [['!done']]
+
+        return self._trap('unknown command')
+
+
+class FakeRouterServer:
+    """خادم API متزامن: خيط لكل اتصال يقرأ الجمل ويرد عليها بالترتيب"""
+
+    def __init__(self, router: Optional[FakeRouter] = None):
+        self.router = router or FakeRouter()
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(64)
+        self.host, self.port = self._sock.getsockname()
+        self._connections: List[socket.socket] = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self._connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _read(conn: socket.socket, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('closed')
+            data += chunk
+        return data
+
+    def _serve(self, conn: socket.socket):
+        try:
+            while True:
+                words = []
+                while True:
+                    length = word_length(self._read(conn, 1), lambda size: self._read(conn, size))
+                    if length == 0:
+                        break
+                    words.append(self._read(conn, length).decode('utf-8'))
+                if not words or words[0] in self.router.silent:
+                    continue
+                for sentence in self.router.handle(words):
+                    conn.sendall(encode_sentence(sentence))
+        except (ConnectionError, OSError):
+            pass
+
+    def kill_connections(self):
+        """قطع كل الاتصالات المفتوحة (محاكاة انقطاع الجهاز)"""
+        for conn in self._connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+                conn.close()
+            except OSError:
+                pass
+        self._connections = []
+
+    def close(self):
+        """إيقاف الخادم (shutdown يوقظ accept المنتظر، فإغلاق المقبس وحده لا يكفي)"""
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self.kill_connections()
+
+
+class AsyncFakeRouterServer:
+    """
+    خادم API بـ asyncio: كل جملة تُعالج في مهمة مستقلة مع تأخير router.delays،
+    فتصل ردود الأوامر الموسومة بترتيب مختلف عن ترتيب إرسالها
+    """
+
+    def __init__(self, router: Optional[FakeRouter] = None):
+        self.router = router or FakeRouter()
+        self.host = '127.0.0.1'
+        self.port = 0
+        # وسوم الأوامر بترتيب إرسال ردودها
+        self.replied: List[Optional[str]] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: List[asyncio.StreamWriter] = []
+
+    async def __aenter__(self) -> 'AsyncFakeRouterServer':
+        self._server = await asyncio.start_server(self._serve, self.host, 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.kill_connections()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.append(writer)
+        tasks = set()
+        try:
+            while True:
+                words = []
+                while True:
+                    first = await reader.readexactly(1)
+                    extra = _codec.determineLength(first)
+                    if extra:
+                        first += await reader.readexactly(extra)
+                    length = _codec.decodeLength(first)
+                    if length == 0:
+                        break
+                    words.append((await reader.readexactly(length)).decode('utf-8'))
+                if words and words[0] not in self.router.silent:
+                    task = asyncio.ensure_future(self._reply(writer, words))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _reply(self, writer: asyncio.StreamWriter, words: List[str]):
+        delay = self.router.delays.get(words[0], 0)
+        if delay:
+            await asyncio.sleep(delay)
+        tag = next((word[5:] for word in words if word.startswith('.tag=')), None)
+        self.replied.append(tag)
+        for sentence in self.router.handle(words):
+            writer.write(encode_sentence(sentence))
+        await writer.drain()
+
+    def kill_connections(self):
+        """قطع كل الاتصالات المفتوحة"""
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات الإجراءات والسياسات بالجملة عبر المحدد"""
+
+import pytest
+
+from app import parse_flag, selector_from
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, True), (False, False), ('true', True), ('false', False), ('0', False), ('YES', True), (1, True)
+])
+def test_parse_flag(value, expected):
+    assert parse_flag(value, 'x') is expected
+
+
+@pytest.mark.parametrize('value', ['maybe', 'flase', 2, [], {}])
+def test_parse_flag_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        parse_flag(value, 'x')
+
+
+def test_selector_from():
+    assert selector_from({}) is None
+    assert selector_from({'selector': {'disabled': 'false'}}) == {'profile': None, 'comment': None, 'disabled': False}
+    assert selector_from({'selector': {'profile': 'p', 'disabled': ''}})['disabled'] is None
+    with pytest.raises(ValueError):
+        selector_from({'selector': 'profile=p'})
+
+
+def test_string_false_selects_enabled_users(router, client):
+    router.tables['/ppp/secret'][0]['disabled'] = 'true'
+    response = client.post('/api/bulk-user-action', json={
+        'action': 'disable', 'user_type': 'ppp', 'selector': {'disabled': 'false'}
+    })
+    data = response.get_json()
+    assert data['success'] and data['summary']['total'] == 2
+    assert [row['disabled'] for row in router.tables['/ppp/secret']] == ['true'] * 3
+
+
+@pytest.mark.parametrize('endpoint', ['/api/bulk-user-action', '/api/bulk-user-policy'])
+def test_invalid_selector_flag_is_400(router, client, endpoint):
+    response = client.post(endpoint, json={
+        'action': 'enable', 'user_type': 'ppp', 'selector': {'disabled': 'nope'}, 'data_limit_gb': 1
+    })
+    assert response.status_code == 400
+    assert router.commands.count('/ppp/secret/print') == 0
+
+
+def test_disable_digit_only_username(router, client):
+    router.add('/ppp/secret', name='007', password='x', disabled='false')
+    response = client.post('/api/bulk-user-action', json={
+        'action': 'disable', 'user_type': 'ppp', 'usernames': ['007']
+    })
+    assert response.get_json()['summary']['success'] == 1
+    assert router.tables['/ppp/secret'][-1]['disabled'] == 'true'
+
+
+def test_policy_applies_only_to_selected_users(router, client):
+    router.add('/ip/hotspot/user', name='h-fast', password='p', profile='10M', server='all', disabled='false')
+    router.tables['/ppp/secret'][1]['profile'] = '10M'
+    response = client.post('/api/bulk-user-policy', json={
+        'user_type': 'both', 'selector': {'profile': '10M'},
+        'upload_speed': '2M', 'download_speed': '10M', 'data_limit_gb': 1
+    })
+    data = response.get_json()
+    assert data['success'] and data['summary'] == {'total': 2, 'success': 2, 'failed': 0}
+    ppp = router.tables['/ppp/secret']
+    assert ppp[1]['rate-limit'] == '2M/10M' and ppp[1]['comment'] == 'data-limit: 1.0GB'
+    assert 'rate-limit' not in ppp[0] and 'rate-limit' not in ppp[2]
+    hotspot = router.tables['/ip/hotspot/user'][-1]
+    assert hotspot['rate-limit'] == '2M/10M' and hotspot['limit-bytes-total'] == str(1024 ** 3)
+
+
+@pytest.mark.parametrize('payload', [
+    {'user_type': 'both', 'upload_speed': '1M'},
+    {'user_type': 'ppp', 'selector': {'profile': 'default'}},
+    {'user_type': 'pppoe', 'selector': {'profile': 'default'}, 'upload_speed': '1M'}
+])
+def test_policy_rejects_unsafe_or_empty_requests(router, client, payload):
+    response = client.post('/api/bulk-user-policy', json=payload)
+    assert response.status_code == 400 and not response.get_json()['success']
+    assert router.commands.count('/ppp/secret/print') == 0
+
+
+def test_policy_resolves_users_replaced_after_selection(router, client, monkeypatch):
+    from mikrotik_manager import MikroTikManager
+    select_users = MikroTikManager.select_users
+
+    def replaced_after_select(self, *args, **kwargs):
+        users = select_users(self, *args, **kwargs)
+        # u000 حُذف وأُعيد إنشاؤه بمعرف جديد، و u001 حُذف نهائياً
+        secrets = router.tables['/ppp/secret']
+        del secrets[:2]
+        router.add('/ppp/secret', name='u000', password='p', profile='default', disabled='false')
+        return users
+
+    monkeypatch.setattr(MikroTikManager, 'select_users', replaced_after_select)
+    data = client.post('/api/bulk-user-policy', json={
+        'user_type': 'ppp', 'selector': {'profile': 'default'}, 'download_speed': '5M'
+    }).get_json()
+    outcomes = {row['username']: row for row in data['data']}
+    assert outcomes['u000']['status'] == 'تم' and outcomes['u002']['status'] == 'تم'
+    assert outcomes['u001']['status'] == 'فشل' and outcomes['u001']['error'] == 'المستخدم غير موجود'
+    assert router.tables['/ppp/secret'][-1]['rate-limit'] == '0/5M'
+
+
+def test_single_user_ppp_data_limit_is_written(router, client):
+    row = router.tables['/ppp/secret'][0]
+    response = client.post('/api/set-user-data-limit', json={
+        'user_id': row['.id'], 'user_type': 'ppp', 'data_limit_gb': 2
+    })
+    assert response.status_code == 200 and row['comment'] == 'data-limit: 2.0GB'
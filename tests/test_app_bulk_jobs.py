@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات مهام الإنشاء بالجملة عبر الواجهة: التقدم والبث والإلغاء"""
+
+import threading
+import time
+
+import pytest
+
+from bulk_jobs import BulkJobManager, CANCELLED, CANCELLED_STATUS, COMPLETED
+
+SECRETS = '/ppp/secret'
+
+
+@pytest.fixture
+def jobs(client, monkeypatch):
+    """مدير مهام بدفعات صغيرة وعامل واحد حتى يبقى التقدم مرئياً بين الدفعات"""
+    import app
+    manager = BulkJobManager(app.bulk_writer, max_workers=1, chunk_size=2)
+    monkeypatch.setattr(app, 'bulk_jobs', manager)
+    return manager
+
+
+def create(client, **data):
+    data.setdefault('name_type', 'custom')
+    return client.post('/api/create-bulk-users', json=data)
+
+
+def wait_for(client, job_id: str, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        progress = client.get(f'/api/bulk-jobs/{job_id}').get_json()['data']
+        if progress['status'] in (COMPLETED, CANCELLED, 'failed'):
+            return progress
+        time.sleep(0.02)
+    raise AssertionError('المهمة لم تنته')
+
+
+def test_job_runs_in_background_and_skips_existing_names(client, router, jobs):
+    response = create(client, custom_names=['j1', 'u000', 'j2', 'j3'])
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['skipped'] == ['u000'] and body['progress_url'].endswith(body['job_id'])
+    progress = wait_for(client, body['job_id'])
+    assert progress['status'] == COMPLETED and progress['total'] == 3 and progress['success'] == 3
+    assert {'j1', 'j2', 'j3'} <= set(router.names(SECRETS))
+    # القائمة دون نتائج المستخدمين
+    listed = client.get('/api/bulk-jobs').get_json()['data']
+    assert [job['id'] for job in listed] == [body['job_id']] and 'results' not in listed[0]
+
+
+def test_wait_returns_the_created_users(client, jobs):
+    body = create(client, custom_names=['w1', 'u001'], wait=True).get_json()
+    assert body['success'] and [user['username'] for user in body['data']] == ['w1']
+    assert body['summary'] == {'total': 1, 'success': 1, 'failed': 0, 'skipped': 1,
+                               'type': 'ppp', 'name_type': 'custom'}
+
+
+def test_invalid_requests_are_rejected(client, jobs):
+    assert create(client, custom_names=['a'], password_alphabet='nope').status_code == 400
+    too_many = create(client, name_type='random', count=1001)
+    assert too_many.status_code == 400 and not jobs.jobs()
+
+
+@pytest.mark.parametrize('method, url', [
+    ('get', '/api/bulk-jobs/missing'),
+    ('get', '/api/bulk-jobs/missing/stream'),
+    ('post', '/api/bulk-jobs/missing/cancel')
+])
+def test_unknown_job_is_404(client, jobs, method, url):
+    response = getattr(client, method)(url)
+    assert response.status_code == 404 and not response.get_json()['success']
+
+
+def test_cancel_stops_remaining_chunks_and_finished_job_is_409(client, router, jobs, monkeypatch):
+    import app
+    release = threading.Event()
+    apply_results = app.bulk_writer.apply_results
+
+    def blocking(users, results):
+        release.wait(5)
+        apply_results(users, results)
+
+    monkeypatch.setattr(app.bulk_writer, 'apply_results', blocking)
+    job_id = create(client, custom_names=[f'c{i}' for i in range(8)]).get_json()['job_id']
+    while client.get(f'/api/bulk-jobs/{job_id}').get_json()['data']['status'] != 'running':
+        time.sleep(0.01)
+    cancelled = client.post(f'/api/bulk-jobs/{job_id}/cancel')
+    assert cancelled.status_code == 200 and cancelled.get_json()['success']
+    release.set()
+
+    progress = wait_for(client, job_id)
+    assert progress['status'] == CANCELLED and progress['done'] == 8
+    statuses = [user['status'] for user in progress['results']]
+    # الدفعة الجارية اكتملت والباقي لم يُرسل
+    assert statuses[:2] == ['تم الإنشاء'] * 2 and statuses[2:] == [CANCELLED_STATUS] * 6
+    assert set(router.names(SECRETS)) & {f'c{i}' for i in range(8)} == {'c0', 'c1'}
+
+    again = client.post(f'/api/bulk-jobs/{job_id}/cancel')
+    assert again.status_code == 409 and not again.get_json()['success']
+
+
+def test_stream_resumes_from_last_event_id(client, jobs):
+    job_id = create(client, custom_names=['s1', 's2', 's3']).get_json()['job_id']
+    wait_for(client, job_id)
+    with client.get(f'/api/bulk-jobs/{job_id}/stream') as response:
+        assert next(response.response) == b'retry: 3000\n\n'
+        event = next(response.response).decode('utf-8')
+    assert event.startswith('id: 3\nevent: done\n') and '"s3"' in event
+    # إعادة الاتصال من آخر موضع: done دون إعادة النتائج
+    with client.get(f'/api/bulk-jobs/{job_id}/stream', headers={'Last-Event-ID': '3'}) as response:
+        next(response.response)
+        event = next(response.response).decode('utf-8')
+    assert event.startswith('id: 3\nevent: done\n') and '"results": []' in event
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات /api/dashboard: كل بيانات الصفحة الرئيسية في طلب واحد"""
+
+import pytest
+
+from app import connection_pool
+
+BATCH = ('/ppp/active/print', '/ip/hotspot/active/print', '/interface/print', '/ip/address/print')
+
+
+@pytest.fixture
+def dashboard_router(router):
+    router.add('/ppp/active', name='u000', address='10.0.0.2', uptime='5m', service='pppoe')
+    router.add('/ip/hotspot/active', user='h000', address='10.5.0.9', uptime='1m')
+    router.add('/interface', name='ether1', type='ether', running='true', disabled='false')
+    router.add('/ip/address', address='10.0.0.1/24', interface='ether1', network='10.0.0.0', disabled='false')
+    return router
+
+
+def without_snapshot(monkeypatch):
+    """اللقطة غير متوفرة (أول طلب بعد فشل القراءة في الخلفية)"""
+    import app
+    monkeypatch.setattr(app.dashboard_refresher, 'get', lambda key: (None, None, 'خطأ'))
+
+
+def test_dashboard_returns_every_section(client, dashboard_router):
+    data = client.get('/api/dashboard').get_json()
+    assert data['success'] and data['age'] is not None
+    dashboard = data['data']
+    assert [(user['type'], user['name']) for user in dashboard['active_users']] == [('PPP', 'u000'), ('Hotspot', 'h000')]
+    assert dashboard['active_count'] == 2
+    assert dashboard['interfaces'] == [{'name': 'ether1', 'type': 'ether', 'running': True, 'disabled': False}]
+    assert dashboard['ip_addresses'][0]['network'] == '10.0.0.0'
+    # موارد النظام من لقطة الخلفية
+    assert dashboard['system_info']['version'] == '7.1' and dashboard['system_resources']
+    assert all(dashboard_router.commands.count(command) == 1 for command in BATCH)
+    assert connection_pool.stats()['in_use'] == 0
+
+
+def test_resources_are_read_in_the_same_batch_without_a_snapshot(client, dashboard_router, monkeypatch):
+    without_snapshot(monkeypatch)
+    data = client.get('/api/dashboard').get_json()
+    assert data['success'] and data['age'] is None
+    assert data['data']['system_info']['version'] == '7.1'
+    assert dashboard_router.commands.count('/system/resource/print') == 1
+
+
+def test_missing_hotspot_package_keeps_ppp_sessions(client, dashboard_router):
+    del dashboard_router.tables['/ip/hotspot/active']
+    data = client.get('/api/dashboard').get_json()
+    assert data['success'] and [user['name'] for user in data['data']['active_users']] == ['u000']
+
+
+def test_failed_section_fails_the_request_and_releases_the_session(client, dashboard_router):
+    del dashboard_router.tables['/interface']
+    response = client.get('/api/dashboard')
+    assert response.status_code == 500
+    assert 'no such command prefix' in response.get_json()['error']
+    assert connection_pool.stats()['in_use'] == 0
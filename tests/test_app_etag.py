@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات ETag و If-None-Match على نقاط القوائم"""
+
+import time
+
+import pytest
+
+import user_mirror
+from user_mirror import UserMirror
+
+SECRETS = '/ppp/secret'
+
+
+def etag_of(response) -> str:
+    return response.headers['ETag']
+
+
+@pytest.fixture
+def mirror(server, router, monkeypatch):
+    """نسخة محلية محملة من جداول الجهاز الوهمي دون جلسة listen"""
+    mirror = UserMirror(server.host, 'admin', 'secret', server.port)
+    for path in mirror.paths:
+        mirror._finish_load(path, {row['.id']: dict(row) for row in router.tables[path]}, [])
+    mirror._mark_synced()
+    monkeypatch.setitem(user_mirror._mirrors, (server.host, server.port), mirror)
+    return mirror
+
+
+def test_unchanged_list_is_304_without_a_body(client, router):
+    router.add('/ppp/active', name='u000', address='10.0.0.2', uptime='1m', service='pppoe')
+    first = client.get('/api/active-users')
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+    assert etag_of(first).startswith('W/')
+    again = client.get('/api/active-users', headers={'If-None-Match': etag_of(first)})
+    assert again.status_code == 304 and again.data == b'' and etag_of(again) == etag_of(first)
+    # تغير المحتوى يعني ETag جديداً وجسماً كاملاً للنسخة القديمة
+    router.add('/ppp/active', name='u001', address='10.0.0.3', uptime='1m', service='pppoe')
+    changed = client.get('/api/active-users', headers={'If-None-Match': etag_of(first)})
+    assert changed.status_code == 200 and etag_of(changed) != etag_of(first)
+    assert changed.get_json()['count'] == 2
+
+
+def test_mirror_version_answers_304_without_router_commands(client, router, mirror):
+    with client.get('/api/ppp-secrets') as first:
+        assert first.status_code == 200 and len(first.get_json()['data']) == 3
+        etag = etag_of(first)
+    assert mirror.epoch in etag
+    commands = len(router.commands)
+    with client.get('/api/ppp-secrets', headers={'If-None-Match': etag}) as cached:
+        assert cached.status_code == 304
+    assert len(router.commands) == commands
+
+    # الحقول المطلوبة جزء من الإصدار
+    with client.get('/api/ppp-secrets?fields=comment', headers={'If-None-Match': etag}) as other:
+        assert other.status_code == 200 and etag_of(other) != etag
+
+    mirror._apply(SECRETS, {'.id': '*99', 'name': 'new', 'profile': 'default', 'disabled': 'false'})
+    with client.get('/api/ppp-secrets', headers={'If-None-Match': etag}) as changed:
+        assert changed.status_code == 200 and etag_of(changed) != etag
+        assert 'new' in [user['name'] for user in changed.get_json()['data']]
+
+
+def test_stale_mirror_streams_from_the_router_without_a_validator(client, router, mirror, monkeypatch):
+    with client.get('/api/ppp-secrets') as first:
+        etag = etag_of(first)
+    # انقطاع أطول من max_staleness: لا يُقرأ من النسخة ولا يُرسل ETag
+    monkeypatch.setattr(mirror, '_synced', False)
+    monkeypatch.setattr(mirror, '_disconnected_at', time.monotonic() - mirror.max_staleness - 1)
+    router.add(SECRETS, name='fresh', password='p', profile='default', disabled='false')
+    with client.get('/api/ppp-secrets', headers={'If-None-Match': etag}) as response:
+        assert response.status_code == 200 and 'ETag' not in response.headers
+        assert 'fresh' in [user['name'] for user in response.get_json()['data']]
+    assert '/ppp/secret/print' in router.commands
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات الردود المبثوثة: الجسم كاملاً وإرجاع الجلسة حتى دون قراءة الجسم"""
+
+from app import connection_pool
+
+
+def in_use():
+    return connection_pool.stats()['in_use']
+
+
+def test_stream_json_rows_returns_all_rows(client):
+    with client.get('/api/ppp-secrets') as response:
+        data = response.get_json()
+    assert data['success'] and [user['name'] for user in data['data']] == ['u000', 'u001', 'u002']
+    assert in_use() == 0
+
+
+def test_head_requests_release_the_session(client):
+    # كل رد HEAD كان يحجز جلسة حتى يمتلئ المجمع
+    for _ in range(connection_pool.max_size + 2):
+        with client.head('/api/ppp-secrets') as response:
+            assert response.status_code == 200
+    assert in_use() == 0
+    with client.get('/api/hotspot-users') as response:
+        assert response.status_code == 200
+
+
+def test_unread_response_is_released_on_close(client):
+    response = client.get('/api/ppp-secrets')
+    assert in_use() == 1
+    response.close()
+    assert in_use() == 0
+    # الجلسة التي أُغلق مولدها قبل !done لا تُعاد إلى المجمع بحالة غير متزامنة
+    with client.get('/api/ppp-secrets') as response:
+        assert len(response.get_json()['data']) == 3
+
+
+def test_export_streams_csv_and_gzip(client):
+    import gzip
+    with client.get('/api/export-users?format=csv&user_type=ppp') as response:
+        lines = response.get_data(as_text=True).lstrip('﻿').splitlines()
+    assert lines[0].startswith('type,id,name,password') and len(lines) == 4
+    with client.get('/api/export-users?format=ndjson&user_type=hotspot&gzip=1') as response:
+        assert len(gzip.decompress(response.get_data()).splitlines()) == 2
+    assert in_use() == 0
+
+
+def test_export_head_and_unread_responses_release_the_session(client):
+    for _ in range(connection_pool.max_size + 2):
+        with client.head('/api/export-users?user_type=both') as response:
+            assert response.status_code == 200
+    response = client.get('/api/export-users?user_type=both')
+    response.close()
+    assert in_use() == 0
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات العميل غير المتزامن على خادم asyncio وهمي"""
+
+import asyncio
+
+import pytest
+from librouteros.exceptions import ConnectionClosed, TrapError
+
+from async_mikrotik_manager import AsyncMikroTikManager
+from fake_routeros import AsyncFakeRouterServer, FakeRouter
+
+
+def run(scenario, router=None, **options):
+    """تشغيل سيناريو (manager, server) على خادم وهمي جديد"""
+    async def main():
+        async with AsyncFakeRouterServer(router or FakeRouter(ppp_users=2, hotspot_users=1)) as server:
+            manager = AsyncMikroTikManager(server.host, 'admin', 'secret', server.port, **options)
+            try:
+                return await scenario(manager, server)
+            finally:
+                await manager.disconnect()
+    return asyncio.run(main())
+
+
+def test_replies_are_demultiplexed_by_tag():
+    router = FakeRouter(ppp_users=2, hotspot_users=1)
+    router.delays['/ppp/secret/print'] = 0.2
+
+    async def scenario(manager, server):
+        results = await manager.execute_batch([
+            ('/ppp/secret/print', {'.proplist': 'name'}),
+            ('/ip/hotspot/user/print', {'.proplist': 'name'}),
+            ('/system/identity/print', None)
+        ])
+        return results, server.replied
+
+    results, replied = run(scenario, router)
+    # الرد الأول وصل أخيراً ومع ذلك كل نتيجة لأمرها
+    assert replied[-1] == '1'
+    assert [row['name'] for row in results[0].rows] == ['u000', 'u001']
+    assert [row['name'] for row in results[1].rows] == ['h000']
+    assert results[2].rows == [{'name': 'fake'}]
+
+
+def test_trap_is_reported_per_command():
+    async def scenario(manager, server):
+        results = await manager.execute_batch([
+            ('/ppp/secret/remove', {'.id': '*FF'}),
+            ('/ppp/secret/print', {'.proplist': 'name'})
+        ])
+        with pytest.raises(TrapError):
+            await manager.execute_command('/no/such/print')
+        # الجلسة ما زالت صالحة بعد !trap
+        names = await manager.user_names('/ppp/secret')
+        return results, names
+
+    results, names = run(scenario)
+    assert not results[0].ok and 'no such item' in str(results[0].error)
+    assert results[1].ok and len(results[1].rows) == 2
+    assert names == {'u000', 'u001'}
+
+
+def test_unanswered_command_times_out_without_blocking_others():
+    router = FakeRouter(ppp_users=1)
+    router.silent.add('/system/script/run')
+
+    async def scenario(manager, server):
+        with pytest.raises(asyncio.TimeoutError):
+            await manager.execute_command('/system/script/run')
+        pending = len(manager._pending)
+        rows = await manager.execute_command('/ppp/secret/print')
+        return pending, rows
+
+    pending, rows = run(scenario, router, timeout=0.3)
+    assert pending == 0 and len(rows) == 1
+
+
+def test_dropped_connection_fails_pending_commands():
+    router = FakeRouter()
+    router.silent.add('/system/script/run')
+
+    async def scenario(manager, server):
+        await manager.connect()
+        waiting = asyncio.ensure_future(manager.execute_command('/system/script/run'))
+        await asyncio.sleep(0.1)
+        server.kill_connections()
+        with pytest.raises(ConnectionClosed):
+            await waiting
+        return manager.is_connected()
+
+    assert run(scenario, router) is False
+
+
+def test_login_failure_returns_false():
+    async def main():
+        async with AsyncFakeRouterServer() as server:
+            return await AsyncMikroTikManager(server.host, 'admin', 'bad', server.port, timeout=1).connect()
+    assert asyncio.run(main()) is False
+
+
+def test_digit_only_names_by_name():
+    router = FakeRouter()
+    router.add('/ppp/secret', name='007', password='01234', disabled='false')
+
+    async def scenario(manager, server):
+        toggled = await manager.toggle_ppp_user('007', True)
+        names = await manager.user_names('/ppp/secret')
+        return toggled, names
+
+    toggled, names = run(scenario, router)
+    assert toggled and names == {'007'}
+    assert router.tables['/ppp/secret'][0]['disabled'] in ('yes', 'true')
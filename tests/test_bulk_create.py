@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات الإنشاء بالجملة بأوامر add متتابعة دون انتظار رد كل أمر"""
+
+import asyncio
+
+from async_mikrotik_manager import AsyncMikroTikManager
+from fake_routeros import AsyncFakeRouterServer, FakeRouter
+from mikrotik_manager import MikroTikManager
+
+SECRETS = '/ppp/secret'
+NAMES = ['n1', 'u000', 'n1', 'n2']
+
+
+def statuses(users):
+    return [(user['username'], user['status'] == 'تم الإنشاء') for user in users]
+
+
+def test_each_user_keeps_its_own_status_and_reason(server, router):
+    manager = MikroTikManager(server.host, 'admin', 'secret', port=server.port, timeout=2)
+    users = manager.create_bulk_users(name_type='custom', custom_names=NAMES, window=2)
+    assert statuses(users) == [('n1', True), ('u000', False), ('n1', False), ('n2', True)]
+    # الاسم الموجود يُرفض محلياً، والمكرر في الدفعة يرفضه الجهاز
+    assert users[1]['error'] == 'اسم المستخدم موجود مسبقاً'
+    assert 'already exists' in users[2]['error']
+    assert all('error' not in users[i] for i in (0, 3))
+    assert router.commands.count(f'{SECRETS}/add') == 3 and router.commands.count('/login') == 1
+    manager.disconnect()
+
+
+def test_unanswered_adds_are_reported_as_failed(server, router):
+    manager = MikroTikManager(server.host, 'admin', 'secret', port=server.port, timeout=0.5)
+    router.silent.add(f'{SECRETS}/add')
+    users = manager.create_bulk_users(prefix='x', count=5, window=2)
+    assert len(users) == 5 and all(user['status'] == 'فشل' and user['error'] for user in users)
+    # الجلسة فيها ردود معلقة فلا يُعاد استخدامها
+    assert not manager.is_connected()
+    router.silent.clear()
+    assert manager.create_bulk_users(name_type='custom', custom_names=['y1'])[0]['status'] == 'تم الإنشاء'
+    manager.disconnect()
+
+
+def run(scenario, router):
+    async def main():
+        async with AsyncFakeRouterServer(router) as server:
+            manager = AsyncMikroTikManager(server.host, 'admin', 'secret', server.port, timeout=2)
+            try:
+                return await scenario(manager, server)
+            finally:
+                await manager.disconnect()
+    return asyncio.run(main())
+
+
+def test_async_bulk_reports_traps_per_user():
+    router = FakeRouter(ppp_users=1)
+
+    async def scenario(manager, server):
+        return await manager.create_bulk_users(name_type='custom', custom_names=NAMES)
+
+    users = run(scenario, router)
+    assert [user['username'] for user in users] == NAMES
+    assert sum(user['status'] == 'تم الإنشاء' for user in users) == 2
+    assert users[1]['error'] == 'اسم المستخدم موجود مسبقاً'
+    assert sum('already exists' in user.get('error', '') for user in users) == 1
+
+
+def test_async_dropped_connection_fails_pending_users():
+    router = FakeRouter()
+    router.delays[f'{SECRETS}/add'] = 0.3
+
+    async def scenario(manager, server):
+        task = asyncio.ensure_future(manager.create_bulk_users(prefix='z', count=4))
+        while router.commands.count('/ppp/secret/print') < 1:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        server.kill_connections()
+        return await task
+
+    users = run(scenario, router)
+    assert len(users) == 4
+    assert all(user['status'] == 'فشل' and user['error'] for user in users)
+    assert router.names(SECRETS) == []
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات مدير المهام بالجملة: التناوب والإلغاء وإعادة الدفعات الفاشلة"""
+
+import os
+import time
+
+from bulk_jobs import BulkJobManager, COMPLETED, CANCELLED, FAILED, FAILED_STATUS, CANCELLED_STATUS
+from resumable_jobs import CheckpointedBulkJob, resume_jobs
+
+SECRETS = '/ppp/secret'
+
+
+def add_job(manager: BulkJobManager, names, on_results=None):
+    users = [{'username': name} for name in names]
+    commands = [(f'{SECRETS}/add', {'name': name, 'password': 'p'}) for name in names]
+    return manager.submit('ppp', users, commands, on_results)
+
+
+def mark(users, results):
+    for user, result in zip(users, results):
+        user['status'] = 'تم' if result.ok else FAILED_STATUS
+
+
+def finish(job, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        job.wait(job.total, 0.1)
+    return job.progress(0)
+
+
+def test_job_runs_all_chunks_and_reports_traps(router, writer):
+    manager = BulkJobManager(writer, chunk_size=2)
+    job = add_job(manager, ['a1', 'a2', 'u000', 'a3', 'a4'], mark)
+    progress = finish(job)
+    assert progress['status'] == COMPLETED
+    assert progress['done'] == 5 and progress['success'] == 4 and progress['failed'] == 1
+    # النتائج بترتيب وصولها من العمال
+    assert sorted(user['username'] for user in progress['results']) == ['a1', 'a2', 'a3', 'a4', 'u000']
+    assert {'a1', 'a2', 'a3', 'a4'} <= set(router.names(SECRETS))
+
+
+def test_cancel_stops_unsent_chunks(writer):
+    manager = BulkJobManager(writer, max_workers=1, chunk_size=1)
+    started = []
+
+    def slow(users, results):
+        started.append(users[0]['username'])
+        time.sleep(0.05)
+        mark(users, results)
+
+    job = add_job(manager, [f'c{i}' for i in range(20)], slow)
+    while not started:
+        time.sleep(0.01)
+    assert manager.cancel(job.id)
+    progress = finish(job)
+    assert progress['status'] == CANCELLED and progress['done'] == 20
+    cancelled = [user for user in progress['results'] if user['status'] == CANCELLED_STATUS]
+    assert cancelled and len(cancelled) + len(started) == 20
+    assert not manager.cancel(job.id)
+
+
+def test_chunk_retried_after_unexpected_error(writer):
+    manager = BulkJobManager(writer, chunk_size=2, retry_delay=0.01)
+    calls = []
+
+    def flaky(users, results):
+        calls.append(users[0]['username'])
+        if len(calls) == 1:
+            raise RuntimeError('خطأ عابر')
+        mark(users, results)
+
+    job = add_job(manager, ['r1', 'r2'], flaky)
+    progress = finish(job)
+    assert progress['status'] == COMPLETED and progress['done'] == 2
+    assert calls == ['r1', 'r1'] and manager.stats()['retries'] == 1
+
+
+def test_failing_last_chunk_of_parallel_job_fails_the_job(writer):
+    manager = BulkJobManager(writer, chunk_size=2, max_attempts=3, retry_delay=0.02)
+    attempts = []
+
+    def broken(users, results):
+        if users[0]['username'] == 'f3':
+            attempts.append(time.monotonic())
+            raise RuntimeError('on_results معطل')
+        mark(users, results)
+
+    job = add_job(manager, ['f1', 'f2', 'f3'], broken)
+    progress = finish(job)
+    assert progress['status'] == FAILED and 'معطل' in progress['error']
+    assert progress['done'] == 3 and progress['success'] == 2
+    assert progress['results'][-1]['status'] == FAILED_STATUS
+    # ثلاث محاولات مع تأخير يتضاعف بينها (0.02 ثم 0.04)
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.02 and attempts[2] - attempts[1] >= 0.04
+    stats = manager.stats()
+    assert stats['failed_jobs'] == 1 and stats['jobs'][FAILED] == 1 and stats['delayed'] == 0
+
+
+def test_sequential_job_with_persistent_error_backs_off_and_fails(pool, writer, tmp_path, monkeypatch):
+    params = {'user_type': 'ppp', 'prefix': 'd', 'count': 4, 'password_length': 5,
+              'profile': 'default', 'server': 'all'}
+    job = CheckpointedBulkJob('disk', str(tmp_path), pool, params, chunk_size=2)
+    attempts = []
+
+    def disk_full(users):
+        attempts.append(time.monotonic())
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(job, '_store_results', disk_full)
+    manager = BulkJobManager(writer, max_attempts=3, retry_delay=0.05)
+    manager.submit_job(job)
+    progress = finish(job)
+    assert progress['status'] == FAILED and 'No space' in progress['error']
+    assert len(attempts) == 3 and attempts[-1] - attempts[0] >= 0.15
+    # الدفعة المعلقة تبقى للتحقق منها عند الاستئناف، والقفل محرر
+    assert os.path.exists(job._pending_path(0)) and not os.path.exists(job.lock_path)
+
+    monkeypatch.undo()
+    resumed = resume_jobs(BulkJobManager(writer), str(tmp_path), pool)
+    assert [job.id for job in resumed] == ['disk']
+    progress = finish(resumed[0])
+    assert progress['status'] == COMPLETED and progress['success'] == 4 and progress['error'] is None
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات كاتب العمليات بالجملة وتكيف التوازي مع cpu-load"""
+
+import pytest
+
+from bulk_writer import AdaptiveBulkWriter
+from connection_pool import MikroTikConnectionPool
+
+SECRETS = '/ppp/secret'
+
+
+def adds(prefix: str, count: int):
+    return [(f'{SECRETS}/add', {'name': f'{prefix}{i}', 'password': 'p'}) for i in range(count)]
+
+
+def test_worker_limits_are_validated(pool):
+    with pytest.raises(ValueError):
+        AdaptiveBulkWriter(pool, max_workers=2, min_workers=3)
+
+
+def test_results_keep_input_order_across_sessions(pool, router):
+    writer = AdaptiveBulkWriter(pool, max_workers=3, chunk_size=4, sample_interval=0)
+    commands = adds('o', 10) + [(f'{SECRETS}/add', {'name': 'u000', 'password': 'p'})] + adds('p', 9)
+    results = writer.execute(commands)
+    assert [result.arguments['name'] for result in results] == [args['name'] for _, args in commands]
+    assert [i for i, result in enumerate(results) if not result.ok] == [10]
+    assert writer.stats()['commands'] == 20 and writer.stats()['failed'] == 1
+    assert len(router.names(SECRETS)) == 3 + 19
+
+
+def test_low_load_adds_sessions_up_to_the_maximum(pool, router):
+    writer = AdaptiveBulkWriter(pool, max_workers=3, chunk_size=2, sample_interval=0)
+    writer.execute(adds('r', 40))
+    stats = writer.stats()
+    assert stats['last_cpu_load'] == 5 and stats['rampups'] == 2
+    assert stats['workers'] == 3 and stats['peak_workers'] <= 3 and stats['backoffs'] == 0
+
+
+def test_high_load_halves_parallel_sessions(pool, router):
+    writer = AdaptiveBulkWriter(pool, max_workers=4, chunk_size=2, sample_interval=0)
+    for batch in range(5):
+        if writer.stats()['workers'] == 4:
+            break
+        writer.execute(adds(f'h{batch}-', 20))
+    assert writer.stats()['workers'] == 4
+    router.cpu_load = '95'
+    writer.execute(adds('k', 8))
+    stats = writer.stats()
+    assert stats['last_cpu_load'] == 95 and stats['backoffs'] >= 1
+    assert stats['workers'] < 4
+    # لا ينزل تحت min_workers مهما استمر التشبع
+    writer.execute(adds('m', 20))
+    assert writer.stats()['workers'] == writer.min_workers
+
+
+def test_unreadable_load_keeps_the_current_limit(pool, router):
+    writer = AdaptiveBulkWriter(pool, max_workers=3, chunk_size=2, sample_interval=0)
+    router.cpu_load = 'unknown'
+    results = writer.execute(adds('q', 10))
+    assert all(result.ok for result in results)
+    stats = writer.stats()
+    assert stats['samples'] == 0 and stats['workers'] == 1 and stats['rampups'] == 0
+
+
+def test_unanswered_chunk_fails_without_resending(server, router):
+    pool = MikroTikConnectionPool(server.host, 'admin', 'secret', port=server.port, timeout=0.5, max_size=2)
+    writer = AdaptiveBulkWriter(pool, max_workers=2, chunk_size=3)
+    router.silent.add(f'{SECRETS}/add')
+    results = writer.execute(adds('s', 6))
+    assert all(not result.ok and result.error for result in results)
+    assert writer.stats()['failed'] == 6
+    # الجلسات التي بقيت فيها ردود معلقة لا تعود إلى المجمع
+    assert pool.stats()['idle'] == 0
+    router.silent.clear()
+    assert all(result.ok for result in writer.execute(adds('t', 2)))
+    pool.close()
+
+
+def test_unavailable_pool_marks_every_command_failed(pool):
+    writer = AdaptiveBulkWriter(pool, max_workers=2, chunk_size=2)
+    pool.close()
+    results = writer.execute(adds('z', 5))
+    assert len(results) == 5 and all('مغلق' in str(result.error) for result in results)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات قاطع الدائرة"""
+
+import threading
+import time
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+def open_breaker(reset_timeout: float = 30) -> CircuitBreaker:
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def in_thread(function):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.stats()['rejected'] == 2 and breaker.stats()['opened'] == 1
+
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = open_breaker(reset_timeout=0.05)
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    # نفس الخيط (connect داخل execute_command) مسموح، والخيوط الأخرى مرفوضة
+    assert breaker.allow()
+    assert not in_thread(breaker.allow)
+    breaker.record_success()
+    assert breaker.state == CLOSED and in_thread(breaker.allow)
+
+
+def test_failed_probe_reopens():
+    breaker = open_breaker(reset_timeout=0.05)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+
+def test_rejecting_counts_only_when_asked():
+    breaker = open_breaker()
+    assert breaker.rejecting() and breaker.stats()['rejected'] == 0
+    assert breaker.rejecting(count=True) and breaker.stats()['rejected'] == 1
+    assert 0 < breaker.retry_after() <= 30
+
+
+def test_api_rejections_show_in_pool_stats(client):
+    import app
+    breaker = app.router_breaker()
+    for _ in range(app.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure()
+    for _ in range(3):
+        response = client.get('/api/hotspot-users')
+        assert response.status_code == 503 and response.headers['Retry-After']
+    stats = client.get('/api/pool-stats').get_json()['circuit']
+    assert stats['state'] == OPEN and stats['rejected'] == 3
+
+
+def test_routes_without_router_commands_stay_available(client):
+    import app
+    breaker = app.router_breaker()
+    for _ in range(app.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure()
+    assert client.get('/api/ppp-secrets').status_code == 503
+    # المهام ولقطات لوحة التحكم وبث الجلسات لا ترسل أوامر إلى الجهاز
+    assert client.get('/api/bulk-jobs').status_code == 200
+    assert client.get('/api/bulk-jobs/missing').status_code == 404
+    assert client.post('/api/bulk-jobs/missing/cancel').status_code == 404
+    assert client.get('/api/system-info').status_code != 503
+    with client.get('/api/active-users/stream') as response:
+        assert response.status_code == 200
+        assert next(response.response) == b'retry: 3000\n\n'
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات الأوامر الموسومة على جلسة واحدة (execute_batch و stream_batch)"""
+
+import pytest
+from librouteros.exceptions import TrapError
+
+from command_channel import TaggedCommandChannel, compose_words, parse_reply_word
+from mikrotik_manager import MikroTikManager, CONNECTION_ERRORS
+
+SECRETS = '/ppp/secret'
+
+
+def make_manager(server) -> MikroTikManager:
+    return MikroTikManager(server.host, 'admin', 'secret', port=server.port, timeout=2)
+
+
+def add(name: str):
+    return (f'{SECRETS}/add', {'name': name, 'password': 'p'})
+
+
+def test_words_keep_queries_and_text_fields():
+    assert compose_words({'?name': '007', '.proplist': 'name'}) == ['?name=007', '=.proplist=name']
+    assert parse_reply_word('=name=007') == ('name', '007')
+    assert parse_reply_word('=cpu-load=5') == ('cpu-load', 5)
+    with pytest.raises(ValueError):
+        TaggedCommandChannel(None, window=0)
+
+
+@pytest.mark.parametrize('window', [1, 3, 64])
+def test_results_follow_input_order_with_traps_per_command(server, router, window):
+    manager = make_manager(server)
+    commands = [add('b1'), add('u000'), (f'{SECRETS}/print', {'?name': 'u001'}),
+                ('/no/such/print', None), add('b2')]
+    results = manager.execute_batch(commands, window=window)
+    assert [result.command for result in results] == [command for command, _ in commands]
+    assert [result.ok for result in results] == [True, False, True, False, True]
+    assert 'already exists' in str(results[1].error)
+    assert 'no such command' in str(results[3].error)
+    with pytest.raises(TrapError):
+        results[3].raise_for_error()
+    assert [row['name'] for row in results[2].raise_for_error()] == ['u001']
+    assert {'b1', 'b2'} <= set(router.names(SECRETS))
+    # كل الأوامر على جلسة واحدة
+    assert router.commands.count('/login') == 1
+    manager.disconnect()
+
+
+def test_read_only_batch_is_retried_after_a_drop(server, router):
+    manager = make_manager(server)
+    assert manager.connect()
+    server.kill_connections()
+    results = manager.execute_batch([(f'{SECRETS}/print', None), ('/ip/hotspot/user/print', None)])
+    assert [len(result.rows) for result in results] == [3, 2]
+    assert router.commands.count('/login') == 2
+    manager.disconnect()
+
+
+def test_batch_with_writes_is_not_resent_after_a_drop(server, router):
+    manager = make_manager(server)
+    assert manager.connect()
+    server.kill_connections()
+    with pytest.raises(CONNECTION_ERRORS):
+        manager.execute_batch([(f'{SECRETS}/print', None), add('lost')])
+    assert 'lost' not in router.names(SECRETS) and not manager.is_connected()
+    assert router.commands.count('/login') == 1
+    manager.disconnect()
+
+
+def test_abandoned_stream_drops_the_unsynchronised_session(server, router):
+    manager = make_manager(server)
+    stream = manager.stream_batch([add(f's{i}') for i in range(10)], window=4)
+    position, result = next(stream)
+    assert result.ok and manager.is_connected()
+    stream.close()
+    # ردود معلقة لم تُقرأ: الجلسة لا تُعاد إلى الاستخدام
+    assert not manager.is_connected()
+    assert manager.execute_command(f'{SECRETS}/print', {'?name': 's0'})[0]['name'] == 's0'
+    assert router.commands.count('/login') == 2
+    manager.disconnect()
+
+
+def test_stream_batch_yields_every_command_once(server):
+    manager = make_manager(server)
+    items = list(manager.stream_batch([add(f't{i}') for i in range(20)], window=5))
+    assert sorted(position for position, _ in items) == list(range(20))
+    assert all(result.ok for _, result in items)
+    assert manager.is_connected()
+    manager.disconnect()
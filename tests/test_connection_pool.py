@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات مجمع الاتصالات على الجهاز الوهمي"""
+
+import threading
+import time
+
+import pytest
+
+from connection_pool import MikroTikConnectionPool, PoolExhaustedError
+
+
+def make_pool(server, **options) -> MikroTikConnectionPool:
+    options.setdefault('max_size', 2)
+    return MikroTikConnectionPool(server.host, 'admin', 'secret', port=server.port, timeout=2, **options)
+
+
+def test_released_session_is_reused(server):
+    pool = make_pool(server)
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    assert second is first
+    pool.release(second)
+    stats = pool.stats()
+    assert stats['created'] == 1 and stats['reused'] == 1
+    assert stats['size'] == 1 and stats['idle'] == 1 and stats['in_use'] == 0
+    pool.close()
+
+
+def test_exhausted_pool_times_out(server):
+    pool = make_pool(server, max_size=1, acquire_timeout=0.1)
+    held = pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolExhaustedError):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.1
+    assert pool.stats()['timeouts'] == 1
+    pool.release(held)
+    pool.close()
+
+
+def test_waiter_gets_released_session(server):
+    pool = make_pool(server, max_size=1, acquire_timeout=2)
+    held = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(held)
+    waiter.join(2)
+    assert acquired == [held]
+    assert pool.stats()['waits'] >= 1
+    pool.release(held)
+    pool.close()
+
+
+def test_connection_error_discards_session(server):
+    pool = make_pool(server)
+    with pytest.raises(ConnectionError):
+        with pool.connection():
+            raise ConnectionError('انقطع الاتصال')
+    stats = pool.stats()
+    assert stats['discarded'] == 1 and stats['size'] == 0
+    pool.close()
+
+
+def test_dead_idle_session_is_checked_before_reuse(server):
+    pool = make_pool(server, validate_after=0)
+    first = pool.acquire()
+    pool.release(first)
+    server.kill_connections()
+    # الفحص يكتشف الانقطاع فتُعاد الجلسة متصلة من جديد قبل تسليمها
+    second = pool.acquire()
+    assert second.is_connected()
+    assert second.execute_command('/system/identity/print')[0]['name'] == 'fake'
+    assert server.router.commands.count('/login') == 2
+    pool.release(second)
+    pool.close()
+
+
+def test_failed_login_frees_the_slot(server):
+    pool = MikroTikConnectionPool(server.host, 'admin', 'bad', port=server.port, timeout=2, max_size=1)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            pool.acquire()
+    assert pool.stats()['size'] == 0
+    pool.close()
+
+
+def test_idle_sessions_above_min_size_are_evicted(server):
+    pool = make_pool(server, min_size=1, idle_timeout=0)
+    sessions = [pool.acquire(), pool.acquire()]
+    for session in sessions:
+        pool.release(session)
+    assert pool.evict_idle() == 1
+    assert pool.stats()['idle'] == 1
+    pool.close()
+
+
+def test_reconfigure_drops_borrowed_sessions_on_release(server):
+    pool = make_pool(server)
+    held = pool.acquire()
+    pool.reconfigure(server.host, 'admin', 'other', server.port)
+    pool.release(held)
+    stats = pool.stats()
+    assert stats['discarded'] == 1 and stats['idle'] == 0
+    assert not held.is_connected()
+    pool.close()
+
+
+def test_closed_pool_refuses_acquire(server):
+    pool = make_pool(server)
+    pool.close()
+    with pytest.raises(ConnectionError):
+        pool.acquire()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات مولد بيانات الدخول وفحص تكرار الأسماء"""
+
+import pytest
+
+from credentials import ALPHABETS, CredentialGenerator, generator_for, resolve_alphabet
+from mikrotik_manager import bulk_usernames
+
+
+def test_resolve_alphabet_names_and_literals():
+    assert resolve_alphabet(None) == ALPHABETS['alnum']
+    assert resolve_alphabet('hex') == ALPHABETS['hex']
+    assert resolve_alphabet('chars:ab12') == 'ab12'
+
+
+@pytest.mark.parametrize('alphabet', ['hexa', 'abc', 'chars:a', 'chars:aab', 'chars:أب'])
+def test_resolve_alphabet_rejects_unknown_and_invalid(alphabet):
+    with pytest.raises(ValueError):
+        resolve_alphabet(alphabet)
+
+
+def test_passwords_use_only_alphabet_characters():
+    generator = CredentialGenerator('chars:xyz')
+    passwords = generator.passwords(2000, 10)
+    assert len(passwords) == 2000
+    assert all(len(password) == 10 and set(password) <= set('xyz') for password in passwords)
+
+
+def test_passwords_are_roughly_uniform():
+    # 3 أحرف لا تقسم 256: دون حذف البايتات الزائدة ينحاز التوزيع للحرف الأول
+    chars = CredentialGenerator('chars:abc').random_chars(300000)
+    counts = [chars.count(char) for char in 'abc']
+    assert max(counts) - min(counts) < 3000
+
+
+def test_generator_for_reuses_instances():
+    assert generator_for('digits') is generator_for('digits')
+    assert generator_for() is generator_for('alnum')
+
+
+def test_sequential_usernames_skip_taken():
+    names = generator_for().sequential_usernames('user', 3, taken={'user001', 'user003'})
+    assert names == ['user002', 'user004', 'user005']
+
+
+def test_random_usernames_are_unique_and_skip_taken():
+    generator = CredentialGenerator('chars:ab')
+    taken = {'c-aaa', 'c-bbb'}
+    names = generator.random_usernames('c-', 3, length=3, taken=taken)
+    assert len(set(names)) == 3 and not taken & set(names)
+    with pytest.raises(ValueError):
+        generator.random_usernames('c-', 5, length=3)
+
+
+def test_bulk_usernames_random_name_type():
+    names = bulk_usernames('card', 50, 'random', taken={'card000000'})
+    assert len(set(names)) == 50
+    assert all(name.startswith('card') and len(name) == 10 for name in names)
+
+
+def test_user_names_keep_digit_only_names(router, pool):
+    router.add('/ppp/secret', name='007', password='x')
+    with pool.connection() as mt:
+        taken = mt.user_names('/ppp/secret')
+        assert '007' in taken and '7' not in taken
+        users = mt.create_bulk_users(count=0, name_type='custom', custom_names=['007', '0070'])
+    assert [user['username'] for user in users if user.get('error')] == ['007']
+    assert router.names('/ppp/secret').count('007') == 1
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات الذاكرة المؤقتة لبيانات الجهاز"""
+
+import time
+
+from metadata_cache import MetadataCache
+
+PROFILES = '/ppp/profile/print'
+
+
+def test_only_print_on_configured_paths_is_cacheable():
+    cache = MetadataCache()
+    assert cache.is_cacheable(PROFILES)
+    assert not cache.is_cacheable('/ppp/profile/add')
+    assert not cache.is_cacheable('/ppp/secret/print')
+
+
+def test_lookup_returns_copies_of_stored_rows():
+    cache = MetadataCache()
+    assert cache.lookup(PROFILES, ()) is None
+    cache.store(PROFILES, (), [{'name': 'default'}])
+    rows = cache.lookup(PROFILES, ())
+    assert rows == [{'name': 'default'}]
+    rows[0]['name'] = 'changed'
+    assert cache.lookup(PROFILES, ()) == [{'name': 'default'}]
+    # الكلمات جزء من المفتاح
+    assert cache.lookup(PROFILES, ('?name=default',)) is None
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = MetadataCache(ttls={'/ppp/profile': 0.05})
+    cache.store(PROFILES, (), [{'name': 'default'}])
+    time.sleep(0.06)
+    assert cache.lookup(PROFILES, ()) is None
+    assert cache.stats()['expired'] == 1
+
+
+def test_write_invalidates_path_and_bumps_version():
+    cache = MetadataCache()
+    cache.store(PROFILES, (), [{'name': 'default'}])
+    cache.store('/ip/hotspot/print', (), [{'name': 'hs1'}])
+    cache.invalidate('/ppp/profile/print')
+    assert cache.version('/ppp/profile') == 0
+    cache.invalidate('/ppp/profile/add')
+    assert cache.version('/ppp/profile') == 1
+    assert cache.lookup(PROFILES, ()) is None
+    assert cache.lookup('/ip/hotspot/print', ()) == [{'name': 'hs1'}]
+
+
+def test_read_overlapping_a_write_is_not_stored():
+    cache = MetadataCache()
+    version = cache.version('/ppp/profile')
+    cache.invalidate('/ppp/profile/set')
+    cache.store(PROFILES, (), [{'name': 'stale'}], version)
+    assert cache.lookup(PROFILES, ()) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MetadataCache(max_entries=2)
+    for name in ('a', 'b'):
+        cache.store(PROFILES, (f'?name={name}',), [{'name': name}])
+    cache.lookup(PROFILES, ('?name=a',))
+    cache.store(PROFILES, ('?name=c',), [{'name': 'c'}])
+    assert cache.lookup(PROFILES, ('?name=b',)) is None
+    assert cache.lookup(PROFILES, ('?name=a',)) is not None
+    assert cache.stats()['evicted'] == 1
+
+
+def test_manager_reads_through_and_invalidates_on_write(pool, router):
+    with pool.connection() as mt:
+        assert [row['name'] for row in mt.execute_command(PROFILES)] == ['default']
+        mt.execute_command(PROFILES)
+        assert router.commands.count(PROFILES) == 1
+        mt.execute_command('/ppp/profile/add', {'name': 'fast'})
+        assert [row['name'] for row in mt.execute_command(PROFILES)] == ['default', 'fast']
+        assert router.commands.count(PROFILES) == 2
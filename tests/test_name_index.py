@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات فهرس الأسماء والرجوع إلى الجهاز عند الإخفاق"""
+
+import time
+
+from name_index import NameIndex
+
+SECRETS = '/ppp/secret'
+
+
+def test_load_keeps_digit_only_names_as_text():
+    index = NameIndex()
+    index.load(SECRETS, [{'.id': '*1', 'name': '007'}, {'.id': '*2', 'name': 'a'}, {'name': 'no-id'}])
+    assert index.get(SECRETS, '007') == ['*1']
+    assert index.get(SECRETS, '7') is None
+    assert not index.needs_reload(SECRETS)
+
+
+def test_entry_age_is_checked_on_every_hit():
+    index = NameIndex(reload_after=0.05)
+    index.load(SECRETS, [{'.id': '*1', 'name': 'a'}])
+    index.put(SECRETS, 'b', ['*2'])
+    assert index.get(SECRETS, 'a') == ['*1'] and index.get(SECRETS, 'b') == ['*2']
+    time.sleep(0.06)
+    assert index.get(SECRETS, 'a') is None and index.get(SECRETS, 'b') is None
+    assert index.needs_reload(SECRETS)
+    assert index.stats()['expired'] == 2
+
+
+def test_renamed_user_is_not_changed_through_a_cached_id(pool, router):
+    with pool.connection() as mt:
+        assert mt.toggle_ppp_user('u000', True)
+        original = router.tables[SECRETS][0]
+        # إعادة تسمية من خارج التطبيق ثم مستخدم جديد بنفس الاسم
+        original['name'] = 'renamed'
+        original['disabled'] = 'false'
+        replacement = router.add(SECRETS, name='u000', password='p', profile='default', disabled='false')
+        assert mt.toggle_ppp_user('u000', True)
+        assert replacement['disabled'] == 'yes' and original['disabled'] == 'false'
+        assert mt.delete_ppp_user_by_name('u000')
+    assert 'renamed' in router.names(SECRETS) and 'u000' not in router.names(SECRETS)
+
+
+def test_by_name_write_confirms_digit_only_names(pool, router):
+    row = router.add(SECRETS, name='007', password='p', profile='default', disabled='false')
+    with pool.connection() as mt:
+        assert mt._find_ids(SECRETS, '007') == [row['.id']]
+        assert mt._find_ids(SECRETS, 'missing') == []
+        assert not mt.toggle_ppp_user('missing', True)
+    assert router.commands.count(f'{SECRETS}/print') == 3
+
+
+def test_find_ids_many_queries_only_index_misses(pool, router):
+    with pool.connection() as mt:
+        mt.find_ids_many(SECRETS, ['u000'])
+        first = router.add(SECRETS, name='123', password='p', profile='default')
+        second = router.add(SECRETS, name='true', password='p', profile='default')
+        found = mt.find_ids_many(SECRETS, ['u000', 'u001', '123', 'true', 'missing'])
+    assert set(found) == {'u000', 'u001', '123', 'true'}
+    assert found['123'] == [first['.id']] and found['true'] == [second['.id']]
+    # تحميل واحد للفهرس ثم استعلام ?name لكل اسم غير موجود فيه
+    assert router.commands.count(f'{SECRETS}/print') == 1 + 3
+
+
+def test_find_ids_many_reloads_expired_names(pool, router, monkeypatch):
+    with pool.connection() as mt:
+        monkeypatch.setattr(mt.index, 'reload_after', 0.05)
+        assert mt.find_ids_many(SECRETS, ['u000']) == {'u000': ['*1']}
+        router.tables[SECRETS][0]['name'] = 'renamed'
+        replacement = router.add(SECRETS, name='u000', password='p', profile='default')
+        time.sleep(0.06)
+        assert mt.find_ids_many(SECRETS, ['u000']) == {'u000': [replacement['.id']]}
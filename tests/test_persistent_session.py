@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات الجلسة الدائمة: إعادة الاتصال والنبض والتراجع بعد الفشل"""
+
+import time
+
+import pytest
+
+import mikrotik_manager
+from fake_routeros import FakeRouterServer
+from mikrotik_manager import MikroTikManager, CONNECTION_ERRORS
+
+SECRETS = '/ppp/secret'
+
+
+def make_manager(server, **options) -> MikroTikManager:
+    return MikroTikManager(server.host, 'admin', 'secret', port=server.port, timeout=2, **options)
+
+
+def test_print_is_retried_on_a_new_session_after_a_drop(server, router):
+    manager = make_manager(server)
+    assert manager.connect()
+    server.kill_connections()
+    rows = manager.execute_command(f'{SECRETS}/print', {'.proplist': 'name'})
+    assert [row['name'] for row in rows] == ['u000', 'u001', 'u002']
+    assert router.commands.count('/login') == 2
+    manager.disconnect()
+
+
+def test_write_is_not_resent_after_a_drop(server, router):
+    manager = make_manager(server)
+    assert manager.connect()
+    server.kill_connections()
+    with pytest.raises(CONNECTION_ERRORS):
+        manager.execute_command(f'{SECRETS}/add', {'name': 'once', 'password': 'p'})
+    assert not manager.is_connected()
+    # الأمر التالي يفتح جلسة جديدة دون أن يُعاد أمر الكتابة
+    manager.execute_command(f'{SECRETS}/add', {'name': 'next', 'password': 'p'})
+    assert router.names(SECRETS).count('once') == 0 and 'next' in router.names(SECRETS)
+    assert router.commands.count('/login') == 2
+    manager.disconnect()
+
+
+def test_failed_connect_backs_off_instead_of_reconnecting(router, monkeypatch):
+    server = FakeRouterServer(router)
+    server.close()
+    attempts = []
+    connect = mikrotik_manager.librouteros.connect
+
+    def counting(**options):
+        attempts.append(time.monotonic())
+        return connect(**options)
+
+    monkeypatch.setattr(mikrotik_manager.librouteros, 'connect', counting)
+    manager = make_manager(server, max_backoff=30)
+    assert not manager.connect()
+    started = time.monotonic()
+    with pytest.raises(ConnectionError):
+        manager.execute_command(f'{SECRETS}/print')
+    # داخل فترة التراجع: فشل فوري دون محاولة اتصال جديدة
+    assert len(attempts) == 1 and time.monotonic() - started < 0.5
+
+
+def test_keepalive_replaces_a_dead_idle_session(server, router):
+    manager = make_manager(server, persistent=True, keepalive_interval=0.1)
+    with manager:
+        pass
+    # الجلسة الدائمة تبقى مفتوحة بعد with
+    assert manager.is_connected()
+    server.kill_connections()
+    deadline = time.monotonic() + 5
+    while not (router.commands.count('/login') == 2 and manager.is_connected()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    # النبض وجد الجلسة ميتة فأعاد الاتصال دون أي أمر من المستدعي
+    assert router.commands == ['/login', '/login'] and manager.is_connected()
+    manager.disconnect()
+    manager._keepalive_thread.join(2)
+    assert not manager._keepalive_thread.is_alive()
+
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات إرسال .proplist مع أوامر القراءة حتى لا يرسل الجهاز باقي الأعمدة"""
+
+import asyncio
+
+from async_mikrotik_manager import AsyncMikroTikManager
+from fake_routeros import AsyncFakeRouterServer
+from mikrotik_manager import projection, USER_DETAIL_FIELDS
+
+
+def record_words(router, monkeypatch):
+    """كلمات كل جملة أمر تصل إلى الجهاز الوهمي"""
+    sent = []
+    handle = router.handle
+
+    def recording(words):
+        sent.append(list(words))
+        return handle(words)
+
+    monkeypatch.setattr(router, 'handle', recording)
+    return sent
+
+
+def print_words(sent, command):
+    return [words for words in sent if words[0] == command]
+
+
+def test_projection_merges_extra_fields_and_arguments():
+    params = projection(('.id', 'name'), ['name', 'comment'], {'?name': 'a'})
+    assert params == {'?name': 'a', '.proplist': '.id,name,comment'}
+
+
+def test_detailed_info_selects_the_user_and_sends_proplist(pool, router, monkeypatch):
+    row = router.tables['/ppp/secret'][1]
+    sent = record_words(router, monkeypatch)
+    with pool.connection() as mt:
+        info = mt.get_user_detailed_info(row['.id'], 'ppp')
+        assert mt.get_user_detailed_info('*FF', 'hotspot') == {}
+    assert info['id'] == row['.id'] and info['name'] == 'u001' and info['type'] == 'ppp'
+    proplist = f'=.proplist={",".join(USER_DETAIL_FIELDS)}'
+    words = print_words(sent, '/ppp/secret/print')[0]
+    assert f'?.id={row[".id"]}' in words and proplist in words
+    words = print_words(sent, '/ip/hotspot/user/print')[0]
+    assert '?.id=*FF' in words and proplist in words
+
+
+def test_async_detailed_info_sends_proplist(router, monkeypatch):
+    row = router.tables['/ip/hotspot/user'][1]
+    sent = record_words(router, monkeypatch)
+
+    async def main():
+        async with AsyncFakeRouterServer(router) as server:
+            manager = AsyncMikroTikManager(server.host, 'admin', 'secret', server.port)
+            try:
+                return await manager.get_user_detailed_info(row['.id'], 'hotspot')
+            finally:
+                await manager.disconnect()
+
+    info = asyncio.run(main())
+    assert info['name'] == 'h001' and info['type'] == 'hotspot'
+    words = print_words(sent, '/ip/hotspot/user/print')[0]
+    assert f'?.id={row[".id"]}' in words and any(word.startswith('=.proplist=') for word in words)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات مهام الإنشاء المحفوظة على القرص: الاستئناف والقفل وحذف الملفات"""
+
+import json
+import os
+
+from bulk_jobs import BulkJobManager, COMPLETED
+from resumable_jobs import CheckpointedBulkJob, acquire_lock, resume_jobs
+
+PARAMS = {'user_type': 'ppp', 'prefix': '', 'count': 6, 'password_length': 5,
+          'profile': 'default', 'server': 'all', 'password_alphabet': 'digits'}
+
+
+def finish(job):
+    while not job.finished:
+        job.wait(job.total, 5)
+    return job.progress(0)
+
+
+def test_resumed_chunk_recognizes_users_created_before_the_crash(router, pool, writer, tmp_path):
+    # المهمة الأولى كتبت الدفعة المعلقة وأرسلت أول مستخدمين ثم توقفت
+    job = CheckpointedBulkJob('job1', str(tmp_path), pool, PARAMS, chunk_size=4)
+    job._taken = set()
+    users, _ = job._chunk_users(0, 4)
+    for user in users[:2]:
+        router.add('/ppp/secret', name=user['username'], password=user['password'])
+    os.remove(job.lock_path)
+
+    manager = BulkJobManager(writer)
+    resumed = resume_jobs(manager, str(tmp_path), pool)
+    assert [job.id for job in resumed] == ['job1']
+    progress = finish(resumed[0])
+
+    assert progress['status'] == COMPLETED and progress['success'] == 6
+    # الأسماء رقمية بالكامل (001...) وكلمات المرور أرقام قد تبدأ بصفر
+    assert [user['username'] for user in progress['results']] == ['001', '002', '003', '004', '005', '006']
+    assert all('error' not in user for user in progress['results'])
+    assert sorted(router.names('/ppp/secret'))[:6] == ['001', '002', '003', '004', '005', '006']
+    assert sorted(os.listdir(tmp_path)) == ['job1.json', 'job1.ndjson']
+
+
+def test_existing_users_with_other_passwords_are_reported(router, pool, tmp_path):
+    router.add('/ppp/secret', name='001', password='other')
+    job = CheckpointedBulkJob('job2', str(tmp_path), pool, PARAMS, chunk_size=6)
+    job._taken = set()
+    users, _ = job._chunk_users(0, 6)
+    existing = job._existing_users(users)
+    assert existing == {'001': 'other'}
+
+
+def test_resume_skips_jobs_locked_by_a_live_process(pool, writer, tmp_path):
+    CheckpointedBulkJob('job3', str(tmp_path), pool, PARAMS)
+    # القفل باسم العملية الحالية: مهمة تنفذها هذه العملية أصلاً
+    assert resume_jobs(BulkJobManager(writer), str(tmp_path), pool) == []
+
+    # قفل تركته عملية منتهية يُستعاد
+    with open(tmp_path / 'job3.lock', 'w') as f:
+        f.write('999999999')
+    resumed = resume_jobs(BulkJobManager(writer), str(tmp_path), pool)
+    assert [job.id for job in resumed] == ['job3']
+    finish(resumed[0])
+
+
+def test_acquire_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / 'a.lock')
+    assert acquire_lock(path)
+    assert not acquire_lock(path)
+    assert open(path).read() == str(os.getpid())
+
+
+def test_finished_jobs_files_are_removed(pool, writer, tmp_path):
+    job = CheckpointedBulkJob('job4', str(tmp_path), pool, PARAMS)
+    os.remove(job.lock_path)
+    state = json.loads((tmp_path / 'job4.json').read_text())
+    state['status'] = COMPLETED
+    (tmp_path / 'job4.json').write_text(json.dumps(state))
+    assert resume_jobs(BulkJobManager(writer), str(tmp_path), pool) == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_pruned_jobs_discard_their_files(pool, writer, tmp_path):
+    manager = BulkJobManager(writer, max_finished=0)
+    job = manager.submit_job(CheckpointedBulkJob('job5', str(tmp_path), pool, dict(PARAMS, count=2)))
+    finish(job)
+    manager.submit_job(CheckpointedBulkJob('job6', str(tmp_path), pool, dict(PARAMS, count=0)))
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('job5')]
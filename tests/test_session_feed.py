@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات بث الجلسات النشطة: snapshot ثم فروق الدخول والخروج والتحديث"""
+
+import json
+import time
+
+import pytest
+
+from session_feed import ActiveSessionFeed
+
+PPP_ACTIVE = '/ppp/active'
+
+
+def connect(router, name: str, address: str = '10.0.0.2'):
+    return router.add(PPP_ACTIVE, name=name, address=address, uptime='1s', service='pppoe')
+
+
+@pytest.fixture
+def feed(pool):
+    # الخيط يقرأ مرة عند الاشتراك ثم ينتظر طويلاً؛ القراءات التالية بـ sample() مباشرة
+    feed = ActiveSessionFeed(pool, interval=60)
+    yield feed
+    feed.stop()
+
+
+def next_event(subscription):
+    event = subscription.next(timeout=2)
+    assert event is not None
+    return event[1], event[2]
+
+
+def test_snapshot_then_join_leave_and_update(feed, router):
+    first = connect(router, 'u000')
+    second = connect(router, 'u001', '10.0.0.3')
+    subscription = feed.subscribe()
+    kind, sessions = next_event(subscription)
+    assert kind == 'snapshot' and [session['name'] for session in sessions] == ['u000', 'u001']
+
+    router.tables[PPP_ACTIVE].remove(first)
+    connect(router, 'u002', '10.0.0.4')
+    second['address'] = '10.0.0.9'
+    feed.sample()
+    events = [next_event(subscription) for _ in range(3)]
+    assert [kind for kind, _ in events] == ['join', 'leave', 'update']
+    assert events[0][1][0]['name'] == 'u002'
+    assert events[1][1] == [{'id': first['.id'], 'type': 'PPP', 'name': 'u000'}]
+    assert events[2][1][0]['address'] == '10.0.0.9'
+
+
+def test_uptime_changes_alone_are_not_published(feed, router):
+    session = connect(router, 'u000')
+    subscription = feed.subscribe()
+    next_event(subscription)
+    session['uptime'] = '2m'
+    feed.sample()
+    assert subscription.next(timeout=0.1) is None
+    assert feed.stats()['events'] == 1
+
+
+def test_router_failure_keeps_the_last_state(feed, router):
+    connect(router, 'u000')
+    subscription = feed.subscribe()
+    next_event(subscription)
+    active = router.tables.pop(PPP_ACTIVE)
+    feed.sample()
+    # لا أحداث خاطئة (مثل leave للجميع) عند فشل القراءة
+    assert subscription.next(timeout=0.1) is None
+    assert feed.stats()['errors'] == 1 and feed.stats()['sessions'] == 1
+    router.tables[PPP_ACTIVE] = active
+    connect(router, 'u001')
+    feed.sample()
+    kind, sessions = next_event(subscription)
+    assert kind == 'join' and [session['name'] for session in sessions] == ['u001']
+
+
+def test_unreachable_router_publishes_nothing(feed, router, server):
+    connect(router, 'u000')
+    subscription = feed.subscribe()
+    next_event(subscription)
+    server.close()
+    feed.pool.close_all()
+    feed.sample()
+    assert subscription.next(timeout=0.1) is None and feed.stats()['errors'] >= 1
+
+
+def test_late_subscriber_gets_the_current_snapshot(feed, router):
+    connect(router, 'u000')
+    next_event(feed.subscribe())
+    samples = feed.stats()['samples']
+    late = feed.subscribe()
+    kind, sessions = next_event(late)
+    assert kind == 'snapshot' and sessions[0]['name'] == 'u000'
+    # من الحالة المعروفة دون قراءة جديدة من الجهاز
+    assert feed.stats()['samples'] == samples
+
+
+def test_slow_subscriber_is_dropped(pool, router):
+    feed = ActiveSessionFeed(pool, interval=60, max_pending=1)
+    slow = feed.subscribe()
+    while feed.stats()['samples'] == 0:
+        time.sleep(0.01)
+    # طابوره ممتلئ بالـ snapshot الذي لم يقرأه
+    connect(router, 'u000')
+    feed.sample()
+    assert slow.closed and feed.stats()['dropped_subscribers'] == 1
+    assert feed.stats()['subscribers'] == 0
+    feed.stop()
+
+
+def test_stream_endpoint_sends_snapshot_and_unsubscribes_on_close(client, router):
+    import app
+    connect(router, 'u000')
+    with client.get('/api/active-users/stream') as response:
+        assert response.mimetype == 'text/event-stream'
+        assert next(response.response) == b'retry: 3000\n\n'
+        event = next(response.response).decode('utf-8')
+        lines = dict(line.split(': ', 1) for line in event.strip().split('\n'))
+        assert lines['event'] == 'snapshot'
+        assert [session['name'] for session in json.loads(lines['data'])] == ['u000']
+        assert app.session_feed.stats()['subscribers'] == 1
+    assert app.session_feed.stats()['subscribers'] == 0
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات دمج القراءات المتطابقة المتزامنة"""
+
+import threading
+
+import pytest
+from librouteros.exceptions import TrapError
+
+from single_flight import SingleFlight
+
+
+def run_concurrently(flight: SingleFlight, key, fetch, callers: int):
+    """callers طالباً لنفس المفتاح؛ fetch ينتظر حتى ينضم الجميع"""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fetch))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    return results, errors
+
+
+def blocking_fetch(flight: SingleFlight, callers: int, rows=None, error=None):
+    """fetch لا يعود حتى يصبح كل الطالبين الآخرين منتظرين"""
+    executions = []
+
+    def fetch():
+        executions.append(1)
+        while flight.stats()['coalesced'] < callers - 1:
+            threading.Event().wait(0.005)
+        if error is not None:
+            raise error
+        return rows
+
+    return fetch, executions
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    fetch, executions = blocking_fetch(flight, 5, rows=[{'name': 'default'}])
+    results, errors = run_concurrently(flight, 'profiles', fetch, 5)
+    assert not errors and len(executions) == 1
+    assert results == [[{'name': 'default'}]] * 5
+    # كل طالب يحصل على نسخته الخاصة
+    assert len({id(rows[0]) for rows in results}) == 5
+    stats = flight.stats()
+    assert stats == {'calls': 5, 'executions': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_error_is_raised_for_every_caller():
+    flight = SingleFlight()
+    fetch, executions = blocking_fetch(flight, 3, error=ConnectionError('انقطع الاتصال'))
+    results, errors = run_concurrently(flight, 'profiles', fetch, 3)
+    assert not results and len(executions) == 1
+    assert len(errors) == 3 and all(isinstance(e, ConnectionError) for e in errors)
+
+
+def test_each_waiter_gets_its_own_error_chained_to_the_original():
+    flight = SingleFlight()
+    original = TrapError('no such command prefix', category=2)
+    fetch, _ = blocking_fetch(flight, 3, error=original)
+    _, errors = run_concurrently(flight, 'profiles', fetch, 3)
+    leader = [e for e in errors if e is original]
+    waiters = [e for e in errors if e is not original]
+    assert len(leader) == 1 and len(waiters) == 2 and waiters[0] is not waiters[1]
+    for error in waiters:
+        assert isinstance(error, TrapError) and error.__cause__ is original
+        assert str(error) == 'no such command prefix' and error.category == 2
+
+
+def test_later_call_starts_a_new_execution():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: [{'n': '1'}]) == [{'n': '1'}]
+    assert flight.do('key', lambda: [{'n': '2'}]) == [{'n': '2'}]
+
+    def failing():
+        raise ValueError('خطأ')
+
+    with pytest.raises(ValueError):
+        flight.do('key', failing)
+    assert flight.do('key', lambda: []) == []
+    assert flight.stats()['executions'] == 4
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(2)
+        return [{'key': 'a'}]
+
+    thread = threading.Thread(target=lambda: flight.do('a', slow))
+    thread.start()
+    started.wait(2)
+    assert flight.do('b', lambda: [{'key': 'b'}]) == [{'key': 'b'}]
+    release.set()
+    thread.join(2)
+    assert flight.stats()['coalesced'] == 0
+
+
+def test_manager_coalesces_identical_prints(pool, router):
+    sessions = [pool.acquire(), pool.acquire(), pool.acquire()]
+    barrier = threading.Barrier(len(sessions))
+    results = []
+
+    def read(mt):
+        barrier.wait()
+        results.append(mt.execute_command('/ppp/secret/print', {'.proplist': 'name'}))
+
+    # الجهاز الوهمي يرد فوراً، لذلك يُبطأ الرد بحجز قفل الجداول حتى يبدأ الجميع
+    with router.lock:
+        threads = [threading.Thread(target=read, args=(mt,)) for mt in sessions]
+        for thread in threads:
+            thread.start()
+        while sessions[0].flights.stats()['calls'] < len(sessions):
+            threading.Event().wait(0.005)
+    for thread in threads:
+        thread.join(2)
+    for mt in sessions:
+        pool.release(mt)
+    assert len(results) == 3 and all(rows == results[0] for rows in results)
+    assert router.commands.count('/ppp/secret/print') == 1
+
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات التحديث الدوري لبيانات لوحة التحكم"""
+
+import time
+
+from snapshot_refresher import SnapshotRefresher
+
+RESOURCE = '/system/resource/print'
+
+
+def make_refresher(pool, **options) -> SnapshotRefresher:
+    refresher = SnapshotRefresher(pool, **options)
+    refresher.register('resource', lambda mt: mt.execute_command(RESOURCE)[0])
+    return refresher
+
+
+def test_first_get_starts_the_thread_and_waits_for_a_read(pool):
+    refresher = make_refresher(pool, interval=0.05, first_wait=2)
+    value, age, error = refresher.get('resource')
+    assert value['version'] == '7.1' and age is not None and error is None
+    refresher.stop()
+
+
+def test_requests_share_background_reads(pool, router):
+    refresher = make_refresher(pool, interval=0.2)
+    refresher.get('resource')
+    for _ in range(20):
+        refresher.get('resource')
+    # عشرون طلباً خلال الفاصل لا تضيف قراءات
+    assert router.commands.count(RESOURCE) == 1
+    assert refresher.stats()['reads'] == 21
+    refresher.stop()
+
+
+def test_stale_value_is_served_with_error_when_router_fails(pool, server):
+    refresher = make_refresher(pool, interval=0.02)
+    value, _, _ = refresher.get('resource')
+    server.close()
+    deadline = time.monotonic() + 2
+    while refresher.get('resource')[2] is None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    stale, age, error = refresher.get('resource')
+    assert stale == value and error and age > 0
+    refresher.stop()
+
+
+def test_refreshing_stops_when_nobody_reads(pool, router):
+    refresher = make_refresher(pool, interval=0.01, idle_after=0.05)
+    refresher.get('resource')
+    time.sleep(0.15)
+    reads = router.commands.count(RESOURCE)
+    time.sleep(0.1)
+    assert router.commands.count(RESOURCE) == reads
+    assert refresher.stats()['idle']
+    refresher.stop()
+
+
+def test_system_info_without_startup_hook(client):
+    import app
+    app.dashboard_refresher.stop()
+    app.dashboard_refresher.clear()
+    for url in ('/api/system-info', '/api/system-resources'):
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+    assert client.get('/api/system-resources').get_json()['data']['version'] == '7.1'
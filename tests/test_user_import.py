@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات استيراد المستخدمين من CSV و NDJSON"""
+
+import io
+
+from user_import import UserImporter, iter_rows
+
+
+def rows_of(text: str, fmt: str):
+    return iter_rows(io.BytesIO(text.encode('utf-8')), fmt)
+
+
+def test_iter_rows_normalizes_columns():
+    rows = list(rows_of('﻿Name,Pass,Local_Address\nali,1,10.0.0.2\n,,\n', 'csv'))
+    assert rows == [(2, {'username': 'ali', 'password': '1', 'local-address': '10.0.0.2'}, None)]
+
+
+def test_iter_rows_reports_bad_ndjson_lines():
+    rows = list(rows_of('{"name": "a", "password": 1}\nnot json\n[1]\n\n', 'ndjson'))
+    assert rows[0] == (1, {'username': 'a', 'password': '1'}, None)
+    assert [line for line, row, error in rows if error] == [2, 3]
+
+
+def test_import_creates_and_reports_errors(router, pool, writer):
+    text = ('username,password,profile\n'
+            'new1,p1,default\n'
+            'new1,p2,default\n'
+            'u000,p,default\n'
+            'new2,,default\n'
+            'new3,p,missing\n'
+            'new4,p,\n')
+    report = UserImporter(pool, writer, chunk_size=2).run('ppp', rows_of(text, 'csv'))
+    assert (report['total'], report['created'], report['failed']) == (6, 2, 4)
+    assert {error['line'] for error in report['errors']} == {3, 4, 5, 6}
+    assert {'new1', 'new4'} <= set(router.names('/ppp/secret'))
+
+
+def test_import_detects_existing_digit_only_names(router, pool, writer):
+    router.add('/ip/hotspot/user', name='007', password='x', profile='default')
+    text = '{"username": "007", "password": "1"}\n{"username": "0007", "password": "01"}\n'
+    report = UserImporter(pool, writer).run('hotspot', rows_of(text, 'ndjson'))
+    assert report['created'] == 1
+    assert report['errors'] == [{'line': 1, 'username': '007', 'error': 'اسم المستخدم موجود مسبقاً'}]
+    created = next(row for row in router.tables['/ip/hotspot/user'] if row['name'] == '0007')
+    assert created['password'] == '01'
+
+
+def test_import_rejects_non_ascii_and_bad_byte_limits(pool, writer):
+    text = 'username,password,limit-bytes-in\nعلي,p,\nok,p,10GB\n'
+    report = UserImporter(pool, writer).run('hotspot', rows_of(text, 'csv'))
+    assert report['created'] == 0 and report['failed'] == 2
+
+
+def test_import_stops_at_max_rows(pool, writer):
+    text = 'username,password\n' + ''.join(f'm{i},p\n' for i in range(5))
+    report = UserImporter(pool, writer).run('ppp', rows_of(text, 'csv'), max_rows=3)
+    assert report['total'] == 3 and report['truncated']
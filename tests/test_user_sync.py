@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""اختبارات مخطط المزامنة وتنفيذه على الجهاز الوهمي"""
+
+from user_sync import UserSync
+
+
+def test_unchanged_manifest_plans_nothing(router, pool, writer):
+    manifest = [{'name': name, 'type': 'ppp', 'password': 'p', 'profile': 'default'}
+                for name in router.names('/ppp/secret')]
+    plan = UserSync(pool, writer).plan(manifest, prune=True)
+    assert (len(plan.add), len(plan.set), len(plan.remove)) == (0, 0, 0)
+    assert plan.unchanged == 3
+
+
+def test_digit_only_names_and_passwords_are_stable(router, pool, writer):
+    router.add('/ppp/secret', name='007', password='01234', profile='default', disabled='false')
+    manifest = [{'name': '007', 'type': 'ppp', 'password': '01234', 'disabled': False},
+                {'name': '0042', 'type': 'ppp', 'password': '000'}]
+    manifest += [{'name': name, 'type': 'ppp'} for name in ('u000', 'u001', 'u002')]
+    sync = UserSync(pool, writer)
+
+    plan = sync.plan(manifest, prune=True)
+    assert plan.unchanged == 4
+    assert [name for _, name, _, _ in plan.add] == ['0042']
+    assert plan.set == [] and plan.remove == []
+
+    report = sync.apply(plan)
+    assert report['applied']['add'] == 1 and report['failed_count'] == 0
+    created = next(row for row in router.tables['/ppp/secret'] if row['name'] == '0042')
+    assert created['password'] == '000'
+
+    # بعد التنفيذ تصبح الخطة فارغة ولا يُحذف 007 ويعاد إنشاؤه
+    plan = sync.plan(manifest, prune=True)
+    assert (len(plan.add), len(plan.set), len(plan.remove)) == (0, 0, 0)
+    assert router.names('/ppp/secret').count('007') == 1
+
+
+def test_changed_fields_only_are_set(router, pool, writer):
+    plan = UserSync(pool, writer).plan([{'name': 'u001', 'type': 'ppp', 'password': 'p', 'comment': 'vip'}])
+    assert len(plan.set) == 1
+    _, name, command, arguments = plan.set[0]
+    assert (name, command) == ('u001', '/ppp/secret/set')
+    assert set(arguments) == {'.id', 'comment'}
+
+
+def test_prune_removes_only_synced_types(router, pool, writer):
+    plan = UserSync(pool, writer).plan([{'name': 'u000', 'type': 'ppp'}], prune=True)
+    assert sorted(name for _, name, _, _ in plan.remove) == ['u001', 'u002']
+    assert plan.user_types == ['ppp']
+
+
+def test_invalid_and_duplicate_entries_are_reported(pool, writer):
+    plan = UserSync(pool, writer).plan([
+        {'type': 'ppp'}, {'name': 'x', 'type': 'pppoe'},
+        {'name': 'new', 'type': 'ppp'},
+        {'name': 'd', 'type': 'ppp', 'password': '1'}, {'name': 'd', 'type': 'ppp', 'password': '2'}
+    ])
+    errors = [entry['error'] for entry in plan.invalid]
+    assert len(errors) == 4
+    assert len(plan.add) == 1
+
+
+def test_prune_removes_duplicate_rows_of_a_synced_name(router, pool, writer):
+    duplicate = router.add('/ppp/secret', name='u001', password='old', profile='default',
+                           service='any', disabled='false')
+    manifest = [{'name': name, 'type': 'ppp', 'password': 'p', 'profile': 'default'}
+                for name in ('u000', 'u001', 'u002')]
+    sync = UserSync(pool, writer)
+
+    plan = sync.plan(manifest)
+    assert plan.duplicates == 1 and plan.remove == [] and plan.unchanged == 3
+
+    plan = sync.plan(manifest, prune=True)
+    assert [arguments['.id'] for _, _, _, arguments in plan.remove] == [duplicate['.id']]
+    assert plan.set == [] and plan.report()['duplicates'] == 1
+    sync.apply(plan)
+    assert router.names('/ppp/secret').count('u001') == 1
+    assert duplicate not in router.tables['/ppp/secret']
+
+
+def test_duplicate_matching_the_manifest_is_kept(router, pool, writer):
+    first = router.tables['/ppp/secret'][1]
+    matching = router.add('/ppp/secret', name='u001', password='new', profile='default',
+                          service='any', disabled='false')
+    plan = UserSync(pool, writer).plan([{'name': 'u001', 'type': 'ppp', 'password': 'new'}], prune=True)
+    assert plan.set == [] and plan.unchanged == 1
+    removed = {arguments['.id'] for _, _, _, arguments in plan.remove}
+    assert first['.id'] in removed and matching['.id'] not in removed
+
+
+def test_changes_made_after_planning_are_reported_per_user(router, pool, writer):
+    sync = UserSync(pool, writer)
+    manifest = [{'name': 'u000', 'type': 'ppp', 'comment': 'vip'}, {'name': 'u001', 'type': 'ppp'},
+                {'name': 'late', 'type': 'ppp', 'password': 'p'}, {'name': 'fresh', 'type': 'ppp', 'password': 'p'}]
+    plan = sync.plan(manifest, prune=True)
+    # بين المعاينة والتنفيذ: u000 حُذف و late أُنشئ من خارج التطبيق
+    router.tables['/ppp/secret'].pop(0)
+    router.add('/ppp/secret', name='late', password='x', profile='default', disabled='false')
+
+    report = sync.apply(plan)
+    assert report['applied'] == {'remove': 1, 'set': 0, 'add': 1}
+    failed = {(entry['name'], entry['action']): entry['error'] for entry in report['failed']}
+    assert report['failed_count'] == 2
+    assert 'no such item' in failed[('u000', 'set')] and 'already exists' in failed[('late', 'add')]
+    assert 'fresh' in router.names('/ppp/secret') and 'u002' not in router.names('/ppp/secret')
+
+
+def test_sync_endpoint_previews_and_reports_failures(router, client):
+    assert client.post('/api/sync-users', json={'users': 'u000'}).status_code == 400
+    manifest = {'users': [{'name': 'u000', 'type': 'ppp'}, {'name': 'api', 'type': 'ppp', 'password': 'p'}],
+                'prune': True}
+
+    preview = client.post('/api/sync-users', json=dict(manifest, dry_run=True)).get_json()
+    assert preview['success'] and (preview['data']['add'], preview['data']['remove']) == (1, 2)
+    assert router.names('/ppp/secret') == ['u000', 'u001', 'u002']
+
+    # التنفيذ يعيد التخطيط من حالة الجهاز الحالية لا من المعاينة
+    router.tables['/ppp/secret'].pop(1)
+    data = client.post('/api/sync-users', json=manifest).get_json()
+    assert data['success'] and data['data']['applied'] == {'remove': 1, 'set': 0, 'add': 1}
+    assert router.names('/ppp/secret') == ['u000', 'api']
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+استيراد المستخدمين من ملف CSV أو NDJSON بالتدفق
+الصفوف تُقرأ وتُتحقق واحداً تلو الآخر وتُرسل إلى كاتب الدفعات على دفعات ثابتة الحجم،
+فلا يُحمل الملف في الذاكرة مهما كان حجمه؛ التكرار يُكشف بمجموعة أسماء محلية
+"""
+
+import csv
+import io
+import json
+import time
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Set, Tuple
+import logging
+
+from command_channel import Command
+from bulk_writer import USER_PATHS
+from mikrotik_manager import build_ppp_user_params, build_hotspot_user_params
+from name_index import index_for
+
+logger = logging.getLogger(__name__)
+
+# صيغ الملفات المدعومة
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# أسماء بديلة للأعمدة (بعد تحويلها لأحرف صغيرة و _ إلى -)
+COLUMN_ALIASES = {
+    'name': 'username',
+    'user': 'username',
+    'pass': 'password'
+}
+
+# حقول الحدود (أرقام بالبايت) لمستخدمي Hotspot
+BYTE_LIMIT_FIELDS = ('limit-bytes-in', 'limit-bytes-out', 'limit-bytes-total')
+
+# ترميز جلسات API (الافتراضي في librouteros.connect)؛ القيمة التي لا تُرمز تُفشل دفعتها كاملة
+API_ENCODING = 'ascii'
+
+# صف مقروء: (رقم السطر، الحقول أو None، خطأ القراءة أو None)
+ParsedRow = Tuple[int, Optional[Dict[str, str]], Optional[str]]
+
+
+def _normalize(row: Dict[str, Any]) -> Dict[str, str]:
+    """توحيد أسماء الأعمدة وقيمها"""
+    normalized = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        column = str(key).strip().lower().replace('_', '-')
+        column = COLUMN_ALIASES.get(column, column)
+        normalized[column] = '' if value is None else str(value).strip()
+    return normalized
+
+
+def iter_rows(stream, fmt: str) -> Iterator[ParsedRow]:
+    """
+    قراءة صفوف الملف بالتدفق
+
+    Args:
+        stream: تدفق بايتات (جسم الطلب أو الملف المرفوع)
+        fmt: csv أو ndjson
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            if not any(row.values()):
+                continue
+            yield reader.line_num, _normalize(row), None
+        return
+
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'سطر JSON غير صالح: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'كل سطر يجب أن يكون كائن JSON'
+            continue
+        yield line_number, _normalize(row), None
+
+
+class UserImporter:
+    """التحقق من صفوف الاستيراد وإنشاؤها على دفعات"""
+
+    def __init__(self, pool, writer, chunk_size: int = 500, max_errors: int = 1000):
+        """
+        Args:
+            pool: مجمع الاتصالات (لقراءة الأسماء الموجودة والملفات الشخصية)
+            writer: AdaptiveBulkWriter لتنفيذ أوامر add
+            chunk_size: عدد الصفوف في كل دفعة ترسل إلى الكاتب
+            max_errors: أقصى عدد من أخطاء الصفوف في التقرير (الباقي يُعد فقط)
+        """
+        self.pool = pool
+        self.writer = writer
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+    def _existing(self, user_type: str) -> Tuple[Set[str], Optional[Set[str]]]:
+        """أسماء المستخدمين الموجودة والملفات الشخصية المعروفة (None إذا تعذرت قراءتها)"""
+        with self.pool.connection() as mt:
+            names = mt.user_names(USER_PATHS[user_type])
+            profiles = mt.get_hotspot_profiles() if user_type == 'hotspot' else mt.get_ppp_profiles()
+        return names, ({profile['name'] for profile in profiles} if profiles else None)
+
+    def _command(self, user_type: str, row: Dict[str, str], profiles: Optional[Set[str]]) -> Command:
+        """
+        أمر add للصف بعد التحقق منه
+
+        Raises:
+            ValueError: صف غير صالح
+        """
+        username = row.get('username', '')
+        password = row.get('password', '')
+        profile = row.get('profile') or 'default'
+        if not username:
+            raise ValueError('اسم المستخدم مطلوب')
+        if not password:
+            raise ValueError('كلمة المرور مطلوبة')
+        if profiles is not None and profile not in profiles:
+            raise ValueError(f'الملف الشخصي {profile} غير موجود')
+
+        if user_type == 'hotspot':
+            for field in BYTE_LIMIT_FIELDS:
+                if row.get(field) and not row[field].isdigit():
+                    raise ValueError(f'{field} يجب أن يكون عدداً صحيحاً بالبايت')
+            params = build_hotspot_user_params(
+                username, password, profile, row.get('server') or 'all',
+                address=row.get('address', ''), mac_address=row.get('mac-address', ''),
+                comment=row.get('comment', ''), limit_uptime=row.get('limit-uptime', ''),
+                limit_bytes_in=row.get('limit-bytes-in', ''), limit_bytes_out=row.get('limit-bytes-out', '')
+            )
+            if row.get('limit-bytes-total'):
+                params['limit-bytes-total'] = row['limit-bytes-total']
+        else:
+            params = build_ppp_user_params(
+                username, password, profile, row.get('local-address', ''),
+                row.get('remote-address', ''), row.get('service') or 'any'
+            )
+            if row.get('comment'):
+                params['comment'] = row['comment']
+
+        for field, value in params.items():
+            try:
+                value.encode(API_ENCODING)
+            except UnicodeEncodeError:
+                raise ValueError(f'الحقل {field} يحتوي أحرفاً لا يدعمها اتصال API ({API_ENCODING})')
+        return f'{USER_PATHS[user_type]}/add', params
+
+    def run(self, user_type: str, rows: Iterable[ParsedRow], max_rows: Optional[int] = None) -> Dict[str, Any]:
+        """
+        استيراد الصفوف
+
+        Args:
+            user_type: ppp أو hotspot
+            rows: ناتج iter_rows
+            max_rows: أقصى عدد من الصفوف؛ ما بعده لا يُقرأ
+
+        Returns:
+            التقرير: عدد الصفوف والمُنشأ والفاشل وأخطاء الصفوف (مع رقم السطر)
+        """
+        started = time.monotonic()
+        path = USER_PATHS[user_type]
+        index = index_for(self.pool.host, self.pool.port)
+        existing, profiles = self._existing(user_type)
+        seen: Set[str] = set()
+
+        report = {'total': 0, 'created': 0, 'failed': 0, 'errors': [], 'truncated': False}
+
+        def fail(line: int, username: Optional[str], error: str):
+            report['failed'] += 1
+            if len(report['errors']) < self.max_errors:
+                report['errors'].append({'line': line, 'username': username, 'error': error})
+
+        # (رقم السطر، الاسم، الأمر) للدفعة الحالية
+        chunk: List[Tuple[int, str, Command]] = []
+
+        def flush():
+            results = self.writer.execute([command for _, _, command in chunk])
+            for (line, username, _), result in zip(chunk, results):
+                if result.ok:
+                    report['created'] += 1
+                    for row in result.rows:
+                        if row.get('ret'):
+                            index.put(path, username, [row['ret']])
+                else:
+                    fail(line, username, str(result.error))
+            chunk.clear()
+
+        for line, row, error in rows:
+            if max_rows is not None and report['total'] >= max_rows:
+                report['truncated'] = True
+                break
+            report['total'] += 1
+            if error:
+                fail(line, None, error)
+                continue
+
+            username = row.get('username', '')
+            try:
+                command = self._command(user_type, row, profiles)
+            except ValueError as e:
+                fail(line, username or None, str(e))
+                continue
+            # التكرار داخل الملف ومع الجهاز بمجموعة أسماء
+            if username in seen:
+                fail(line, username, 'الاسم مكرر في الملف')
+                continue
+            seen.add(username)
+            if username in existing:
+                fail(line, username, 'اسم المستخدم موجود مسبقاً')
+                continue
+
+            chunk.append((line, username, command))
+            if len(chunk) >= self.chunk_size:
+                flush()
+
+        if chunk:
+            flush()
+
+        report['errors_truncated'] = report['failed'] > len(report['errors'])
+        report['duration'] = round(time.monotonic() - started, 2)
+        logger.info(
+            f"استيراد مستخدمي {user_type}: {report['created']} من {report['total']} صف، فشل {report['failed']}"
+        )
+        return report
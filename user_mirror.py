@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+نسخة محلية من جداول مستخدمي PPP و Hotspot
+تحميل كامل مرة واحدة ثم متابعة التغييرات بأمر listen على جلسة مخصصة،
+مع إعادة المزامنة الكاملة بعد أي انقطاع
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+import logging
+
+import librouteros
+
+from command_channel import parse_reply_word
+
+logger = logging.getLogger(__name__)
+
+# الجداول التي تتبعها النسخة المحلية افتراضياً
+MIRRORED_PATHS = ('/ppp/secret', '/ip/hotspot/user')
+
+
+class UserMirror:
+    """نسخة محلية محدثة بالأحداث من جداول المستخدمين"""
+
+    def __init__(self, host: str, username: str, password: str, port: int = 2080,
+                 timeout: int = 10, paths: Sequence[str] = MIRRORED_PATHS,
+                 heartbeat_interval: float = 15, max_staleness: float = 5,
+                 retry_delay: float = 2, max_retry_delay: float = 60):
+        """
+        Args:
+            host: عنوان IP للجهاز
+            username: اسم المستخدم
+            password: كلمة المرور
+            port: منفذ API
+            timeout: مهلة الاتصال بالثواني
+            paths: مسارات الجداول المتابعة
+            heartbeat_interval: الفاصل بين نبضات فحص الجلسة؛ عدم وصول أي رد خلال 3 نبضات يعني انقطاعها
+            max_staleness: أقصى مدة (بالثواني) منذ الانقطاع يُسمح فيها بالقراءة من النسخة المحلية
+            retry_delay: الانتظار الأولي قبل إعادة المزامنة بعد الانقطاع
+            max_retry_delay: أقصى انتظار بين محاولات إعادة المزامنة
+        """
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.paths = tuple(paths)
+        self.heartbeat_interval = heartbeat_interval
+        self.max_staleness = max_staleness
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # يميز هذه النسخة عن أي نسخة سابقة لنفس الجهاز (أرقام الإصدار تبدأ من الصفر في كل نسخة)
+        self.epoch = f"{time.time_ns():x}"
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._tables: Dict[str, Dict[str, Dict]] = {path: {} for path in self.paths}
+        self._versions: Dict[str, int] = {path: 0 for path in self.paths}
+        self._loaded: set = set()
+        self._by_name: Dict[str, Dict[str, List[str]]] = {path: {} for path in self.paths}
+        self._synced = False
+        self._ever_synced = False
+        self._disconnected_at = time.monotonic()
+        self._synced_at: Optional[float] = None
+        self._last_event_at: Optional[float] = None
+        self._api = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            'syncs': 0,
+            'events': 0,
+            'disconnects': 0
+        }
+
+    # ==================== التشغيل ====================
+
+    def start(self):
+        """تشغيل خيط المزامنة في الخلفية"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"mikrotik-mirror-{self.host}:{self.port}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """إيقاف المزامنة وإغلاق الجلسة"""
+        self._stop.set()
+        self._close_api()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.timeout)
+
+    def _close_api(self):
+        """إغلاق جلسة listen دون رفع استثناءات"""
+        api, self._api = self._api, None
+        if api is not None:
+            try:
+                api.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        """حلقة المزامنة: تحميل ثم متابعة، وإعادة المحاولة بتراجع أسي عند الانقطاع"""
+        delay = self.retry_delay
+        while not self._stop.is_set():
+            try:
+                self._sync_and_follow()
+                delay = self.retry_delay
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"انقطعت مزامنة المستخدمين مع {self.host}:{self.port}: {e}")
+            finally:
+                self._close_api()
+                with self._lock:
+                    if self._synced:
+                        self._stats['disconnects'] += 1
+                        self._disconnected_at = time.monotonic()
+                    self._synced = False
+
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, self.max_retry_delay)
+
+    # ==================== البروتوكول ====================
+
+    def _write(self, command: str, *words: str):
+        """كتابة جملة (الخيط الرئيسي وخيط النبض يكتبان على نفس المقبس)"""
+        with self._write_lock:
+            self._api.protocol.writeSentence(command, *words)
+
+    def _read(self) -> Tuple[str, Optional[str], Dict]:
+        """قراءة جملة رد واحدة: (كلمة الرد، الوسم، السمات)"""
+        reply_word, words = self._api.protocol.readSentence()
+        tag = None
+        attributes = {}
+        for word in words:
+            if word.startswith('.tag='):
+                tag = word[5:]
+            elif word.startswith('='):
+                key, value = parse_reply_word(word)
+                attributes[key] = value
+        return reply_word, tag, attributes
+
+    def _heartbeat(self, api, stop: threading.Event):
+        """إرسال أمر خفيف دورياً حتى لا تبقى القراءة صامتة ويُكتشف الانقطاع"""
+        while not stop.wait(self.heartbeat_interval):
+            if self._api is not api:
+                return
+            try:
+                self._write('/system/identity/print', '=.proplist=name', '.tag=heartbeat')
+            except Exception:
+                return
+
+    def _sync_and_follow(self):
+        """فتح جلسة، بدء listen ثم print لكل جدول، ومتابعة الأحداث حتى الانقطاع"""
+        self._api = api = librouteros.connect(
+            host=self.host,
+            username=self.username,
+            password=self.password,
+            port=self.port,
+            timeout=self.timeout,
+            encoding='utf-8'
+        )
+        # القراءة تنتظر الأحداث؛ النبض يضمن وصول رد كل heartbeat_interval
+        api.protocol.transport.sock.settimeout(self.heartbeat_interval * 3)
+
+        # listen أولاً حتى لا يضيع أي تغيير يحدث أثناء التحميل الكامل
+        for path in self.paths:
+            self._write(f'{path}/listen', f'.tag=listen:{path}')
+        for path in self.paths:
+            self._write(f'{path}/print', f'.tag=load:{path}')
+
+        staging: Dict[str, Dict[str, Dict]] = {path: {} for path in self.paths}
+        buffered: Dict[str, List[Dict]] = {path: [] for path in self.paths}
+        loading = set(self.paths)
+        failed = set()
+
+        heartbeat_stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(api, heartbeat_stop), daemon=True).start()
+        try:
+            while not self._stop.is_set():
+                reply_word, tag, attributes = self._read()
+                if not tag:
+                    continue
+                kind, _, path = tag.partition(':')
+                if path in failed or kind == 'heartbeat':
+                    continue
+
+                if reply_word == '!trap':
+                    # مثلاً حزمة Hotspot غير مفعلة: يُقرأ هذا الجدول من الجهاز مباشرة
+                    logger.warning(f"تعذرت متابعة {path}: {attributes.get('message', '')}")
+                    failed.add(path)
+                    if path in loading:
+                        loading.discard(path)
+                        if not loading:
+                            self._mark_synced()
+                    continue
+
+                if kind == 'load':
+                    if reply_word == '!re' and '.id' in attributes:
+                        staging[path][attributes['.id']] = attributes
+                    elif reply_word == '!done':
+                        self._finish_load(path, staging.pop(path), buffered.pop(path))
+                        loading.discard(path)
+                        if not loading:
+                            self._mark_synced()
+                elif kind == 'listen' and reply_word == '!re':
+                    if path in loading:
+                        buffered[path].append(attributes)
+                    else:
+                        self._apply(path, attributes)
+                elif kind == 'listen' and reply_word == '!done':
+                    raise ConnectionError(f"توقف listen على {path}")
+        finally:
+            heartbeat_stop.set()
+
+    def _finish_load(self, path: str, rows: Dict[str, Dict], events: List[Dict]):
+        """استبدال الجدول بنتيجة التحميل ثم تطبيق الأحداث التي وصلت أثناءه بالترتيب"""
+        by_name: Dict[str, List[str]] = {}
+        for item_id, row in rows.items():
+            by_name.setdefault(str(row.get('name', '')), []).append(item_id)
+        with self._lock:
+            self._tables[path] = rows
+            self._by_name[path] = by_name
+            self._versions[path] += 1
+            self._loaded.add(path)
+        for event in events:
+            self._apply(path, event)
+
+    def _mark_synced(self):
+        """اكتمال التحميل الكامل لكل الجداول"""
+        with self._lock:
+            self._synced = True
+            self._ever_synced = True
+            self._synced_at = time.time()
+            self._stats['syncs'] += 1
+            counts = {path: len(table) for path, table in self._tables.items()}
+        logger.info(f"اكتملت مزامنة المستخدمين مع {self.host}:{self.port}: {counts}")
+
+    def _apply(self, path: str, attributes: Dict):
+        """تطبيق حدث listen (إضافة/تعديل أو حذف عند .dead)"""
+        item_id = attributes.get('.id')
+        if not item_id:
+            return
+        with self._lock:
+            table = self._tables[path]
+            old = table.get(item_id)
+            if old is not None:
+                self._unindex_name(path, str(old.get('name', '')), item_id)
+            if attributes.get('.dead') in (True, 'true', 'yes'):
+                table.pop(item_id, None)
+            else:
+                # صف جديد بدلاً من تعديل القديم حتى تبقى اللقطات المُسلمة للقراء ثابتة
+                row = dict(old or {})
+                row.update(attributes)
+                table[item_id] = row
+                self._by_name[path].setdefault(str(row.get('name', '')), []).append(item_id)
+            self._versions[path] += 1
+            self._last_event_at = time.monotonic()
+            self._stats['events'] += 1
+
+    def _unindex_name(self, path: str, name: str, item_id: str):
+        """حذف معرف من فهرس الأسماء (يُستدعى مع القفل)"""
+        ids = self._by_name[path].get(name)
+        if ids and item_id in ids:
+            ids.remove(item_id)
+            if not ids:
+                del self._by_name[path][name]
+
+    # ==================== القراءة ====================
+
+    def staleness(self) -> Optional[float]:
+        """
+        عمر البيانات المحلية بالثواني: 0 أثناء المتابعة، ومدة الانقطاع بعده،
+        و None إذا لم يكتمل أي تحميل بعد
+        """
+        with self._lock:
+            if not self._ever_synced:
+                return None
+            if self._synced:
+                return 0.0
+            return time.monotonic() - self._disconnected_at
+
+    def is_fresh(self, path: str) -> bool:
+        """هل يمكن قراءة الجدول من النسخة المحلية بدلاً من الجهاز"""
+        staleness = self.staleness()
+        with self._lock:
+            loaded = path in self._loaded
+        return loaded and staleness is not None and staleness <= self.max_staleness
+
+    def rows(self, path: str) -> List[Dict]:
+        """لقطة من صفوف الجدول بنفس صيغة نتيجة print (لا تُعدل الصفوف)"""
+        with self._lock:
+            return list(self._tables[path].values())
+
+    def find_ids(self, path: str, name: str) -> List[str]:
+        """معرفات العناصر التي تحمل الاسم"""
+        with self._lock:
+            return list(self._by_name[path].get(name, ()))
+
+    def version(self, path: str) -> int:
+        """رقم إصدار الجدول؛ يزيد مع كل حدث وكل تحميل كامل"""
+        with self._lock:
+            return self._versions.get(path, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """حالة النسخة المحلية"""
+        staleness = self.staleness()
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'synced': self._synced,
+                'staleness': None if staleness is None else round(staleness, 1),
+                'synced_at': self._synced_at,
+                'last_event_age': None if self._last_event_at is None
+                else round(time.monotonic() - self._last_event_at, 1),
+                'rows': {path: len(table) for path, table in self._tables.items()},
+                'versions': dict(self._versions),
+                'epoch': self.epoch
+            })
+            return stats
+
+
+# نسخة واحدة لكل جهاز؛ MikroTikManager يقرأ منها إذا كانت مشغلة وحديثة
+_mirrors: Dict[Tuple[str, int], UserMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def start_mirror(host: str, username: str, password: str, port: int = 2080, **options) -> UserMirror:
+    """تشغيل النسخة المحلية لجهاز (أو إرجاع النسخة المشغلة بنفس بيانات الدخول)"""
+    key = (host, int(port))
+    with _mirrors_lock:
+        mirror = _mirrors.get(key)
+        if mirror is not None and (mirror.username, mirror.password) == (username, password):
+            return mirror
+        old, mirror = mirror, UserMirror(host, username, password, port, **options)
+        _mirrors[key] = mirror
+    if old is not None:
+        old.stop()
+    mirror.start()
+    return mirror
+
+
+def stop_mirror(host: str, port: int):
+    """إيقاف النسخة المحلية لجهاز"""
+    with _mirrors_lock:
+        mirror = _mirrors.pop((host, int(port)), None)
+    if mirror is not None:
+        mirror.stop()
+
+
+def mirror_for(host: str, port: int) -> Optional[UserMirror]:
+    """النسخة المحلية المشغلة لجهاز أو None"""
+    with _mirrors_lock:
+        return _mirrors.get((host, int(port)))
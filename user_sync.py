@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مزامنة المستخدمين مع قائمة الحالة المطلوبة (مثل تصدير نظام الفوترة)
+تُقارن القائمة بلقطة من جداول PPP و Hotspot (الحقول المدارة فقط)، ويُنفذ أقل عدد
+من أوامر add و set و remove على دفعات متوازية، فالمزامنة التي لم يتغير فيها شيء
+تكلف الجهاز قراءة واحدة لكل جدول
+"""
+
+import time
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+import logging
+
+from command_channel import Command
+from bulk_writer import USER_PATHS
+from mikrotik_manager import build_ppp_user_params, build_hotspot_user_params, as_bool
+from name_index import index_for
+from user_mirror import mirror_for
+
+logger = logging.getLogger(__name__)
+
+# الحقول التي تديرها المزامنة لكل نوع؛ الحقل غير المذكور في عنصر القائمة لا يُغير
+SYNC_FIELDS = {
+    'ppp': ('password', 'profile', 'disabled', 'comment', 'service'),
+    'hotspot': ('password', 'profile', 'disabled', 'comment', 'server')
+}
+
+# عدد الأمثلة من كل نوع من التغييرات في التقرير
+REPORT_SAMPLES = 50
+
+
+def _value(field: str, value: Any) -> str:
+    """قيمة الحقل بصيغة موحدة للمقارنة (disabled بصيغة true/false كما يعيدها الجهاز)"""
+    if field == 'disabled':
+        return 'true' if as_bool(value) else 'false'
+    return '' if value is None else str(value)
+
+
+class SyncPlan:
+    """أوامر المزامنة المحسوبة وتقريرها (للمعاينة dry-run أو التنفيذ)"""
+
+    def __init__(self, user_types: Iterable[str], prune: bool):
+        self.user_types = list(user_types)
+        self.prune = prune
+        # (النوع، الاسم، الأمر، المعاملات)
+        self.add: List[Tuple[str, str, str, Dict]] = []
+        self.set: List[Tuple[str, str, str, Dict]] = []
+        self.remove: List[Tuple[str, str, str, Dict]] = []
+        self.unchanged = 0
+        # صفوف إضافية بنفس الاسم في الجهاز (تُحذف مع prune)
+        self.duplicates = 0
+        self.invalid: List[Dict] = []
+
+    def steps(self) -> List[Tuple[str, List[Tuple[str, str, str, Dict]]]]:
+        """مراحل التنفيذ بالترتيب: الحذف يحرر الأسماء قبل الإضافة"""
+        return [('remove', self.remove), ('set', self.set), ('add', self.add)]
+
+    def report(self) -> Dict[str, Any]:
+        """ملخص الخطة مع أمثلة (دون كلمات المرور)"""
+        return {
+            'add': len(self.add),
+            'set': len(self.set),
+            'remove': len(self.remove),
+            'unchanged': self.unchanged,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid[:REPORT_SAMPLES],
+            'invalid_count': len(self.invalid),
+            'prune': self.prune,
+            'user_types': self.user_types,
+            'samples': {
+                'add': [{'name': name, 'type': kind} for kind, name, _, _ in self.add[:REPORT_SAMPLES]],
+                'set': [
+                    {'name': name, 'type': kind,
+                     'fields': sorted(field for field in arguments if field != '.id')}
+                    for kind, name, _, arguments in self.set[:REPORT_SAMPLES]
+                ],
+                'remove': [{'name': name, 'type': kind} for kind, name, _, _ in self.remove[:REPORT_SAMPLES]]
+            }
+        }
+
+
+class UserSync:
+    """حساب خطة المزامنة من لقطة الجهاز وتنفيذها على كاتب الدفعات"""
+
+    def __init__(self, pool, writer):
+        """
+        Args:
+            pool: مجمع الاتصالات (لقراءة اللقطة)
+            writer: AdaptiveBulkWriter لتنفيذ الأوامر
+        """
+        self.pool = pool
+        self.writer = writer
+
+    # ==================== الخطة ====================
+
+    @staticmethod
+    def _desired(entry: Dict[str, Any]) -> Tuple[str, str, Dict[str, str]]:
+        """
+        النوع والاسم والحقول المطلوبة من عنصر القائمة
+
+        Raises:
+            ValueError: عنصر غير صالح
+        """
+        name = str(entry.get('name') or entry.get('username') or '').strip()
+        kind = entry.get('type', 'ppp')
+        if not name:
+            raise ValueError('اسم المستخدم مطلوب')
+        if kind not in SYNC_FIELDS:
+            raise ValueError('النوع يجب أن يكون ppp أو hotspot')
+        fields = {
+            field: _value(field, entry[field]) for field in SYNC_FIELDS[kind] if field in entry
+        }
+        return kind, name, fields
+
+    def _snapshot(self, mt, kind: str) -> Dict[str, List[Dict]]:
+        """
+        كل صفوف الجدول لكل اسم (من النسخة المحلية إن كانت حديثة، وإلا قراءة واحدة)
+
+        الجهاز قد يحتوي صفين بنفس الاسم (مثل Hotspot بخوادم مختلفة أو إضافة من خارج التطبيق)
+        """
+        path = USER_PATHS[kind]
+        mirror = mirror_for(self.pool.host, self.pool.port)
+        if mirror is not None and mirror.is_fresh(path):
+            rows = mirror.rows(path)
+        else:
+            rows = mt.iter_command(f'{path}/print', {
+                '.proplist': ','.join(('.id', 'name') + SYNC_FIELDS[kind])
+            })
+        snapshot: Dict[str, List[Dict]] = {}
+        for row in rows:
+            snapshot.setdefault(str(row.get('name', '')), []).append(row)
+        return snapshot
+
+    def plan(self, manifest: Iterable[Dict[str, Any]], prune: bool = False,
+             user_types: Optional[Iterable[str]] = None) -> SyncPlan:
+        """
+        مقارنة القائمة بالجهاز
+
+        Args:
+            manifest: عناصر {name, type, password, profile, disabled, comment, server/service}
+            prune: حذف مستخدمي الجهاز غير الموجودين في القائمة (من الأنواع المزامنة فقط)
+            user_types: الأنواع المزامنة (افتراضياً الأنواع الموجودة في القائمة)
+        """
+        desired: Dict[str, Dict[str, Dict[str, str]]] = {}
+        invalid = []
+        for position, entry in enumerate(manifest):
+            try:
+                kind, name, fields = self._desired(entry)
+            except ValueError as e:
+                invalid.append({'index': position, 'error': str(e)})
+                continue
+            if name in desired.setdefault(kind, {}):
+                invalid.append({'index': position, 'name': name, 'error': 'الاسم مكرر في القائمة'})
+                continue
+            desired[kind][name] = fields
+
+        kinds = [kind for kind in SYNC_FIELDS if kind in (user_types or desired)]
+        plan = SyncPlan(kinds, prune)
+        plan.invalid = invalid
+
+        with self.pool.connection() as mt:
+            snapshots = {kind: self._snapshot(mt, kind) for kind in kinds}
+
+        for kind in kinds:
+            path = USER_PATHS[kind]
+            current = snapshots[kind]
+            for name, fields in desired.get(kind, {}).items():
+                rows = current.get(name)
+                if not rows:
+                    if 'password' not in fields:
+                        plan.invalid.append({'name': name, 'error': 'كلمة المرور مطلوبة لإنشاء المستخدم'})
+                        continue
+                    plan.add.append((kind, name, f'{path}/add', self._add_arguments(kind, name, fields)))
+                    continue
+
+                # يُبقى الصف المطابق للقائمة إن وجد (وإلا الأول) والباقي صفوف مكررة
+                values = [{field: _value(field, row.get(field)) for field in fields} for row in rows]
+                keep = next((i for i, existing in enumerate(values) if existing == fields), 0)
+                row, existing = rows[keep], values[keep]
+                extras = [other for i, other in enumerate(rows) if i != keep]
+                plan.duplicates += len(extras)
+                if prune:
+                    plan.remove.extend(
+                        (kind, name, f'{path}/remove', {'.id': other['.id']}) for other in extras if '.id' in other
+                    )
+                if existing == fields:
+                    plan.unchanged += 1
+                    continue
+                # set بالحقول المختلفة فقط
+                arguments = {
+                    field: self._api_value(field, value)
+                    for field, value in fields.items() if existing[field] != value
+                }
+                arguments['.id'] = row['.id']
+                plan.set.append((kind, name, f'{path}/set', arguments))
+
+            if prune:
+                wanted = desired.get(kind, {})
+                plan.remove.extend(
+                    (kind, name, f'{path}/remove', {'.id': row['.id']})
+                    for name, rows in current.items() if name not in wanted
+                    for row in rows if '.id' in row
+                )
+
+        return plan
+
+    @staticmethod
+    def _api_value(field: str, value: str) -> str:
+        """قيمة الحقل كما تُرسل للجهاز"""
+        if field == 'disabled':
+            return 'yes' if value == 'true' else 'no'
+        return value
+
+    def _add_arguments(self, kind: str, name: str, fields: Dict[str, str]) -> Dict[str, str]:
+        """معاملات add من الحقول المطلوبة"""
+        if kind == 'hotspot':
+            arguments = build_hotspot_user_params(
+                name, fields['password'], fields.get('profile') or 'default', fields.get('server') or 'all'
+            )
+        else:
+            arguments = build_ppp_user_params(
+                name, fields['password'], fields.get('profile') or 'default',
+                service=fields.get('service') or 'any'
+            )
+        if fields.get('comment'):
+            arguments['comment'] = fields['comment']
+        if fields.get('disabled') == 'true':
+            arguments['disabled'] = 'yes'
+        return arguments
+
+    # ==================== التنفيذ ====================
+
+    def apply(self, plan: SyncPlan) -> Dict[str, Any]:
+        """
+        تنفيذ الخطة على دفعات متوازية (حذف ثم تعديل ثم إضافة)
+
+        Returns:
+            تقرير الخطة مع عدد الأوامر الناجحة والأخطاء ومدة التنفيذ
+        """
+        started = time.monotonic()
+        index = index_for(self.pool.host, self.pool.port)
+        report = plan.report()
+        applied = {}
+        failed = []
+
+        for step, items in plan.steps():
+            commands: List[Command] = [(command, arguments) for _, _, command, arguments in items]
+            results = self.writer.execute(commands) if commands else []
+            applied[step] = 0
+            for (kind, name, _, _), result in zip(items, results):
+                path = USER_PATHS[kind]
+                if not result.ok:
+                    failed.append({'name': name, 'type': kind, 'action': step, 'error': str(result.error)})
+                    continue
+                applied[step] += 1
+                if step == 'remove':
+                    index.forget(path, name)
+                elif step == 'add':
+                    for row in result.rows:
+                        if row.get('ret'):
+                            index.put(path, name, [row['ret']])
+
+        report.update({
+            'applied': applied,
+            'failed': failed[:REPORT_SAMPLES],
+            'failed_count': len(failed),
+            'duration': round(time.monotonic() - started, 2)
+        })
+        logger.info(
+            f"مزامنة المستخدمين: إضافة {applied.get('add', 0)}، تعديل {applied.get('set', 0)}، "
+            f"حذف {applied.get('remove', 0)}، دون تغيير {plan.unchanged}، فشل {len(failed)}"
+        )
+        return report